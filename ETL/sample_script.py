@@ -1,5 +1,7 @@
 import ETL_scripts
 import os
+import subprocess
+import sys
 
 # lxml, chronium, aiohttp
 country_data_dir = '../Resources/Datasets/CountryData'
@@ -14,4 +16,7 @@ ETL_scripts.extract_gov_data(outdir=israel_data_dir)
 # ETL_scripts.extract_sheet_data(outdir=israel_data_dir)
 ETL_scripts.extract_regular_csvs(outdir=country_data_dir)
 
+# derived data of the app, its scripts run from the repository root
+subprocess.run([sys.executable, 'gstat_app/build_snapshots.py'], cwd='..', check=True)
+
 # streamlit run ./gstat_app/app.py
\ No newline at end of file
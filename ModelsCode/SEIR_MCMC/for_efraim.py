@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 import datetime
+from scipy.integrate import odeint
 import matplotlib.pyplot as plt
 
 class Seiar:
@@ -25,71 +26,41 @@ class Seiar:
         self.beta_asy_change = p['beta_asy_change']
         self.beta_ill_times = p['beta_ill_days']
         self.beta_ill_change = p['beta_ill_change']
-        self.run_simulation()
         self.results=[]
 
 
-    def model(self,t):
-        S, E, I, A, R = [self.S_0/self.N], [self.E_0/self.N], [self.I_0/self.N], [self.A_0/self.N], [self.R_0/self.N]
-
-        dt = t[1] - t[0]
-
-        for tm in t[1:]:
-            if tm in self.beta_asy_times:
-                r = self.beta_asy_change[self.beta_asy_times.index(tm)]
-                self.beta_asy = self.beta_asy * (1+r)
-                print(tm, r, self.beta_asy)
-                self.beta_asy_times.pop(0)
-                self.beta_asy_change.pop(0)
-            if tm in self.beta_ill_times:
-                r = self.beta_ill_change[self.beta_ill_times.index(tm)]
-                self.beta_ill = self.beta_ill * (1+r)
-                print(tm, r, self.beta_ill)
-                self.beta_ill_change.pop(0)
-                self.beta_ill_times.pop(0)
-            next_S = S[-1] - (self.rho * self.beta_ill * S[-1] * I[-1] + self.rho * self.beta_asy * S[-1] * A[-1]) * dt
-            next_E = E[-1] + (self.rho * self.beta_ill * S[-1] * I[-1] + self.rho * self.beta_asy * S[-1] * A[-1] - self.alpha * E[-1]) * dt
-            next_I = I[-1] + (self.theta * self.alpha * E[-1] - self.gamma_ill * I[-1]) * dt
-            next_A = A[-1] + ((1 - self.theta) * self.alpha * E[-1] - self.gamma_asy * A[-1]) * dt
-            next_R = R[-1] + (self.gamma_ill * I[-1] + self.gamma_asy * A[-1]) * dt
-
-            S.append(next_S)
-            E.append(next_E)
-            I.append(next_I)
-            A.append(next_A)
-            R.append(next_R)
-
-        return np.stack([S, E, I, A, R]).T
+    def rhs(self, y, t, beta_ill, beta_asy):
+        S, E, I, A, R = y
+        infection = self.rho * beta_ill * S * I + self.rho * beta_asy * S * A
+        return np.array([-infection,
+                         infection - self.alpha * E,
+                         self.theta * self.alpha * E - self.gamma_ill * I,
+                         (1 - self.theta) * self.alpha * E - self.gamma_asy * A,
+                         self.gamma_ill * I + self.gamma_asy * A])
+
+    def model(self, n_days):
+        # the betas only change on their days, so integrate each stretch between changes with odeint
+        # and keep one sample per day
+        y = np.array([self.S_0, self.E_0, self.I_0, self.A_0, self.R_0]) / self.N
+        changes = sorted(set(self.beta_asy_times) | set(self.beta_ill_times) | {0, n_days})
+        changes = [c for c in changes if 0 <= c <= n_days]
+        out = [y]
+        for t0, t1 in zip(changes[:-1], changes[1:]):
+            if t0 in self.beta_asy_times:
+                self.beta_asy = self.beta_asy * (1 + self.beta_asy_change[self.beta_asy_times.index(t0)])
+            if t0 in self.beta_ill_times:
+                self.beta_ill = self.beta_ill * (1 + self.beta_ill_change[self.beta_ill_times.index(t0)])
+            y_days = odeint(self.rhs, out[-1], np.arange(t0, t1 + 1), args=(self.beta_ill, self.beta_asy))
+            out.extend(y_days[1:])
+        return np.array(out)
 
     def run_simulation(self):
-        t_max = 600
-        dt = .01
-        t = np.linspace(0, t_max, int(t_max / dt) + 1)
-
-        results = self.model(t)
-
-        df = pd.DataFrame(results)
-        df = df.rename(columns={df.columns[0]: 'S', df.columns[1]: 'E', df.columns[2]: 'I', df.columns[3]: 'A', df.columns[4]: 'R'})
-        dates = pd.date_range(start=self.start_date_simulation, end='05/01/2030')
-        df_I_E = df[::100].reset_index(drop=True)
-        df_I_E.index = dates[:len(df_I_E)]
-
-        df_I_E = df_I_E.rename(columns={'S': 'Susceptible', 'E': 'Exposed', 'I': 'Infected', 'A': 'Asymptomatic', 'R': 'Recovered'})
-        infected_df = df_I_E[['Infected']] * self.N
-        asymptomatic_df = df_I_E[['Asymptomatic']] * self.N
-        recovered_df = df_I_E[['Recovered']] * self.N
-        susceptible_df = df_I_E[['Susceptible']] * self.N
-        exposed_df = df_I_E[['Exposed']] * self.N
-
-        results = [
-                    infected_df.loc[:self.number_of_days],
-                    asymptomatic_df.loc[:self.number_of_days],
-                    recovered_df.loc[:self.number_of_days],
-                    susceptible_df.loc[:self.number_of_days],
-                    exposed_df.loc[:self.number_of_days]
-                   ]
+        n_days = (self.number_of_days - self.start_date_simulation).days
+        results = self.model(n_days)
 
-        self.results = pd.concat(results, axis = 1).reset_index(drop=True)
+        df_I_E = pd.DataFrame(results, columns=['Susceptible', 'Exposed', 'Infected', 'Asymptomatic', 'Recovered'])
+        df_I_E = df_I_E[['Infected', 'Asymptomatic', 'Recovered', 'Susceptible', 'Exposed']] * self.N
+        self.results = df_I_E.reset_index(drop=True)
         return 0
 
     def plot(self, colnames):
@@ -0,0 +1,75 @@
+"""Benchmark the compartments module against the list-returning SIR / SEIR of ModelsCode/SEIR_MCMC under odeint.
+
+python gstat_app/benchmarks/compartments_benchmark.py
+"""
+import os
+import sys
+import time
+import numpy as np  # type: ignore
+from scipy.integrate import odeint  # type: ignore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, 'gstat_app'))
+sys.path.insert(0, os.path.join(ROOT, 'ModelsCode', 'SEIR_MCMC'))
+from models import SEIR, SIR  # noqa: E402
+from src.shared.models.compartments import (integrate_many, seir_b_jacobian, seir_b_rhs, seir_jacobian,  # noqa: E402
+                                            seir_rhs, sir_jacobian, sir_rhs)
+
+N = 8400000.
+T = np.arange(161.)
+RTOL = 1e-8
+N_SETS = [100, 1000]
+N_REPEATS = 20
+
+
+def timed(func, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main():
+    sir_y0, seir_y0 = [N - 10, 10., 0.], [N - 10, 0., 10., 0.]
+    single = [
+        ('SIR', lambda: odeint(SIR, sir_y0, T, args=((.9, 1 / 14),), rtol=RTOL),
+         lambda: odeint(sir_rhs, sir_y0, T, args=(.9, 1 / 14), Dfun=sir_jacobian, rtol=RTOL)),
+        ('SEIR', lambda: odeint(SEIR, seir_y0, T, args=((.9, 1 / 14, .2),), rtol=RTOL),
+         lambda: odeint(seir_rhs, seir_y0, T, args=(.9, 1 / 14, .2), Dfun=seir_jacobian, rtol=RTOL)),
+    ]
+    print("one parameter set, %d days" % (len(T) - 1))
+    for name, old, new in single:
+        old_time, old_y = timed(old, N_REPEATS)
+        new_time, new_y = timed(new, N_REPEATS)
+        assert np.abs(old_y - new_y).max() / N < 1e-6
+        print(f"{name:5s} list rhs: {old_time * 1e3:7.2f} ms   array rhs + jacobian: {new_time * 1e3:7.2f} ms")
+
+    rng = np.random.RandomState(0)
+    print("many parameter sets, SEIR")
+    for m in N_SETS:
+        beta, gamma, eps = rng.uniform(.2, .9, m), rng.uniform(.05, .2, m), rng.uniform(.1, .3, m)
+        loop_time, loop = timed(lambda: np.stack([odeint(SEIR, seir_y0, T, args=((beta[i], gamma[i], eps[i]),),
+                                                         rtol=RTOL) for i in range(m)], axis=2))
+        many_time, many = timed(lambda: integrate_many(seir_rhs, seir_jacobian, np.tile(seir_y0, (m, 1)).T, T,
+                                                       (beta, gamma, eps), rtol=RTOL))
+        assert np.abs(loop - many).max() / N < 1e-6
+        print(f"{m:5d} sets  odeint per set: {loop_time:7.2f} s   integrate_many: {many_time:7.2f} s"
+              f"  ({loop_time / many_time:.0f}x)")
+
+    # SEIR_B in models.py indexes beta by a float t and cannot run, the reference is seir_b_rhs one set at a time
+    m = N_SETS[-1]
+    beta_times = np.array([0., 20., 50.])
+    beta_paths = np.outer([.9, .4, .2], rng.uniform(.5, 1.5, m))
+    gamma, eps = rng.uniform(.05, .2, m), rng.uniform(.1, .3, m)
+    loop_time, loop = timed(lambda: np.stack([odeint(seir_b_rhs, seir_y0, T, args=(beta_times, beta_paths[:, i],
+                                                                                    gamma[i], eps[i]), rtol=RTOL)
+                                              for i in range(m)], axis=2))
+    many_time, many = timed(lambda: integrate_many(seir_b_rhs, seir_b_jacobian, np.tile(seir_y0, (m, 1)).T, T,
+                                                   (beta_times, beta_paths, gamma, eps), rtol=RTOL))
+    assert np.abs(loop - many).max() / N < 1e-6
+    print(f"SEIR_B, {m} beta(t) paths  odeint per path: {loop_time:7.2f} s   integrate_many: {many_time:7.2f} s"
+          f"  ({loop_time / many_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark the vectorized Holt forecast against per-country statsmodels fits.
+
+python gstat_app/benchmarks/holt_benchmark.py
+
+Needs the statsmodels 0.11 of requirements.txt, later versions changed how Holt initializes.
+"""
+import os
+import sys
+import time
+import warnings
+import numpy as np  # type: ignore
+from statsmodels.tsa.api import Holt  # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.shared.models import olg_kernels  # noqa: E402
+
+N_COUNTRIES = 200
+TAU = 8
+HORIZON = 61
+# OLG's smoothing, where statsmodels keeps the starting values, and one where it fits them
+SMOOTHING = [(0.1, 0.9, 1e-12), (0.5, 0.2, 5e-5)]
+
+
+def main():
+    rng = np.random.RandomState(0)
+    # trailing r_adj windows drifting around 1
+    windows = np.abs(1.5 + np.cumsum(rng.normal(0, 0.1, size=(N_COUNTRIES, TAU)), axis=1))
+
+    print(f"{N_COUNTRIES} countries, window={TAU}, horizon={HORIZON}")
+    for level, slope, rtol in SMOOTHING:
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            # statsmodels warns that its optimizer did not move for level < slope
+            warnings.simplefilter('ignore')
+            expected = np.array([Holt(row, exponential=True).fit(smoothing_level=level, smoothing_slope=slope)
+                                 .forecast(HORIZON) for row in windows])
+        statsmodels_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        forecast = olg_kernels.holt_forecast(windows, HORIZON, smoothing_level=level, smoothing_slope=slope)
+        panel_total = time.perf_counter() - start
+
+        error = np.abs(forecast / expected - 1).max()
+        assert error < rtol, error
+        print(f"smoothing {level}/{slope}: max relative error {error:.1e}, "
+              f"statsmodels {statsmodels_total * 1e3:.1f} ms, panel {panel_total * 1e3:.1f} ms")
+
+    # statsmodels rejects a window with R = 0, which holds its last value
+    assert np.array_equal(olg_kernels.holt_forecast([[0.] * TAU, [1.] * (TAU - 1) + [0.]], 3), np.zeros((2, 3)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark ode_mcmc on the synthetic SIR fit of ModelsCode/SEIR_MCMC/run_model.py.
+
+python gstat_app/benchmarks/ode_mcmc_benchmark.py
+"""
+import os
+import sys
+import time
+import numpy as np  # type: ignore
+from scipy.integrate import odeint  # type: ignore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, 'gstat_app'))
+from src.shared.models.compartments import sir_rhs  # noqa: E402
+from src.shared.models.ode_mcmc import OdeCalibration, sample  # noqa: E402
+
+BETA, GAMMA = 0.9, 1. / 14
+SIGMA = [0.2, 0.3, 0.2]
+Y0 = [999. / 1000, 1. / 1000, 0.]
+TIMES = np.arange(1., 160.)
+N_WALKERS = [16, 64, 256]
+
+
+def log_likelihood_loop(calibration, u):
+    """The likelihood one odeint solve per walker, as pymc3's DifferentialEquation evaluates it."""
+    out = []
+    for params in zip(*calibration.unpack(u).values()):
+        p = dict(zip(calibration.names, params))
+        y = odeint(sir_rhs, Y0, calibration.t, args=(p['R0'] * p['gamma'], p['gamma']), atol=1e-10)[1:]
+        sigma = np.array([p['sigma_' + s] for s in calibration.observed_states])
+        z = (calibration.log_observed - np.log(y)) / sigma
+        out.append(np.sum(-0.5 * z ** 2 - np.log(sigma) - calibration.log_observed - 0.5 * np.log(2 * np.pi)))
+    return np.array(out)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    y = odeint(sir_rhs, Y0, np.concatenate([[0.], TIMES]), args=(BETA, GAMMA), rtol=1e-8)[1:]
+    calibration = OdeCalibration('SIR', TIMES, rng.lognormal(np.log(y), SIGMA), ['S', 'I', 'R'], Y0)
+
+    start = time.perf_counter()
+    mode = calibration.find_mode(rng)
+    print(f"posterior mode in {time.perf_counter() - start:.1f} s:",
+          {k: round(float(v[0]), 4) for k, v in calibration.unpack(mode[None]).items()})
+
+    print("log likelihood of walkers around the mode")
+    for m in N_WALKERS:
+        u = mode + 1e-2 * rng.standard_normal((m, len(mode)))
+        start = time.perf_counter()
+        loop = log_likelihood_loop(calibration, u)
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = calibration.log_likelihood(u)
+        batch_time = time.perf_counter() - start
+        assert np.allclose(loop, batch, rtol=1e-4)
+        print(f"{m:4d} walkers  odeint per walker: {loop_time * 1e3:7.1f} ms   one solve: {batch_time * 1e3:7.1f} ms"
+              f"  ({loop_time / batch_time:.0f}x)")
+
+    start = time.perf_counter()
+    posterior = sample(calibration, n_walkers=32, n_steps=1000, burn=500, n_ensembles=4, seed=0)
+    print(f"4 ensembles x 32 walkers x 1000 steps in {time.perf_counter() - start:.1f} s, "
+          f"acceptance {posterior.acceptance.mean():.2f}, R0 true {BETA / GAMMA:.2f}")
+    print(posterior.summary().round(4))
+
+
+if __name__ == '__main__':
+    main()
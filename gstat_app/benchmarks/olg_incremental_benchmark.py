@@ -0,0 +1,82 @@
+"""Check OLGIncremental against olg_kernels.calc_r on the full history and time a daily refresh.
+
+python gstat_app/benchmarks/olg_incremental_benchmark.py
+"""
+import os
+import sys
+import time
+from types import SimpleNamespace
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.shared.models import olg_kernels  # noqa: E402
+from src.shared.models.olg_incremental import OLGIncremental  # noqa: E402
+
+N_COUNTRIES = 2000
+N_DAYS = 400
+N_NEW_DAYS = 30
+TAU = 8
+INIT_INFECTED = 50
+
+
+def panel(rng):
+    cases = np.cumsum(rng.poisson(rng.uniform(1, 300, (N_COUNTRIES, 1)), size=(N_COUNTRIES, N_DAYS)), axis=1)
+    return pd.DataFrame({
+        'country': np.repeat(['c%04d' % i for i in range(N_COUNTRIES)], N_DAYS),
+        'date': np.tile(pd.date_range('2020-01-22', periods=N_DAYS).values, N_COUNTRIES),
+        'total_cases': cases.ravel(),
+    })
+
+
+def full_r(df):
+    """Last smoothed R of every country, from calc_r on its whole history as OLG computes it."""
+    out = {}
+    for country, rows in df.groupby('country'):
+        raw = rows['total_cases'].values.astype(float)
+        detected = olg_kernels.enforce_growth(raw[np.argmax(raw >= INIT_INFECTED):])
+        out[country] = olg_kernels.calc_r(detected, TAU, INIT_INFECTED)[1][-1]
+    return pd.Series(out)
+
+
+def check(olg, df):
+    latest = olg.latest().set_index('country')['R']
+    expected = full_r(df)
+    assert latest.index.equals(expected.index)
+    assert np.allclose(latest.values, expected.values, rtol=1e-9, atol=1e-9), \
+        np.abs(latest.values - expected.values).max()
+
+
+def main():
+    rng = np.random.RandomState(0)
+    df = panel(rng)
+    day = df['date'] - df['date'].min()
+    # the OLGParameters fields OLGIncremental reads
+    p = SimpleNamespace(tau=TAU, init_infected=INIT_INFECTED, countries=None)
+
+    olg = OLGIncremental(p)
+    start = time.perf_counter()
+    olg.update(df[day < pd.Timedelta(days=N_DAYS - N_NEW_DAYS)])
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in range(N_DAYS - N_NEW_DAYS, N_DAYS):
+        recomputed = olg.update(df[day <= pd.Timedelta(days=k)])
+        assert not recomputed, recomputed
+    daily_time = (time.perf_counter() - start) / N_NEW_DAYS
+    check(olg, df)
+
+    # a revised day sends just that country back through calc_r
+    revised = df.copy()
+    revised.loc[revised.index[5], 'total_cases'] += 1000
+    assert olg.update(revised) == ['c0000']
+    check(olg, revised)
+
+    print(f"{N_COUNTRIES} countries x {N_DAYS} days, tau={TAU}, R matches calc_r on the full history")
+    print(f"initial load:  {full_time:8.2f} s")
+    print(f"daily refresh: {daily_time:8.2f} s/day, including the row fingerprints of the whole frame")
+    print(f"state size:    {sum(len(np.ravel(v)) for s in olg.state.values() for v in s.values())} values")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark the vectorized R kernel against the original per-day np.append loop.
+
+python gstat_app/benchmarks/r_kernel_benchmark.py
+"""
+import os
+import sys
+import time
+import numpy as np  # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.shared.models import olg_kernels  # noqa: E402
+
+N_DAYS = 1000
+N_ENTITIES = 5000
+N_LOOP_SAMPLE = 20
+TAU = 8
+INIT_INFECTED = 50
+
+
+def calc_r_loop(detected, tau, init_infected):
+    # the pre-vectorization OLG.calc_r, kept here as the reference
+    epsilon = 1e-06
+    r_values = np.array([(detected[0] / (init_infected + epsilon) - 1) * tau])
+    r_adj = None
+    for t in range(1, len(detected)):
+        if t <= tau:
+            r_value = (detected[t] / (detected[t - 1] + epsilon) - 1) * tau
+        elif t > tau:
+            r_value = (detected[t] / (
+                    detected[t - 1] - detected[t - tau] + detected[t - tau - 1] + epsilon) - 1) * tau
+        r_values = np.append(r_values, max(r_value, 0))
+        r_adj = np.convolve(r_values, np.ones(int(tau, )) / int(tau), mode='full')[:len(detected)]
+        r_adj = np.clip(r_adj, 0, 100)
+    return r_values, r_adj
+
+
+def main():
+    rng = np.random.RandomState(0)
+    detected = INIT_INFECTED + np.cumsum(rng.poisson(200, size=(N_ENTITIES, N_DAYS)), axis=1).astype(float)
+
+    start = time.perf_counter()
+    for row in detected[:N_LOOP_SAMPLE]:
+        loop_values, loop_adj = calc_r_loop(list(row), TAU, INIT_INFECTED)
+    loop_per_entity = (time.perf_counter() - start) / N_LOOP_SAMPLE
+
+    start = time.perf_counter()
+    for row in detected[:N_LOOP_SAMPLE]:
+        olg_kernels.calc_r(row, TAU, INIT_INFECTED)
+    series_per_entity = (time.perf_counter() - start) / N_LOOP_SAMPLE
+
+    start = time.perf_counter()
+    r_values, r_adj = olg_kernels.calc_r(detected, TAU, INIT_INFECTED)
+    panel_total = time.perf_counter() - start
+
+    assert np.array_equal(loop_values, olg_kernels.calc_r(detected[N_LOOP_SAMPLE - 1], TAU, INIT_INFECTED)[0])
+    assert np.allclose(loop_adj, r_adj[N_LOOP_SAMPLE - 1], rtol=1e-12, atol=0)
+
+    print(f"{N_ENTITIES} entities x {N_DAYS} days, tau={TAU}")
+    print(f"loop kernel:   {loop_per_entity * 1e3:9.3f} ms/entity, "
+          f"~{loop_per_entity * N_ENTITIES:8.2f} s total (extrapolated)")
+    print(f"series kernel: {series_per_entity * 1e3:9.3f} ms/entity, "
+          f"~{series_per_entity * N_ENTITIES:8.2f} s total (extrapolated)")
+    print(f"panel kernel:  {panel_total / N_ENTITIES * 1e3:9.3f} ms/entity, "
+          f"{panel_total:9.2f} s total")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark the SEIAR solver against the original dt=0.01 forward Euler loop.
+
+python gstat_app/benchmarks/seiar_benchmark.py
+"""
+import os
+import sys
+import time
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.shared.models.model_seiar import integrate_seiar, seiar_ensemble  # noqa: E402
+
+N_DAYS = 600
+DT = .01
+Y0 = np.array([8739990., 0., 10., 0., 0.]) / 8740000.
+RATES = {'alpha': 0.2, 'gamma_ill': 0.08, 'gamma_asy': 0.15, 'rho': 1.0, 'theta': 0.8}
+BETA_ILL, BETA_ASY = 1.05, 1.05
+CHECKPOINTS = {'time_ill': [30, 90], 'beta_ill': [0.5, 0.3], 'time_asy': [30, 120], 'beta_asy': [0.6, 0.2]}
+N_MEMBERS = 5000
+N_SINGLE_SAMPLE = 50
+# the speedup over the Euler loop asked of the solver
+TARGET_SPEEDUP = 100
+
+
+def seiar_loop(y0, n_days, rates, beta_ill, beta_asy, checkpoints):
+    # the pre-solver Seiar.model, kept here as the reference, sampled at whole days
+    S, E, I, A, R = [[v] for v in y0]
+    alpha, gamma_ill, gamma_asy, rho, theta = (rates[k] for k in ['alpha', 'gamma_ill', 'gamma_asy', 'rho', 'theta'])
+    time_ill, betas_ill = list(checkpoints['time_ill']), list(checkpoints['beta_ill'])
+    time_asy, betas_asy = list(checkpoints['time_asy']), list(checkpoints['beta_asy'])
+    steps_per_day = int(round(1 / DT))
+    for step in range(1, n_days * steps_per_day + 1):
+        # betas switch for the step that starts on their day
+        tm = (step - 1) / steps_per_day
+        if time_asy and tm >= time_asy[0]:
+            beta_asy = betas_asy.pop(0)
+            time_asy.pop(0)
+        if time_ill and tm >= time_ill[0]:
+            beta_ill = betas_ill.pop(0)
+            time_ill.pop(0)
+        next_S = S[-1] - (rho * beta_ill * S[-1] * I[-1] + rho * beta_asy * S[-1] * A[-1]) * DT
+        next_E = E[-1] + (rho * beta_ill * S[-1] * I[-1] + rho * beta_asy * S[-1] * A[-1] - alpha * E[-1]) * DT
+        next_I = I[-1] + (theta * alpha * E[-1] - gamma_ill * I[-1]) * DT
+        next_A = A[-1] + ((1 - theta) * alpha * E[-1] - gamma_asy * A[-1]) * DT
+        next_R = R[-1] + (gamma_ill * I[-1] + gamma_asy * A[-1]) * DT
+        S.append(next_S)
+        E.append(next_E)
+        I.append(next_I)
+        A.append(next_A)
+        R.append(next_R)
+    return np.stack([S, E, I, A, R]).T[::steps_per_day]
+
+
+def best_time(n_runs, func, *args):
+    """Fastest of n_runs calls, the least disturbed by the rest of the machine, and the result."""
+    times = []
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    loop_time, loop = best_time(3, seiar_loop, Y0, N_DAYS, RATES, BETA_ILL, BETA_ASY, CHECKPOINTS)
+    solver_time, solved = best_time(20, integrate_seiar, Y0, N_DAYS, RATES, BETA_ILL, BETA_ASY, CHECKPOINTS)
+
+    # Euler with dt=0.01 is first order, the solver is the more accurate of the two
+    assert loop.shape == solved.shape
+    assert np.abs(loop - solved).max() < 5e-3
+
+    print(f"{N_DAYS} days, {len(CHECKPOINTS['time_ill']) + len(CHECKPOINTS['time_asy'])} checkpoints")
+    print(f"euler loop: {loop_time * 1e3:9.2f} ms")
+    print(f"solver:     {solver_time * 1e3:9.2f} ms  ({loop_time / solver_time:.0f}x, target {TARGET_SPEEDUP}x)")
+    print(f"max abs difference (fractions of N): {np.abs(loop - solved).max():.2e}")
+    assert loop_time / solver_time >= TARGET_SPEEDUP
+
+    rng = np.random.RandomState(0)
+    params = pd.DataFrame({'beta_ill': rng.uniform(.5, 1.5, N_MEMBERS), 'beta_asy': rng.uniform(.3, 1.2, N_MEMBERS),
+                           'alpha': rng.uniform(.1, .3, N_MEMBERS), 'gamma_ill': rng.uniform(.05, .1, N_MEMBERS),
+                           'gamma_asy': rng.uniform(.1, .2, N_MEMBERS), 'theta': rng.uniform(.5, .9, N_MEMBERS),
+                           'rho': rng.uniform(.5, 1., N_MEMBERS)})
+    start = time.perf_counter()
+    single = [integrate_seiar(Y0, N_DAYS, row[['alpha', 'gamma_ill', 'gamma_asy', 'rho', 'theta']].to_dict(),
+                              row['beta_ill'], row['beta_asy'], CHECKPOINTS)
+              for _, row in params.head(N_SINGLE_SAMPLE).iterrows()]
+    single_per_member = (time.perf_counter() - start) / N_SINGLE_SAMPLE
+
+    start = time.perf_counter()
+    trajectories, _, _ = seiar_ensemble(params, N_DAYS, Y0, CHECKPOINTS)
+    ensemble_time = time.perf_counter() - start
+    assert np.abs(trajectories[:N_SINGLE_SAMPLE] - np.array(single)).max() < 1e-3
+
+    print(f"{N_MEMBERS} member ensemble")
+    print(f"one solve per member: ~{single_per_member * N_MEMBERS:8.2f} s (extrapolated)")
+    print(f"ensemble:              {ensemble_time:8.2f} s, {trajectories.nbytes / 2 ** 20:.0f} MB float32 result")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Build the columnar snapshots of the app's datasets, so the app memory-maps them instead of parsing CSVs.
+
+Run from the repository root, after the ETL:
+python gstat_app/build_snapshots.py [--force]
+"""
+import argparse
+import os
+import shutil
+import yaml
+from src.shared.models import snapshots
+from src.shared.models.data import CountryData, IsraelData
+
+defaults_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src/shared/defaults.yaml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--force', action='store_true', help="rebuild snapshots even if the data did not change")
+    args = parser.parse_args()
+
+    with open(defaults_file) as file:
+        defaults = yaml.load(file, Loader=yaml.FullLoader)
+    files = defaults['FILES']
+    if args.force:
+        paths = list(files['country_files'].values()) + list(files['israel_files'].values())
+        for directory in {os.path.dirname(path) for path in paths}:
+            for name in os.listdir(directory):
+                if name.endswith(snapshots.SUFFIX):
+                    shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    # the readers save every missing or stale snapshot on the way
+    snapshots.write_stale = True
+    CountryData(files['country_files'])
+    IsraelData(files['israel_files'])
+    print("snapshots are up to date")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Calibrate the OLG critical care parameters of every country and write the table the app loads.
+
+Run from the repository root, after the ETL:
+python gstat_app/calibrate_olg.py [--processes N] [--force]
+"""
+import argparse
+import os
+import yaml
+from src.shared.models.data import CountryData
+from src.shared.models.olg_calibration import calibrate, data_version, load_calibration, write_calibration
+
+defaults_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src/shared/defaults.yaml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument('--force', action='store_true', help="recalibrate even if the data did not change")
+    args = parser.parse_args()
+
+    with open(defaults_file) as file:
+        defaults = yaml.load(file, Loader=yaml.FullLoader)
+    country_files = defaults['FILES']['country_files']
+    init_infected = defaults['MODELS']['olg_params']['init_infected']
+    path = country_files['olg_calibration_file']
+
+    version = data_version(country_files['country_file'], init_infected)
+    current = load_calibration(path)
+    if not args.force and len(current) and (current['data_version'] == version).all():
+        print("calibration is up to date:", path)
+        return
+    table = calibrate(CountryData(country_files).country_df, init_infected, processes=args.processes)
+    write_calibration(table, path, version)
+    print("calibrated %d countries:" % len(table), path)
+
+
+if __name__ == '__main__':
+    main()
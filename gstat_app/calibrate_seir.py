@@ -0,0 +1,41 @@
+"""Calibrate SIR and SEIR rates of every country over rolling windows and write the table the app loads.
+
+Run from the repository root, after the ETL:
+python gstat_app/calibrate_seir.py [--processes N] [--force]
+"""
+import argparse
+import os
+import pandas as pd  # type: ignore
+import yaml
+from src.shared.models.olg_calibration import write_calibration
+from src.shared.models.seir_calibration import calibrate, data_version, load_calibration
+
+defaults_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src/shared/defaults.yaml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument('--force', action='store_true', help="recalibrate even if the data did not change")
+    args = parser.parse_args()
+
+    with open(defaults_file) as file:
+        defaults = yaml.load(file, Loader=yaml.FullLoader)
+    country_files = defaults['FILES']['country_files']
+    params = defaults['MODELS']['seir_calibration']
+    path = country_files['seir_calibration_file']
+
+    version = data_version(country_files['seir_file'], params)
+    current = load_calibration(path)
+    if not args.force and len(current) and (current['data_version'] == version).all():
+        print("calibration is up to date:", path)
+        return
+    df = pd.read_csv(country_files['seir_file'], usecols=['S', 'E', 'I', 'R', 'country', 'date'])
+    table = calibrate(df, params['models'], params['window'], params['step'], params['min_infected'],
+                      processes=args.processes)
+    write_calibration(table, path, version)
+    print("calibrated %d windows of %d countries:" % (len(table), table['country'].nunique()), path)
+
+
+if __name__ == '__main__':
+    main()
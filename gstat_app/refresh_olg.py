@@ -0,0 +1,49 @@
+"""Advance the incremental OLG R state by the new rows of the ETL and write every country's latest R.
+
+Run from the repository root, after the ETL:
+python gstat_app/refresh_olg.py [--full]
+
+Nothing in the app reads the state or the latest R yet, the pages compute R with OLGPanel
+for their own init_infected, so the ETL does not run this.
+"""
+import argparse
+import os
+import yaml
+from src.shared.models.data import CountryData
+from src.shared.models.model_olg import init_olg_params
+from src.shared.models.olg_incremental import OLGIncremental
+
+defaults_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src/shared/defaults.yaml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--full', action='store_true', help="recompute every country from its whole history")
+    args = parser.parse_args()
+
+    with open(defaults_file) as file:
+        defaults = yaml.load(file, Loader=yaml.FullLoader)
+    country_files = defaults['FILES']['country_files']
+    p = init_olg_params(defaults['MODELS']['olg_params'])
+    p.countries = None
+    state_path = country_files['olg_state_file']
+
+    olg = None
+    if not args.full and os.path.exists(state_path):
+        olg = OLGIncremental.read_pickle(state_path)
+        if not olg.matches(p):
+            olg = None
+    if olg is None:
+        olg = OLGIncremental(p)
+    recomputed = olg.update(CountryData(country_files).country_df)
+    olg.to_pickle(state_path)
+
+    latest_path = country_files['olg_latest_file']
+    tmp = '%s.%d.tmp' % (latest_path, os.getpid())
+    olg.latest().to_csv(tmp, index=False)
+    os.replace(tmp, latest_path)
+    print("R of %d countries, %d recomputed from scratch:" % (len(olg.state), len(recomputed)), latest_path)
+
+
+if __name__ == '__main__':
+    main()
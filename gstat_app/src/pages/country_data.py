@@ -3,8 +3,9 @@ from src.shared.models.data import CountryData
 from src.shared.charts.charts_country import *
 from src.shared.charts.charts_olg import *
 from src.shared.utils import get_table_download_link
-from src.shared.models.model_olg import OLG, init_olg_params
-from src.shared.settings import DEFAULTS, load_data, user_session_id
+from src.shared.models.model_olg import init_olg_params
+from src.shared.models.olg_panel import cached_olg
+from src.shared.settings import DEFAULTS, load_data, user_session_id, olg_cache
 import src.pages.external_dashboards
 from src.shared.components import components
 import altair as alt
@@ -44,8 +45,7 @@ def write():
     pjh.countries = countryname
     if len(pjh.countries) > 0:
         pjh.init_infected = total_cases_criteria
-        olgjh = OLG(temp, pjh)
-        ddjh = olgjh.df.copy()
+        ddjh = cached_olg(olg_cache, temp.reset_index(drop=True), pjh)
         st.altair_chart(
             olg_projections_chart(alt, ddjh.loc[ddjh['prediction_ind'] == 0,
                                                 ['date', 'corona_days', 'country', 'prediction_ind', 'R']],
@@ -2,8 +2,9 @@ import streamlit as st
 from src.shared.charts.charts_il import *
 from src.shared.charts.charts_olg import olg_projections_chart
 from src.shared.models.model_olg import *
+from src.shared.models.olg_panel import cached_olg
 from src.shared.models.data import IsraelData, CountryData
-from src.shared.settings import DEFAULTS, load_data, user_session_id
+from src.shared.settings import DEFAULTS, load_data, user_session_id, olg_cache
 import altair as alt
 
 
@@ -35,8 +36,7 @@ def write():
     pil = init_olg_params(DEFAULTS['MODELS']['olg_params'])
     pil.countries = ['israel']
     pil.init_infected = 100
-    olgil = OLG(country_df, pil, have_serious_data=False)
-    ddil = olgil.df.copy()
+    ddil = cached_olg(olg_cache, country_df, pil, have_serious_data=False)
 
     # coronadays = st.checkbox("Show axis as number of days since outbreak", True)
     st.altair_chart(
@@ -90,8 +90,7 @@ def write():
     if len(pil.countries) > 0:
         # pil.init_infected = st.number_input("Select min corona cases for Yishuv", min_value=10, value=25)
         pil.init_infected = 25
-        olgil = OLG(israel_yishuv_olg_df, pil, have_serious_data=False)
-        ddil = olgil.df.copy()
+        ddil = cached_olg(olg_cache, israel_yishuv_olg_df, pil, have_serious_data=False)
         # coronadays = st.checkbox("Show axis as number of days since outbreak", True)
         st.altair_chart(
             olg_projections_chart(alt, ddil.loc[
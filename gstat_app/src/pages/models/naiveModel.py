@@ -5,11 +5,15 @@ from src.shared.charts.charts_olg import *
 import altair as alt
 from src.shared.utils import get_table_download_link
 import pandas as pd
-from src.shared.settings import DEFAULTS, load_stringency, user_session_id
-import numpy as np
+from src.shared.settings import DEFAULTS, load_stringency, user_session_id, olg_cache, country_data_version
 # from src.shared.models.data import CountryData
 # from src.shared.settings import DEFAULTS, load_data, user_session_id
 
+SCENARIOS = {"Pessimistic (Countries with second wave)": ["Iran", "Germany", "Australia"],
+             "Average": ["Hong Kong", "Singapore", "China", "South Korea", "Switzerland", "Iran", "Germany", "Australia"],
+             "Optimistic (Countries without second wave)": ["China", "South Korea", "Switzerland"]}
+
+
 def display_filtes(filters_dict):
     filters_dict['stringency_range'] = st.sidebar.slider("Choose Stringency Range", 20., 100., (45., 90.))
     return filters_dict
@@ -33,7 +37,9 @@ def write():
 
     # naive_params = display_sidebar(naive_params)
     p = OLGParameters(**olg_params)
-    model = naiveModel(data, p)
+    model = naiveModel(data, p, olg_cache, data_version=country_data_version(DEFAULTS))
+    # the scenario curves are asked for on almost every render, have them ready
+    model.precompute_curves(SCENARIOS.values())
     df_r = model.df.copy()
     # sgidx = StringencyIndexNaive("Israel")
 
@@ -46,25 +52,34 @@ def write():
             'C5_Close public transport':2., 'C6_Stay at home requirements':3., 'C7_Restrictions on internal movement':2.,
             'C8_International travel controls':4.}
 
-    chose_options = ["Gstat Scenarios", "Choose by SringencyIndex Range", "Choose by SringencyIndex Values"]
+    chose_options = ["Gstat Scenarios", "Choose by SringencyIndex Range", "Choose by SringencyIndex Values",
+                     "Analogue Countries"]
     st.sidebar.subheader("Choose Comparison Method")
     chosen = st.sidebar.radio("", chose_options, 0)
+    curve = None
     if chosen=="Choose by SringencyIndex Range":
         filters_dict = display_filtes(filters_dict)
-        cond = ((df_r['corona_days'] - model.israel_day).between(*filters_dict['days_range'])) & \
-               (df_r['StringencyIndexForDisplay'].between(*filters_dict['stringency_range']))
-        countryList = list(df_r.loc[cond]['CountryName'].unique())
+        first_day, last_day = (model.israel_day + d for d in filters_dict['days_range'])
+        countryList = model.country_index().stringency_range(first_day, last_day, *filters_dict['stringency_range'])
     elif chosen=="Choose by SringencyIndex Values":
-        all_masks = []
-        condition = (df_r['corona_days'] - model.israel_day).between(*filters_dict['days_range'])
-        all_masks.append(condition)
+        first_day, last_day = (model.israel_day + d for d in filters_dict['days_range'])
         indices = st.sidebar.multiselect("Choose Index", list(indices_dict.keys()), ['C1_School closing'])
         for ix in indices:
             indices_dict[ix] = st.sidebar.number_input(ix, value=2.0, min_value=0.0, max_value=indices_max[ix], step=1.0)
-            condition = (df_r[ix] == indices_dict[ix])
-            all_masks.append(condition)
-        mask = np.array(all_masks).all(axis=0)
-        countryList = list(df_r.loc[mask]['CountryName'].unique())
+        countryList = model.country_index().query(first_day, last_day, equal={ix: indices_dict[ix] for ix in indices})
+    elif chosen=="Analogue Countries":
+        k = st.sidebar.slider("Number of countries", 1, 15, 5)
+        window = st.sidebar.slider("Days of Israel's R to match", 7, 60, 14)
+        stringency_weight = st.sidebar.slider("Weight of Stringency Index", 0., 10., 0.)
+        band = st.sidebar.slider("Time warping (days, 0 for none)", 0, 7, 0)
+        horizon = st.sidebar.slider("Days to project", 7, 60, 30)
+        # only countries with horizon days after their match qualify, each continues from its own match
+        analogues = model.analogues(k, window, stringency_weight, band or None, horizon)
+        st.write(analogues)
+        if not len(analogues):
+            st.warning("No country has %d days of data after a matching window" % horizon)
+        countryList = list(analogues['CountryName'])
+        curve = model.analogue_curve(analogues, window, horizon)
     elif chosen=="Gstat Scenarios":
         st.subheader("Choose scenario")
         scenario = st.selectbox("", ["Pessimistic (Countries with second wave)", "Average", "Optimistic (Countries without second wave)"], 1)
@@ -76,14 +91,10 @@ def write():
                         "experienced a second wave (China, South Korea and Switzerland).")
         if scenario == "Average":
             st.markdown("**Note:** Development of rate of infection in Israel will continue as an average of multiple countries.")
-        scenario_dict = {"Pessimistic (Countries with second wave)": ["Iran", "Germany", "Australia"],
-                         "Average": ["Hong Kong", "Singapore", "China", "South Korea", "Switzerland", "Iran", "Germany", "Australia"],
-                         "Optimistic (Countries without second wave)": ["China", "South Korea", "Switzerland"]}
-
-        countryList = scenario_dict[scenario]
+        countryList = SCENARIOS[scenario]
 
 
-    pred = model.predict(countryList)
+    pred = model.predict(countryList, curve)
     dd = model.write(pred, olg_params['critical_condition_rate'], olg_params['recovery_rate'],  olg_params['critical_condition_time'], olg_params['recovery_time'])
     # critical_condition_rate, recovery_rate, critical_condition_time, recovery_time
     dd = dd.rename(columns={'Date': 'date', 'CountryName': 'country'})
@@ -1,10 +1,14 @@
 import streamlit as st
 from src.shared.models.model_olg import *
+from src.shared.models.olg_panel import cached_olg, cached_monte_carlo
 from src.shared.models.data import CountryData
 from src.shared.charts.charts_olg import *
 from src.shared.utils import get_table_download_link
 import altair as alt
-from src.shared.settings import DEFAULTS, load_data, user_session_id
+from src.shared.settings import DEFAULTS, load_data, user_session_id, olg_cache, load_reference_curves, \
+    olg_calibration
+
+BUILT_IN_REFERENCE = 'Hubei (built in)'
 
 def display_sidebar(olg_params):
         st.sidebar.subheader("GSTAT Model parameters")
@@ -76,10 +80,16 @@ def display_sidebar(olg_params):
 
 def write():
     #-------------------Init Data and Params------------------
-    olg_params = DEFAULTS['MODELS']['olg_params']
+    olg_params = DEFAULTS['MODELS']['olg_params'].copy()
     sgidx = StringencyIndex("Israel")
     country_df, _, _, _, _, _, _ = load_data(DEFAULTS, user_session_id)
     # -------------------Sidebar logic-------------------------
+    if 'israel' in olg_calibration.index and st.sidebar.checkbox("Use calibrated parameters", False):
+        calibrated = olg_calibration.loc['israel']
+        olg_params['critical_condition_rate'] = float(calibrated['critical_condition_rate'])
+        olg_params['recovery_rate'] = float(calibrated['recovery_rate'])
+        olg_params['critical_condition_time'] = int(calibrated['critical_condition_time'])
+        olg_params['recovery_time'] = int(calibrated['recovery_time'])
     if st.sidebar.checkbox("Change Model Parameters", False):
         olg_params = display_sidebar(olg_params)
 
@@ -103,9 +113,19 @@ def write():
 
     stringency = sgidx.output_df[['date', 'StringencyIndex']]
 
+    curves = load_reference_curves(DEFAULTS, p.tau)
+    # the built in Hubei curve of OLG.get_hubei unless another reference is picked
+    reference = st.sidebar.selectbox("Reference curve", [BUILT_IN_REFERENCE] + curves.names, 0)
+    r_reference = None if reference == BUILT_IN_REFERENCE else curves.get(reference)
+
     p.countries = ['israel']
-    olg = OLG(country_df, p, have_serious_data=True)
-    dd = olg.df.copy()
+    dd = cached_olg(olg_cache, country_df, p, have_serious_data=True, r_reference=r_reference)
+    bands = None
+    if st.sidebar.checkbox("Show uncertainty bands", False):
+        spread = st.sidebar.slider("Parameter uncertainty (relative sd)", 0.01, 0.5, 0.1, 0.01)
+        n_draws = st.sidebar.number_input("Monte Carlo draws", min_value=100, value=10000, step=1000, format="%i")
+        bands = cached_monte_carlo(olg_cache, country_df, p, 'israel', n_draws=n_draws, spread=spread,
+                                   have_serious_data=True, r_reference=r_reference)
     # ddd
 
     st.altair_chart(
@@ -123,7 +143,7 @@ def write():
     st.altair_chart(
         olg_projections_chart(alt,
                               dd.loc[:, ['date', 'corona_days', 'country', 'prediction_ind'] + olg_cols_select],
-                              "GSTAT Model Projections", False),
+                              "GSTAT Model Projections", False, bands=bands),
         use_container_width=True,
     )
     if st.checkbox("Show Projection Data", False):
@@ -132,7 +152,7 @@ def write():
 
     st.altair_chart(
         olg_projections_chart(alt, dd[['date', 'corona_days', 'country', 'prediction_ind', 'R']],
-                              "Rate of Infection"),
+                              "Rate of Infection", bands=bands),
         use_container_width=True,
     )
 
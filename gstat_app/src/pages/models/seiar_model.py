@@ -0,0 +1,58 @@
+import streamlit as st
+from src.shared.models.model_seiar import Seiar, SeiarParameters
+from src.shared.settings import DEFAULTS
+
+
+def seiar_parameters(d, model_checkpoints=None):
+    return SeiarParameters(N=d['N_0'], S_0=d['S_0'], E_0=d['E_0'], I_0=d['I_0'], A_0=d['A_0'], R_0=d['R_0'],
+                           alpha=d['seiar_alpha'], beta_ill=d['seiar_beta_ill'], beta_asy=d['seiar_beta_asy'],
+                           gamma_ill=d['seiar_gamma_ill'], gamma_asy=d['seiar_gamma_asy'], rho=d['seiar_rho'],
+                           theta=d['seiar_theta'], start_date_simulation=d['seiar_start_date_simulation'],
+                           number_of_days=d['seiar_number_of_days'], model_checkpoints=model_checkpoints)
+
+
+def display_sidebar(st, d):
+    d = dict(d)
+    for k, v in d.items():
+        if k == 'seiar_start_date_simulation':
+            d[k] = st.sidebar.date_input("Start date", v)
+        elif k == 'seiar_number_of_days':
+            d[k] = st.sidebar.number_input("Days to project?", value=int(v), min_value=1, format="%i")
+        elif k.find('_0') > -1:
+            d[k] = st.sidebar.number_input(k, min_value=0.0, max_value=100000000.0, value=v, step=10.0, format="%f")
+        else:
+            d[k] = st.sidebar.number_input(k.replace('seiar_', ''), min_value=0.0, max_value=100.0, value=v,
+                                           step=0.01, format="%f")
+
+    model_checkpoints = None
+    if st.sidebar.checkbox("Make a projection", value=False, key=15):
+        s_times = st.sidebar.text_input('Insert array of times', value='20, 50', key=16)
+        s_betas = st.sidebar.text_input('Insert percentage change in betas', value='0.2, 0.7', key=17)
+        s_times = [int(s) for s in s_times.split(",")]
+        s_betas = [float(s) for s in s_betas.split(",")]
+        beta_ill, beta_asy = d['seiar_beta_ill'], d['seiar_beta_asy']
+        betas_ill, betas_asy = [], []
+        for s in s_betas:
+            beta_ill, beta_asy = beta_ill * (1 + s), beta_asy * (1 + s)
+            betas_ill.append(beta_ill)
+            betas_asy.append(beta_asy)
+        model_checkpoints = {'time_ill': s_times, 'beta_ill': betas_ill, 'time_asy': s_times, 'beta_asy': betas_asy}
+    return seiar_parameters(d, model_checkpoints)
+
+
+def write():
+    # -------------------Sidebar logic-------------------------
+    seiar_params = DEFAULTS['MODELS']['seiar_params']
+    p = seiar_parameters(seiar_params)
+    if st.sidebar.checkbox("Change Model Parameters", False):
+        p = display_sidebar(st, seiar_params)
+
+    st.subheader("SEIAR Model")
+
+    model = Seiar(p)
+    df = model.results
+
+    cols = st.multiselect("Choose columns:", list(df.columns), ['Infected', 'Asymptomatic', 'Exposed'])
+    if st.checkbox("Percent", True):
+        df = df / p.N
+    st.line_chart(df[cols])
@@ -0,0 +1,163 @@
+import time
+import streamlit as st
+import networkx
+import numpy as np
+import pandas as pd
+from seirsplus.models import SEIRSNetworkModel
+from src.shared.cache import MISSING, make_key
+from src.shared.models.network_seirs import NETWORK_COMPARTMENTS, NetworkSeirs, load_contact_graph, replicate
+from src.shared.models.replicates import run_replicates
+from src.shared.settings import DEFAULTS, seirs_cache
+
+# SEIRSNetworkModel is O(events x nodes) and keeps dense per-node state, past this it is the tau-leap only
+EXACT_MAX_NODES = 5000
+ENGINES = ["Tau-leap (batched draws)", "seirsplus SEIRSNetworkModel (exact)"]
+# settings that change how long a run may take, not its result
+RUN_SETTINGS = ('time_budget', 'workers')
+
+
+def display_sidebar(st, d):
+    d = dict(d, graph=dict(d['graph']), params=dict(d['params']))
+    d['population'] = int(st.sidebar.number_input("Population (nodes)", min_value=100, max_value=1000000,
+                                                   value=int(d['population']), step=1000, format="%i"))
+    d['time_steps'] = int(st.sidebar.number_input("Days to project?", value=int(d['time_steps']), format="%i"))
+    d['time_budget'] = st.sidebar.number_input("Time budget (seconds)", min_value=1.0, max_value=600.0,
+                                               value=float(d['time_budget']), step=10.0)
+    d['seed'] = int(st.sidebar.number_input("Random seed", value=int(d['seed']), format="%i"))
+    d['replicates'] = int(st.sidebar.number_input("Replicates", min_value=1, max_value=1000,
+                                                  value=int(d['replicates']), format="%i"))
+    for k in ['employed', 'workplace_size', 'work_contacts', 'community_degree']:
+        d['graph'][k] = st.sidebar.number_input(k, min_value=0.0, max_value=100.0, value=float(d['graph'][k]),
+                                                step=0.1, format="%f")
+    d['graph']['work_contacts'] = int(d['graph']['work_contacts'])
+    for k, v in d['params'].items():
+        if k.find('init') > -1:
+            d['params'][k] = int(st.sidebar.number_input(k, min_value=0, max_value=d['population'], value=int(v),
+                                                         step=10, format="%i"))
+        else:
+            d['params'][k] = st.sidebar.number_input(k, min_value=0.0, max_value=100.0, value=float(v), step=0.01,
+                                                     format="%f")
+
+    d['checkpoints'] = None
+    if st.sidebar.checkbox("Make a projection", value=False, key=25):
+        s_times = st.sidebar.text_input('Insert array of times', value='20, 50', key=26)
+        s_betas = st.sidebar.text_input('Insert percentage change in betas', value='0.2, 0.7', key=27)
+        beta = d['params']['beta']
+        betas = []
+        for s in s_betas.split(","):
+            beta = beta * (1 + float(s))
+            betas.append(beta)
+        d['checkpoints'] = {'t': [int(s) for s in s_times.split(",")], 'beta': betas}
+    return d
+
+
+def run_exact(A, params, T, checkpoints=None, time_budget=None, progress=None):
+    """The same run on seirsplus's SEIRSNetworkModel, one Gillespie event per iteration."""
+    start = time.perf_counter()
+    model = SEIRSNetworkModel(G=networkx.from_scipy_sparse_matrix(A), **params)
+    model.tmax = T
+    checkpoints = dict(checkpoints or {})
+    times = list(checkpoints.pop('t', []))
+    running, truncated, iteration = True, False, 0
+    while running:
+        running = model.run_iteration()
+        while times and model.t >= times[0]:
+            for k, values in checkpoints.items():
+                setattr(model, k, np.full((model.numNodes, 1), values[0]))
+                checkpoints[k] = values[1:]
+            times.pop(0)
+            model.update_scenario_flags()
+        iteration += 1
+        if running and iteration % 1000 == 0:
+            if progress:
+                progress(min(model.t / T, 1.))
+            if time_budget and time.perf_counter() - start > time_budget:
+                model.finalize_data_series()
+                truncated = True
+                break
+    days = np.arange(int(min(model.t, T)) + 1 if truncated else int(np.ceil(T)) + 1)
+    idx = np.searchsorted(model.tseries, days, side='right') - 1
+    return pd.DataFrame({c: getattr(model, 'num' + c)[idx] for c in NETWORK_COMPARTMENTS}), truncated
+
+
+def run_network(d, engine, progress=None):
+    """Compartment counts by day for the scenario d, and whether the time budget cut the run short."""
+    A = load_contact_graph(DEFAULTS['CACHE']['contact_graphs']['disk_dir'], d['population'], d['seed'],
+                           **d['graph'])
+    if engine == ENGINES[1]:
+        return run_exact(A, d['params'], d['time_steps'], d.get('checkpoints'), d['time_budget'], progress)
+    model = NetworkSeirs(A, d['params'], seed=d['seed'])
+    return model.run(d['time_steps'], dt=d['dt'], checkpoints=d.get('checkpoints'), time_budget=d['time_budget'],
+                     progress=progress)
+
+
+def run_bands(d, progress=None):
+    """5 / 50 / 95 percentile bands of d['replicates'] tau-leap runs, and how many runs the time budget allowed."""
+    disk_dir = DEFAULTS['CACHE']['contact_graphs']['disk_dir']
+    # built and saved once here, the workers load it from disk_dir
+    load_contact_graph(disk_dir, d['population'], d['seed'], **d['graph'])
+    stream = run_replicates(replicate, (disk_dir, d), range(d['replicates']), workers=d.get('workers'),
+                            time_budget=d['time_budget'], progress=progress)
+    return stream.frame(NETWORK_COMPARTMENTS), stream.count
+
+
+def write_bands(d):
+    key = make_key('seirs_network_bands', {k: v for k, v in d.items() if k not in RUN_SETTINGS})
+    bands = seirs_cache.get(key)
+    if bands is MISSING:
+        bar = st.progress(0)
+        bands, count = run_bands(d, progress=lambda done: bar.progress(int(done * 100)))
+        bar.empty()
+        if count == d['replicates']:
+            seirs_cache.put(key, bands)
+        else:
+            st.warning(f"Only {count} of {d['replicates']} replicates ran within the time budget of "
+                       f"{d['time_budget']:.0f} seconds.")
+
+    col = st.selectbox("Compartment:", NETWORK_COMPARTMENTS, NETWORK_COMPARTMENTS.index('I'))
+    bands = bands[[c for c in bands.columns if c.split(' ')[0] == col]]
+    if st.checkbox("Percent", True):
+        bands = bands / d['population']
+    st.line_chart(bands)
+
+
+def write():
+    # -------------------Sidebar logic-------------------------
+    d = DEFAULTS['MODELS']['seirs_network']
+    if st.sidebar.checkbox("Change Model Parameters", False):
+        d = display_sidebar(st, d)
+    engine = st.sidebar.selectbox("Engine", ENGINES if d['population'] <= EXACT_MAX_NODES else ENGINES[:1])
+
+    st.subheader("SEIRs Plus Network Model")
+    st.markdown(
+        f"Stochastic SEIRS on a contact network of {d['population']:,} people: households, "
+        "workplaces and random community contacts."
+    )
+
+    if d['replicates'] > 1 and engine == ENGINES[0]:
+        write_bands(d)
+        return
+
+    # runs cut short by the time budget are shown but not cached, a longer budget can finish them
+    key = make_key('seirs_network', engine, {k: v for k, v in d.items() if k not in RUN_SETTINGS + ('replicates',)})
+    result = seirs_cache.get(key)
+    if result is MISSING:
+        bar = st.progress(0)
+        df, truncated = run_network(d, engine, progress=lambda done: bar.progress(int(done * 100)))
+        bar.empty()
+        if not truncated:
+            seirs_cache.put(key, df)
+    else:
+        df, truncated = result, False
+    if truncated:
+        st.warning(f"Stopped after {len(df) - 1} of {d['time_steps']} days, the time budget of "
+                   f"{d['time_budget']:.0f} seconds ran out.")
+
+    cols = st.multiselect("Choose columns:", list(df.columns), ['E', 'I', 'D_E', 'D_I', 'R'])
+    if st.checkbox("Percent", True):
+        df = df / d['population']
+    st.line_chart(df[cols])
+
+    st.markdown(
+    "*Network dynamics of [SEIRs Plus](https://github.com/ryansmcgee/seirsplus) SEIRSNetworkModel*"
+    )
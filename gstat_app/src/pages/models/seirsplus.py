@@ -1,7 +1,13 @@
+import copy
 import streamlit as st
 from seirsplus.models import SEIRSModel
+import numpy as np
 import pandas as pd
-from src.shared.settings import DEFAULTS
+from src.shared.cache import make_key
+from src.shared.models.seir_calibration import latest_rates
+from src.shared.settings import DEFAULTS, seirs_cache, seir_rates
+
+SEIRS_COMPARTMENTS = ['S', 'E', 'I', 'D_E', 'D_I', 'R', 'F']
 
 
 class SEIRSParamaters():
@@ -56,9 +62,34 @@ def display_sidebar(st, d):
     return SEIRSParamaters(seirs_plus_params=seirs_plus_params, model_checkpoints=projection_path, time_steps=time_steps)
 
 
+def run_seirs(p: SEIRSParamaters):
+    model = SEIRSModel(**p.seirs_plus_params)
+    if p.model_checkpoints:
+        # run fills in every parameter, keep the defaults and the cache key as they were
+        model.run(T=p.time_steps, checkpoints=copy.deepcopy(p.model_checkpoints))
+    else:
+        model.run(T=p.time_steps)
+    counts = np.stack([getattr(model, 'num' + c) for c in SEIRS_COMPARTMENTS]).astype(np.float32)
+    return model.tseries, counts, float(model.N[0])
+
+
+def cached_seirs(cache, p: SEIRSParamaters):
+    """SEIRSModel run through a ResultCache, so widgets that only change the display never rerun it."""
+    key = make_key('seirs', p.seirs_plus_params, p.model_checkpoints, p.time_steps)
+    tseries, counts, N = cache.get_or_compute(key, run_seirs, p)
+    return pd.DataFrame(dict(zip(SEIRS_COMPARTMENTS, counts)), index=tseries), N
+
+
 def write():
     # -------------------Sidebar logic-------------------------
     seirs_plus = DEFAULTS['MODELS']['seirs_plus']
+    seirs_plus = dict(seirs_plus, seirs_plus_params=dict(seirs_plus['seirs_plus_params']))
+    if len(seir_rates) and st.sidebar.checkbox("Use calibrated rates", False):
+        countries = sorted(seir_rates.index.unique())
+        country = st.sidebar.selectbox("Country:", countries,
+                                       countries.index('israel') if 'israel' in countries else 0)
+        # rates of the country's last window, fit by gstat_app/calibrate_seir.py
+        seirs_plus['seirs_plus_params'].update(latest_rates(seir_rates, country) or {})
     p = SEIRSParamaters(**seirs_plus)
     if st.sidebar.checkbox("Change Model Parameters", False):
         p = display_sidebar(st, seirs_plus)
@@ -66,22 +97,11 @@ def write():
     st.subheader("SEIRs Plus")
 
 
-    model = SEIRSModel(**p.seirs_plus_params)
-    # st.write(p.model_checkpoints)
-    # st.write(p.time_steps)
-    if p.model_checkpoints:
-        model.run(T=p.time_steps, checkpoints=p.model_checkpoints)
-    else:
-        model.run(T=p.time_steps)
-
-    df = pd.DataFrame(
-        {'S': model.numS, 'E': model.numE, 'I': model.numI, 'D_E': model.numD_E, 'D_I': model.numD_I, 'R': model.numR,
-         'F': model.numF}, index=model.tseries)
+    df, N = cached_seirs(seirs_cache, p)
 
     cols = st.multiselect("Choose columns:", list(df.columns), list(df.columns))
     if st.checkbox("Percent", True):
-        print(model.N)
-        df = df/model.N[0]
+        df = df/N
     st.line_chart(df[cols])
 
     st.markdown(
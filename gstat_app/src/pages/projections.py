@@ -1,13 +1,16 @@
 import streamlit as st
 import src.pages.models.olg_model
 import src.pages.models.seirsplus
+import src.pages.models.seirs_network
 import src.pages.models.naiveModel
+import src.pages.models.seiar_model
 
 MODELS = {
     # "GSTAT Model (Beta Version)": src.pages.models.olg_model,
     "GSTAT Naive Model (Beta Version)": src.pages.models.naiveModel,
     "SEIRs Plus Model": src.pages.models.seirsplus,
-    # "SEIAR Model" : src.pages.models.seair_model
+    "SEIRs Plus Network Model": src.pages.models.seirs_network,
+    "SEIAR Model": src.pages.models.seiar_model,
 }
 
 
@@ -0,0 +1,145 @@
+"""Process-wide result cache shared by every session."""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+MISSING = object()
+
+
+def make_key(*parts):
+    """Content address for a mix of plain values, numpy arrays and DataFrames."""
+    h = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, pd.DataFrame) or isinstance(part, pd.Series):
+            h.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+        elif isinstance(part, np.ndarray):
+            h.update(str(part.dtype).encode())
+            h.update(np.ascontiguousarray(part).tobytes())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode())
+        h.update(b'|')
+    return h.hexdigest()
+
+
+def size_of(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class ResultCache:
+    """
+    In-memory LRU bounded by size, with an optional on-disk tier.
+
+    Arguments:
+        max_mb: memory budget, least recently used entries are evicted past it.
+        disk_dir: if given, entries are also pickled there and survive restarts.
+        max_disk_mb: disk budget, least recently used files are removed past it.
+    """
+
+    def __init__(self, max_mb=256, disk_dir=None, max_disk_mb=1024):
+        self.max_bytes = int(max_mb * 2 ** 20)
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = int(max_disk_mb * 2 ** 20)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+        value = self.read_disk(key)
+        with self.lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+        if value is not MISSING:
+            self.put_memory(key, value)
+        return value
+
+    def put(self, key, value):
+        self.put_memory(key, value)
+        self.write_disk(key, value)
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        value = self.get(key)
+        if value is MISSING:
+            value = func(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def put_memory(self, key, value):
+        size = size_of(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted
+                self.evictions += 1
+
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.pkl')
+
+    def read_disk(self, key):
+        if not self.disk_dir or not os.path.exists(self.disk_path(key)):
+            return MISSING
+        try:
+            with open(self.disk_path(key), 'rb') as f:
+                value = pickle.load(f)
+            # mtime doubles as last access time for disk eviction
+            os.utime(self.disk_path(key))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return MISSING
+        return value
+
+    def write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        # write then rename, so concurrent readers never see half a file
+        tmp_path = self.disk_path(key) + '.%d.tmp' % threading.get_ident()
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.disk_path(key))
+
+        files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith('.pkl')]
+        files = sorted(files, key=os.path.getmtime)
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.max_disk_bytes:
+            oldest = files.pop(0)
+            try:
+                total -= os.path.getsize(oldest)
+                os.remove(oldest)
+            except OSError:
+                # already evicted by another thread
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {'entries': len(self.entries), 'mb': self.total_bytes / 2 ** 20, 'hits': self.hits,
+                    'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.}
@@ -4,12 +4,26 @@ import streamlit as st
 
 
 # @st.cache(allow_output_mutation=True)
-def olg_projections_chart(alt, df: pd.DataFrame, title: str, by_corona_time=True, baseline=False):
+def olg_projections_chart(alt, df: pd.DataFrame, title: str, by_corona_time=True, baseline=False, bands=None):
+    """bands: optional OLGPanel.monte_carlo output, drawn as lower-upper areas behind the plotted columns."""
     olg_cols = df.columns
     olg_cols = [c for c in olg_cols if c not in ['date', 'corona_days', 'country', 'prediction_ind']]
     olg_df = df.melt(id_vars=['date', 'corona_days', 'country', 'prediction_ind'], value_vars=olg_cols).dropna()
     if by_corona_time == False:
         olg_df['corona_days'] = olg_df['date']
+    layers = []
+    if bands is not None:
+        bands_df = bands.loc[bands['variable'].isin(olg_cols), :].dropna().copy()
+        if by_corona_time == False:
+            bands_df['corona_days'] = bands_df['date']
+        layers.append(alt.Chart(bands_df).transform_calculate(
+            cat="datum.country + '-' + datum.variable"
+        ).mark_area(opacity=0.2).encode(
+            x='corona_days',
+            y=alt.Y('lower', title=""),
+            y2='upper',
+            color=alt.Color('cat:N', title=None, legend=alt.Legend(orient="top", title='')),
+        ))
     line1 = alt.Chart(olg_df.loc[olg_df['prediction_ind'] == 0, :]).transform_calculate(
         cat="datum.country + '-' + datum.variable"
     ).mark_line(interpolate='basis', point=False, tooltip=True).encode(
@@ -62,11 +76,11 @@ def olg_projections_chart(alt, df: pd.DataFrame, title: str, by_corona_time=True
             # color='symbol',
             size=alt.value(0.5)
         )
-        return alt.layer(line1, line2, rule, selectors, text, text2, rules).properties(
+        return alt.layer(*layers, line1, line2, rule, selectors, text, text2, rules).properties(
             width=600, height=300, title=title
         ).interactive()
     else:
-        return alt.layer(line1, line2, selectors, text, text2, rules).properties(
+        return alt.layer(*layers, line1, line2, selectors, text, text2, rules).properties(
             width=600, height=300, title=title
         ).interactive()
 
@@ -0,0 +1,124 @@
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from numpy.lib.stride_tricks import as_strided  # type: ignore
+
+
+def windows(a, length):
+    """Read-only view of every length long window along the last axis of a, (..., n - length + 1, length)."""
+    a = np.asarray(a)
+    shape = a.shape[:-1] + (a.shape[-1] - length + 1, length)
+    return as_strided(a, shape, a.strides + a.strides[-1:], writeable=False)
+
+
+def znorm(windows):
+    """z-normalize along the last axis, a flat window stays all zero."""
+    std = windows.std(axis=-1, keepdims=True)
+    return (windows - windows.mean(axis=-1, keepdims=True)) / np.where(std > 0, std, 1)
+
+
+def envelope(query, band):
+    """Upper and lower envelope of query within band days, for LB_Keogh."""
+    padded = np.pad(query, band, mode='edge')
+    spans = windows(padded, 2 * band + 1)
+    return spans.max(axis=1), spans.min(axis=1)
+
+
+def dtw(query, candidate, band, cutoff=np.inf):
+    """Squared DTW distance within a Sakoe-Chiba band, inf once every path exceeds cutoff."""
+    n = len(query)
+    prev = np.full(n + 1, np.inf)
+    prev[0] = 0.
+    for i in range(n):
+        cost = (query[i] - candidate) ** 2
+        cur = np.full(n + 1, np.inf)
+        lo, hi = max(0, i - band), min(n, i + band + 1)
+        for j in range(lo, hi):
+            cur[j + 1] = cost[j] + min(prev[j], prev[j + 1], cur[j])
+        if cur.min() > cutoff:
+            return np.inf
+        prev = cur
+    return prev[n]
+
+
+class AnalogueSearch:
+    """
+    Countries whose R trajectory best matches a query window, over every country and offset.
+
+    Trajectories are r_adjn by corona day (optionally with StringencyIndexForDisplay), laid
+    out as a (country x day) panel. Every window of the query length is a candidate; its
+    distance to the query is the Euclidean distance of the z-normalized r_adjn windows,
+    plus stringency_weight times the squared distance of the stringency paths (in 0 - 1).
+    With band, the r_adjn part is a banded DTW instead, pruned by LB_Keogh and abandoned
+    early against the current k-th best country.
+    """
+
+    def __init__(self, df, stringency_col='StringencyIndexForDisplay'):
+        self.countries = np.asarray(pd.unique(df['CountryName']))
+        country_id = pd.Categorical(df['CountryName'], categories=self.countries).codes
+        days = df['corona_days'].values.astype(int)
+        n_days = int(days.max()) + 1 if len(df) else 0
+        self.r = np.full((len(self.countries), n_days), np.nan)
+        self.r[country_id, days] = df['r_adjn'].values
+        self.stringency = np.full((len(self.countries), n_days), np.nan)
+        if stringency_col in df:
+            self.stringency[country_id, days] = df[stringency_col].values / 100
+
+    def query(self, country, last_day, window):
+        i = list(self.countries).index(country)
+        days = slice(last_day - window + 1, last_day + 1)
+        return self.r[i, days], self.stringency[i, days]
+
+    def search(self, query_r, query_stringency=None, k=5, stringency_weight=0., band=None, horizon=1,
+               exclude=()):
+        """The k best matching countries, with the first corona day and distance of their best window.
+
+        Arguments:
+            query_r, query_stringency: the window to match.
+            horizon: days of data a country needs after its window, to say something about the future.
+            exclude: countries left out, e.g. the query country itself.
+        """
+        window = len(query_r)
+        query_r = znorm(np.asarray(query_r, dtype=float))
+        n_off = self.r.shape[1] - window - horizon + 1
+        if n_off <= 0:
+            return pd.DataFrame({'CountryName': [], 'corona_days': [], 'distance': []})
+        r_windows = windows(self.r, window)[:, :n_off]
+        # a window is a candidate if it and the horizon after it are all observed
+        observed = windows(~np.isnan(self.r), window + horizon)[:, :n_off].all(axis=-1)
+        observed[np.isin(self.countries, list(exclude))] = False
+        rows, offsets = np.nonzero(observed)
+        candidates = znorm(r_windows[rows, offsets])
+
+        extra = np.zeros(len(rows))
+        if stringency_weight and query_stringency is not None:
+            s_windows = windows(self.stringency, window)[rows, offsets]
+            extra = stringency_weight * np.nansum((s_windows - np.asarray(query_stringency)) ** 2, axis=1)
+
+        if band is None:
+            distance = ((candidates - query_r) ** 2).sum(axis=1) + extra
+            best = pd.DataFrame({'row': rows, 'corona_days': offsets, 'distance': distance})
+            best = best.sort_values('distance', kind='mergesort').drop_duplicates('row').head(k)
+        else:
+            best = self.search_dtw(query_r, candidates, rows, offsets, extra, k, band)
+        best['distance'] = np.sqrt(best['distance'].values)
+        best.insert(0, 'CountryName', self.countries[best['row'].values])
+        return best.drop(columns='row').reset_index(drop=True)
+
+    @staticmethod
+    def search_dtw(query_r, candidates, rows, offsets, extra, k, band):
+        upper, lower = envelope(query_r, band)
+        lower_bound = (np.where(candidates > upper, candidates - upper, 0) ** 2
+                       + np.where(candidates < lower, lower - candidates, 0) ** 2).sum(axis=1) + extra
+        best = {}
+        for c in np.argsort(lower_bound, kind='mergesort'):
+            kth = sorted(d for d, _ in best.values())[k - 1] if len(best) >= k else np.inf
+            if lower_bound[c] >= kth:
+                break
+            if rows[c] in best and best[rows[c]][0] <= lower_bound[c]:
+                continue
+            cutoff = min(kth, best[rows[c]][0] if rows[c] in best else np.inf) - extra[c]
+            distance = dtw(query_r, candidates[c], band, cutoff) + extra[c]
+            if distance < best.get(rows[c], (np.inf,))[0]:
+                best[rows[c]] = (distance, offsets[c])
+        best = pd.DataFrame([(r, o, d) for r, (d, o) in best.items()], columns=['row', 'corona_days', 'distance'])
+        return best.sort_values('distance', kind='mergesort').head(k)
@@ -0,0 +1,155 @@
+import numpy as np  # type: ignore
+from scipy.integrate import odeint  # type: ignore
+
+# Array versions of SIR, SEIR, SEIR_B and SEIR_B_zoo from ModelsCode/SEIR_MCMC/models.py (with
+# Lamda = mu = 0 and r = 1 where those fix them). A state y is (k,) for one run or (k, m) for m
+# runs at once, and every rate is a scalar or an (m,) array broadcast against y[0].
+SIR_STATES = ['S', 'I', 'R']
+SEIR_STATES = ['S', 'E', 'I', 'R']
+SEIR_ZOO_STATES = ['S', 'E', 'I', 'R', 'F']
+
+
+def mass_action(beta, S, X, N, k, s, x, in_n):
+    """beta * S * X / N and its gradient over the k states.
+
+    Arguments:
+        s, x: indices of S and X in the state.
+        in_n: indices of the states N sums over.
+    """
+    f = beta * S * X / N
+    grad = np.zeros((k,) + np.shape(f))
+    grad[in_n] -= f / N
+    grad[s] += beta * X / N
+    grad[x] += beta * S / N
+    return f, grad
+
+
+def beta_at(t, beta_times, beta_values):
+    """beta(t) linearly interpolated from (beta_times, beta_values), constant outside them.
+
+    beta_values is (n_times,) or (n_times x m) for a path per run.
+    """
+    beta_values = np.asarray(beta_values, dtype=float)
+    if len(beta_times) == 1:
+        return beta_values[0]
+    i = min(max(np.searchsorted(beta_times, t, side='right') - 1, 0), len(beta_times) - 2)
+    w = min(max((t - beta_times[i]) / (beta_times[i + 1] - beta_times[i]), 0.), 1.)
+    return beta_values[i] * (1 - w) + beta_values[i + 1] * w
+
+
+def sir_rhs(y, t, beta, gamma):
+    """d(S, I, R)/dt."""
+    S, I, R = y
+    infection = beta * S * I / (S + I + R)
+    recovery = gamma * I
+    return np.array([-infection, infection - recovery, recovery])
+
+
+def sir_jacobian(y, t, beta, gamma):
+    """d sir_rhs / d y, (3 x 3) or (3 x 3 x m)."""
+    S, I, R = y
+    _, df = mass_action(beta, S, I, S + I + R, 3, 0, 1, [0, 1, 2])
+    J = np.zeros((3,) + df.shape)
+    J[0] = -df
+    J[1] = df
+    J[1, 1] -= gamma
+    J[2, 1] += gamma
+    return J
+
+
+def seir_rhs(y, t, beta, gamma, eps):
+    """d(S, E, I, R)/dt."""
+    S, E, I, R = y
+    infection = beta * S * I / (S + E + I + R)
+    progression = eps * E
+    recovery = gamma * I
+    return np.array([-infection, infection - progression, progression - recovery, recovery])
+
+
+def seir_jacobian(y, t, beta, gamma, eps):
+    """d seir_rhs / d y, (4 x 4) or (4 x 4 x m)."""
+    S, E, I, R = y
+    _, df = mass_action(beta, S, I, S + E + I + R, 4, 0, 2, [0, 1, 2, 3])
+    J = np.zeros((4,) + df.shape)
+    J[0] = -df
+    J[1] = df
+    J[1, 1] -= eps
+    J[2, 1] += eps
+    J[2, 2] -= gamma
+    J[3, 2] += gamma
+    return J
+
+
+def seir_b_rhs(y, t, beta_times, beta_values, gamma, eps):
+    """SEIR with beta(t) interpolated from (beta_times, beta_values)."""
+    return seir_rhs(y, t, beta_at(t, beta_times, beta_values), gamma, eps)
+
+
+def seir_b_jacobian(y, t, beta_times, beta_values, gamma, eps):
+    return seir_jacobian(y, t, beta_at(t, beta_times, beta_values), gamma, eps)
+
+
+def seir_b_zoo_rhs(y, t, beta_times, beta_values, gamma, mu, eps):
+    """
+    d(S, E, I, R, F)/dt, SEIR_B with deaths at rate mu and exposure from a constant reservoir
+    F at the initial beta, beta(0) * S * F / N. N counts S, E, I and R only.
+    """
+    S, E, I, R, F = y
+    N = S + E + I + R
+    beta_values = np.asarray(beta_values, dtype=float)
+    infection = beta_values[0] * S * F / N + beta_at(t, beta_times, beta_values) * S * I / N
+    progression = eps * E
+    recovery = gamma * I
+    return np.array([-infection - mu * S, infection - progression - mu * E, progression - recovery - mu * I,
+                     recovery - mu * R, np.zeros_like(infection)])
+
+
+def seir_b_zoo_jacobian(y, t, beta_times, beta_values, gamma, mu, eps):
+    S, E, I, R, F = y
+    N = S + E + I + R
+    beta_values = np.asarray(beta_values, dtype=float)
+    _, d_reservoir = mass_action(beta_values[0], S, F, N, 5, 0, 4, [0, 1, 2, 3])
+    _, d_contact = mass_action(beta_at(t, beta_times, beta_values), S, I, N, 5, 0, 2, [0, 1, 2, 3])
+    df = d_reservoir + d_contact
+    J = np.zeros((5,) + df.shape)
+    J[0] = -df
+    J[1] = df
+    for i, rate in enumerate([mu, eps + mu, gamma + mu, mu]):
+        J[i, i] -= rate
+    J[2, 1] += eps
+    J[3, 2] += gamma
+    return J
+
+
+def banded(J):
+    """(k x k x m) per-run Jacobians as odeint's banded storage of the block diagonal, ml = mu = k - 1."""
+    k, _, m = J.shape
+    out = np.zeros((2 * k - 1, k * m))
+    for i in range(k):
+        for j in range(k):
+            out[i - j + k - 1, j::k] = J[i, j]
+    return out
+
+
+def integrate_many(rhs, jacobian, y0, t, args=(), rtol=1e-6, atol=1e-6):
+    """
+    One odeint solve for m runs of a model, (len(t) x k x m).
+
+    The runs are stacked run by run, so the Jacobian of the whole system is block
+    diagonal and goes to LSODA as a band of width 2k - 1.
+
+    Arguments:
+        y0: (k x m) initial states.
+        args: the model's rates after t, scalars or (m,) arrays (and (n_times x m) beta paths).
+    """
+    y0 = np.asarray(y0, dtype=float)
+    k, m = y0.shape
+
+    def f(y, t):
+        return rhs(y.reshape(m, k).T, t, *args).T.ravel()
+
+    def jac(y, t):
+        return banded(np.broadcast_to(jacobian(y.reshape(m, k).T, t, *args), (k, k, m)))
+
+    solution = odeint(f, y0.T.ravel(), t, Dfun=jac, ml=k - 1, mu=k - 1, rtol=rtol, atol=atol)
+    return solution.reshape(len(t), m, k).transpose(0, 2, 1)
@@ -1,5 +1,6 @@
 import pandas as pd
 import streamlit as st
+from src.shared.models import snapshots
 
 
 class CountryData:
@@ -13,6 +14,9 @@ class CountryData:
 
     # @st.cache
     def get_country_data(self):
+        return snapshots.load('country_data', [self.country_files['country_file']], self.read_country_data)
+
+    def read_country_data(self):
         country_df = pd.read_csv(self.country_files['country_file'])
         # country_df = country_df.set_index('Country')
         # country_df = country_df.drop(columns="Unnamed: 0")
@@ -33,6 +37,9 @@ class CountryData:
     #     return country_st_df
 
     def get_stringency(self):
+        return snapshots.load('stringency', [self.country_files['stringency_file']], self.read_stringency)
+
+    def read_stringency(self):
         df = pd.read_csv(self.country_files['stringency_file'], parse_dates=['Date'])
         return df
 
@@ -55,6 +62,10 @@ class CountryData:
 
     # @st.cache
     def get_jhopkins_confirmed(self):
+        return snapshots.load('jhopkins_confirmed', [self.country_files['jhopkins_confirmed']],
+                              self.read_jhopkins_confirmed)
+
+    def read_jhopkins_confirmed(self):
         df = pd.read_csv(self.country_files['jhopkins_confirmed'])
         df = df.drop(columns="Unnamed: 0")
         colnames = df.columns
@@ -78,6 +89,10 @@ class IsraelData:
 
     # @st.cache
     def get_yishuv_data(self):
+        return snapshots.load('yishuv', [self.filepath['yishuv_file'], self.filepath['yishuv_file2']],
+                              self.read_yishuv_data)
+
+    def read_yishuv_data(self):
         df = pd.read_csv(self.filepath['yishuv_file'])
         df = df.drop(columns="Unnamed: 0")
         id_vars = ['יישוב', 'סוג מידע', 'אוכלוסייה נכון ל- 2018']
@@ -106,6 +121,9 @@ class IsraelData:
 
     # @st.cache
     def get_isolation_df(self):
+        return snapshots.load('isolations', [self.filepath['isolations_file']], self.read_isolation_df)
+
+    def read_isolation_df(self):
         df = pd.read_csv(self.filepath['isolations_file'])
         df['date'] = pd.to_datetime(df['date'])
         df['new_contact_with_confirmed'] = pd.to_numeric(df['new_contact_with_confirmed'], errors='coerce')
@@ -116,6 +134,9 @@ class IsraelData:
 
     # @st.cache
     def get_lab_results_df(self):
+        return snapshots.load('lab_results', [self.filepath['lab_results_file']], self.read_lab_results_df)
+
+    def read_lab_results_df(self):
         df = pd.read_csv(self.filepath['lab_results_file'])
         # df['result_date'] = pd.to_datetime(df['result_date'], format="%d/%m/%Y")
         df['result_date'] = pd.to_datetime(df['result_date'], format="%Y-%m-%d")
@@ -123,6 +144,9 @@ class IsraelData:
 
     # @st.cache
     def get_tested_df(self):
+        return snapshots.load('tested', [self.filepath['tested_file']], self.read_tested_df)
+
+    def read_tested_df(self):
         df = pd.read_csv(self.filepath['tested_file'])
         symps = ['cough','fever','sore_throat', 'shortness_of_breath','head_ache']
         df[symps] = df[symps].apply(lambda x: pd.to_numeric(x, errors='coerce'))
@@ -142,6 +166,9 @@ class IsraelData:
     #     return df
 
     def get_patients_df(self):
+        return snapshots.load('patients', [self.filepath['patients_path']], self.read_patients_df)
+
+    def read_patients_df(self):
         # df = pd.read_excel(self.filepath['patients_path'])
         df = pd.read_csv(self.filepath['patients_path'], parse_dates=['תאריך'])
         # df = df.dropna(subset=['New Patients Amount'])
@@ -0,0 +1,81 @@
+import os
+import threading
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+# name -> (version, frames)
+_loaded = {}
+# name -> lock held by the thread loading it
+_loading = {}
+_lock = threading.Lock()
+
+
+def file_version(paths):
+    """Path, mtime and size of every file, a dataset read from them is current while these are."""
+    version = []
+    for path in paths:
+        stat = os.stat(path)
+        version.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def freeze(df):
+    """
+    Mark the arrays behind the non-object columns of df read-only, writing into them raises
+    instead of changing them. Object columns stay writable, pandas 1.x cannot compare or
+    hash read-only ones, and share gives every caller copies of them instead.
+    """
+    for name in df.columns:
+        values = df[name].to_numpy(copy=False)
+        if not isinstance(values, np.ndarray) or values.dtype == object:
+            continue
+        # a column is a view of the 2d block it lives in
+        while isinstance(values.base, np.ndarray):
+            values = values.base
+        values.flags.writeable = False
+    return df
+
+
+def share(df):
+    """A shallow copy of the frozen df, over its read-only arrays and with its own copies of the object columns."""
+    out = df.copy(deep=False)
+    for name in df.columns[df.dtypes == object]:
+        # dropped and inserted, setting the column would write into the shared object block
+        position = out.columns.get_loc(name)
+        out.insert(position, name, out.pop(name).copy())
+    return out
+
+
+def get(name, paths, read):
+    """
+    The frames read() returns, read once per process and version of the files at paths and
+    shared by every session.
+
+    Concurrent first calls wait for one read instead of each reading. Every caller gets
+    shallow copies over read-only arrays (see share), so columns it adds or replaces stay
+    its own and writing into the shared values raises.
+
+    Arguments:
+        name: the dataset, a newer version replaces the one loaded under name.
+        paths: the files read() reads.
+        read: returns a DataFrame or a tuple of DataFrames.
+    """
+    version = file_version(paths)
+    with _lock:
+        loaded = _loaded.get(name)
+        name_lock = _loading.setdefault(name, threading.Lock())
+    if not loaded or loaded[0] != version:
+        with name_lock:
+            with _lock:
+                loaded = _loaded.get(name)
+            if not loaded or loaded[0] != version:
+                frames = read()
+                single = isinstance(frames, pd.DataFrame)
+                frames = tuple(freeze(df) for df in ([frames] if single else frames))
+                loaded = (version, frames[0] if single else frames)
+                with _lock:
+                    _loaded[name] = loaded
+    frames = loaded[1]
+    if isinstance(frames, pd.DataFrame):
+        return share(frames)
+    return tuple(share(df) for df in frames)
@@ -2,11 +2,38 @@ import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
 # from src.shared.parameters import Parameters
 import datetime
-from statsmodels.tsa.api import SimpleExpSmoothing, Holt
 import os
-import streamlit as st
 import statsmodels.api as sm
 from datetime import timedelta
+from src.shared.models import olg_kernels, policy_timeline
+from src.shared.models.policy_store import PolicyStore
+from src.shared.cache import ResultCache, make_key
+from src.shared.models.naive_curves import CountryAverages
+from src.shared.models.policy_index import PolicyIndex
+from src.shared.models.analogue_search import AnalogueSearch
+
+SERIOUS_DATA_RENAME = {
+    'total_cases': 'Total Detected',
+    'infected': 'Total Infected Predicted',
+    'exposed': 'Total Exposed Predicted',
+    'Total_Mortality': 'Total Deaths Predicted',
+    'total_deaths': 'Total Deaths Actual',
+    'dI': 'New Detected Predicted',
+    'new_cases': 'New Detected Actual',
+    'dA': 'New Infected Predicted',
+    'dE': 'New Exposed Predicted',
+    'Mortality_Critical': 'Daily Deaths Predicted',
+    'new_deaths': 'Daily Deaths Actual',
+    'Critical_condition': 'Daily Critical Predicted',
+    'serious_critical': 'Daily Critical Actual',
+    'Recovery_Critical': 'Daily Recovery Predicted',
+    'Currently Infected': 'Currently Active Detected Predicted',
+    'activecases': 'Currently Active Detected Actual',
+    'true_critical_rate': 'Daily Critical Rate Actual',
+    'r_hubei': 'R China-Hubei Actual',
+    'r_predicted': 'R Predicted',
+}
+
 
 class OLGParameters:
     """Parameters."""
@@ -69,9 +96,10 @@ class OLG:
 
     """
 
-    def __init__(self, df, p: OLGParameters, stringency=None, have_serious_data=False):
+    def __init__(self, df, p: OLGParameters, stringency=None, have_serious_data=False, r_reference=None):
         self.detected = []
         self.jh_hubei = self.get_hubei()
+        self.r_reference = r_reference
         self.stringency = self.get_stringency(stringency)
         self.r_adj = np.array([])
         self.r_values = np.array([])
@@ -88,8 +116,7 @@ class OLG:
 
     @staticmethod
     def next_gen(r0, tau, c0, ct):
-        r0d = r0 / tau
-        return r0d * (ct - c0) + ct
+        return olg_kernels.next_gen(r0, tau, c0, ct)
 
     @staticmethod
     def get_hubei():
@@ -123,22 +150,17 @@ class OLG:
 
     @staticmethod
     def crystal_ball_regression(r_prev, hubei_prev, hubei_prev_t2, s_prev_t7):
-        crystal_ball_coef = {'intercept': 1.462, 'r_prev': 0.915, 'hubei_prev': 0.05, 'hubei_prev_t2': 0.058,
-                             's_prev_t7': 0.0152}
+        return olg_kernels.crystal_ball_regression(r_prev, hubei_prev, hubei_prev_t2, s_prev_t7)
 
-        ln_r = crystal_ball_coef.get('intercept') + crystal_ball_coef.get('r_prev') * np.log(1 + r_prev) \
-               + crystal_ball_coef.get('hubei_prev') * np.log(1 + hubei_prev) \
-               + crystal_ball_coef.get('hubei_prev_t2') * np.log(1 + hubei_prev_t2) \
-               - crystal_ball_coef.get('s_prev_t7') * s_prev_t7
-        return np.exp(ln_r) - 1
-
-    @st.cache(max_entries=2)
     def iter_countries(self, df, p, jh_hubei, stringency):
 
-        self.process(init_infected=250, detected=jh_hubei)
-        self.calc_r(tau=p.tau, init_infected=250)
-        self.r_hubei = self.r_adj
-        r_hubei = self.r_adj
+        # r_reference (e.g. from ReferenceCurves) replaces the hard-coded hubei analogue
+        if self.r_reference is None:
+            self.process(init_infected=250, detected=jh_hubei)
+            self.calc_r(tau=p.tau, init_infected=250)
+            self.r_reference = self.r_adj
+        self.r_hubei = self.r_reference
+        r_hubei = self.r_reference
         for country in p.countries:
             self.df_tmp = df[df['country'] == country].copy()
             self.process(init_infected=p.init_infected)
@@ -166,18 +188,7 @@ class OLG:
             self.df_tmp = self.df_tmp[day_0:]
 
     def calc_r(self, tau, init_infected):
-        epsilon = 1e-06
-        detected = self.detected
-        r_values = np.array([(detected[0] / (init_infected + epsilon) - 1) * tau])
-        for t in range(1, len(detected)):
-            if t <= tau:
-                r_value = (detected[t] / (detected[t - 1] + epsilon) - 1) * tau
-            elif t > tau:
-                r_value = (detected[t] / (
-                            detected[t - 1] - detected[t - tau] + detected[t - tau - 1] + epsilon) - 1) * tau
-            r_values = np.append(r_values, max(r_value, 0))
-            r_adj = np.convolve(r_values, np.ones(int(tau, )) / int(tau), mode='full')[:len(detected)]
-            r_adj = np.clip(r_adj, 0, 100)
+        r_values, r_adj = olg_kernels.calc_r(self.detected, tau, init_infected)
         self.r_values, self.r_adj, self.r0d = r_values, r_adj, r_adj
 
     def predict(self, country, tau, r_hubei, stringency):
@@ -206,8 +217,8 @@ class OLG:
                     self.r0d = np.append(self.r0d, projected_r)
                 self.r_predicted = np.append(self.r_predicted, projected_r)
         else:
-            holt_model = Holt(self.r_adj[-tau:], exponential=True).fit(smoothing_level=0.1, smoothing_slope=0.9)
-            self.r0d = np.append(self.r_adj, holt_model.forecast(forcast_cnt + 1))
+            self.r0d = np.append(self.r_adj, olg_kernels.holt_forecast(self.r_adj[-tau:], forcast_cnt + 1,
+                                                                       smoothing_level=0.1, smoothing_slope=0.9))
 
         self.r0d = np.clip(self.r0d, 0, 100)
 
@@ -324,26 +335,7 @@ class OLG:
             ['Critical_condition', 'Currently Infected', 'total_cases', 'exposed', 'Recovery_Critical',
              'Mortality_Critical']].round(0)
         if self.have_serious_data:
-            df = df.rename(columns={'total_cases': 'Total Detected',
-                                    'infected': 'Total Infected Predicted',
-                                    'exposed': 'Total Exposed Predicted',
-                                    'Total_Mortality': 'Total Deaths Predicted',
-                                    'total_deaths': 'Total Deaths Actual',
-                                    'dI': 'New Detected Predicted',
-                                    'new_cases': 'New Detected Actual',
-                                    'dA': 'New Infected Predicted',
-                                    'dE': 'New Exposed Predicted',
-                                    'Mortality_Critical': 'Daily Deaths Predicted',
-                                    'new_deaths': 'Daily Deaths Actual',
-                                    'Critical_condition': 'Daily Critical Predicted',
-                                    'serious_critical': 'Daily Critical Actual',
-                                    'Recovery_Critical': 'Daily Recovery Predicted',
-                                    'Currently Infected': 'Currently Active Detected Predicted',
-                                    'activecases': 'Currently Active Detected Actual',
-                                    'true_critical_rate': 'Daily Critical Rate Actual',
-                                    'r_hubei': 'R China-Hubei Actual',
-                                    'r_predicted': 'R Predicted'
-                                    })
+            df = df.rename(columns=SERIOUS_DATA_RENAME)
 
         df['r_hubei'] = self.r_hubei[:df.shape[0]]
         if df.loc[0, 'country'] == 'israel':
@@ -361,7 +353,7 @@ class StringencyIndex:
     def __init__(self, countryname):
         OXDF = "OxCGRT_Download_180420_223736_Full.csv"
         self.filepath = os.path.join(os.getcwd(), "Resources", "Datasets", "CountryData", OXDF)
-        self.oxford_df = pd.read_csv(os.path.join(os.getcwd(), "Resources", "Datasets", "CountryData", OXDF))
+        self.policy_store = PolicyStore.load(self.filepath)
         self.countryname = countryname
         self.input_df = pd.DataFrame()
         self.output_df = pd.DataFrame()
@@ -369,16 +361,12 @@ class StringencyIndex:
         self.project_til = None
 
     def get_latest(self):
-        self.oxford_df = self.oxford_df.loc[self.oxford_df["CountryName"] == self.countryname, :]
-        self.oxford_df["date"] = pd.to_datetime(self.oxford_df["Date"], format="%Y%m%d")
         s1_7 = tuple("S" + str(i) + "_" for i in range(1, 8, 1))
-        keep_cols = [c for c in self.oxford_df.columns if c.startswith(s1_7)]
-        keep_cols = [c for c in keep_cols if c.find('Notes') == -1]
-        oxford_df = self.oxford_df.dropna(subset=['StringencyIndex'])
-        oxford_df = oxford_df.fillna('ffill')
-        oxford_df = oxford_df[keep_cols]
-        oxford_dict = oxford_df[-1:].to_dict('records')[0]
-        return oxford_dict
+        return self.policy_store.latest(self.countryname, s1_7)
+
+    def get_history(self):
+        s1_7 = tuple("S" + str(i) + "_" for i in range(1, 8, 1))
+        return self.policy_store.history(self.countryname, s1_7 + ('StringencyIndex',))
 
     def display_st(self, st, key=1):
         oxford_dict = self.get_latest()
@@ -399,56 +387,44 @@ class StringencyIndex:
         self.input_df = pd.DataFrame([oxford_start, output])
 
     def calculate_stringency(self):
-        max_val = self.max_val
         temp = self.input_df.copy()
-        cols = temp.columns
-        date_cols = [c for c in cols if c.find('_date') > -1]
-        temp[date_cols] = temp[date_cols].apply(lambda x: pd.to_datetime(x))
-        # dts = temp[date_cols].apply(lambda x: max(x), axis=1).values
-        # dts_range = pd.date_range(dts[0], dts[1])
-        dts_range = pd.date_range(datetime.date.today(),  self.project_til)
-        temp['times'] = None
-        temp['times'] = [1, len(dts_range) - 1]
-
-        temp = temp.loc[temp.index.repeat(temp.times)]
-        temp.drop(columns='times', inplace=True)
-        temp['date'] = dts_range
-        cols = temp.columns
-        cols = [c for c in cols if c.find('IsGeneral') == -1]
-        cols = [c for c in cols if c.find('date') == -1]
-        temp = temp.reset_index(drop=True)
-        for k in cols:
-            for i in temp.index:
-                if temp.loc[i, k + "_date"] != temp.loc[i, 'date']:
-                    temp.at[i, k] = temp.loc[i - 1, k]
-                    try:
-                        temp.at[i, k[:2] + "_IsGeneral"] = temp.loc[i - 1, k + "_IsGeneral"]
-                    except:
-                        pass
-
-        for k in cols:
-            if k[:2] != 'S7':
-                temp[k[:2] + '_score'] = (temp[k] + temp[k[:2] + "_IsGeneral"]) / (max_val[k[:2]] + 1)
-            else:
-                temp[k[:2] + '_score'] = temp[k] / (max_val[k[:2]])
-
-        cols = temp.columns
-        score_cols = [c for c in cols if c.find("score") > -1]
-        temp['StringencyIndex'] = temp[score_cols].apply(lambda x: np.average(x)*100, axis=1)
-        cols = list(temp.columns)
-        cols.insert(0, cols.pop(cols.index('StringencyIndex')))
-        cols.insert(0, cols.pop(cols.index('date')))
-        temp = temp.loc[:, cols]
-        # temp = pd.merge(temp, self.oxford_df.loc[:, ["StringencyIndex", "date"]], "outer")
+        policy_cols = [c for c in temp.columns if c.find('_date') == -1]
+        date_cols = [c for c in temp.columns if c.find('_date') > -1]
+        general = np.array([c.find('IsGeneral') > -1 for c in policy_cols])
+        dts_range = pd.date_range(datetime.date.today(), self.project_til)
+        change_dates = temp.reindex(columns=[c + '_date' for c in policy_cols]).iloc[1]
+        values = policy_timeline.project(dts_range, temp.loc[0, policy_cols], temp.loc[[1], policy_cols],
+                                         change_dates, general)[0]
+        temp = policy_timeline.stringency_frame(dts_range, values, policy_cols, self.max_val, '_IsGeneral')
+        # the first day carries the start dates, the rest the dates of the changes
+        dates = self.input_df.loc[[0] + [1] * (len(dts_range) - 1), date_cols].apply(lambda x: pd.to_datetime(x))
+        for c in date_cols:
+            temp[c] = dates[c].values
+        score_cols = [c for c in temp.columns if c.find('score') > -1]
+        temp = temp.loc[:, ['date', 'StringencyIndex'] + list(self.input_df.columns) + score_cols]
         self.output_df = temp
         return temp
 
+    def calculate_schedules(self, targets, change_dates):
+        """StringencyIndex of every alternative schedule, (n_schedules x n_days).
+
+        targets and change_dates hold one schedule per row, with the columns of the policy
+        values of input_df (change dates of the IsGeneral columns are ignored).
+        """
+        policy_cols = [c for c in self.input_df.columns if c.find('_date') == -1]
+        general = np.array([c.find('IsGeneral') > -1 for c in policy_cols])
+        dts_range = pd.date_range(datetime.date.today(), self.project_til)
+        events = policy_timeline.schedule_events(dts_range, self.input_df.loc[0, policy_cols], targets,
+                                                 change_dates, general)
+        return policy_timeline.index_paths(*events, policy_timeline.stringency_weights(policy_cols, self.max_val,
+                                                                                       '_IsGeneral'))
+
 
 class StringencyIndexNaive:
     def __init__(self, countryname):
         OXDF = "gov_response.csv"
         self.filepath = os.path.join(os.getcwd(), "Resources", "Datasets", "CountryData", OXDF)
-        self.oxford_df = pd.read_csv(os.path.join(os.getcwd(), "Resources", "Datasets", "CountryData", OXDF))
+        self.policy_store = PolicyStore.load(self.filepath)
         self.countryname = countryname
         self.input_df = pd.DataFrame()
         self.output_df = pd.DataFrame()
@@ -456,28 +432,19 @@ class StringencyIndexNaive:
         self.max_val = {'C1': 5., 'C2': 5., 'C3': 5., 'C4': 5., 'C5': 5., 'C6': 5., 'C7': 5., 'C8': 5.}
         self.project_til = None
 
-    @st.cache
     def get_latest(self):
-
-        self.oxford_df = self.oxford_df.loc[self.oxford_df["CountryName"] == self.countryname, :]
-        self.oxford_df["date"] = pd.to_datetime(self.oxford_df["Date"], format="%Y%m%d")
         # s1_7 = tuple("S" + str(i) + "_" for i in range(1, 8, 1))
         s1_8 = tuple("C" + str(i) + "_" for i in range(1, 9, 1))
-        keep_cols = [c for c in self.oxford_df.columns if c.startswith(s1_8)]
-        keep_cols = [c for c in keep_cols if c.find('Notes') == -1]
-        # keep_cols = [c for c in keep_cols if c.find('Flag') == -1]
-        oxford_df = self.oxford_df.dropna(subset=['StringencyIndex'])
-        oxford_df = oxford_df.fillna('ffill')
-        oxford_df = oxford_df[keep_cols]
-        # print(oxford_df)
-        oxford_dict = oxford_df[-1:].to_dict('records')[0]
-        return oxford_dict
+        return self.policy_store.latest(self.countryname, s1_8)
+
+    def get_history(self):
+        s1_8 = tuple("C" + str(i) + "_" for i in range(1, 9, 1))
+        return self.policy_store.history(self.countryname, s1_8 + ('StringencyIndex',))
 
     def display_st(self, st, key=1):
         oxford_dict = self.get_latest()
         st.sidebar.subheader("Oxford Index")
         output = {}
-        oxford_start = oxford_dict.copy()
         max_val = self.max_val
         for k, v in oxford_dict.items():
             if k.find('Flag') > -1:
@@ -485,84 +452,45 @@ class StringencyIndexNaive:
             else:
                 output[k] = st.sidebar.number_input(k.split("_")[1], value=oxford_dict[k], min_value=0.,
                                                     max_value=max_val[k[:2]], step=1., key=key)
-                # add original date
-                # oxford_start[k + '_date'] = datetime.date.today()
             key += 1
         self.input_df = pd.DataFrame([output])
 
     def calculate_stringency(self):
-        max_val = self.max_val
+        # input_df holds one row of policy values, kept over the whole projection
         temp = self.input_df.copy()
-        cols = temp.columns
-        date_cols = [c for c in cols if c.find('_date') > -1]
-        temp[date_cols] = temp[date_cols].apply(lambda x: pd.to_datetime(x))
-        # dts = temp[date_cols].apply(lambda x: max(x), axis=1).values
-        # dts_range = pd.date_range(dts[0], dts[1])
-        dts_range = pd.date_range(datetime.date.today(),  self.project_til)
-        temp['times'] = None
-        temp['times'] = [1, len(dts_range) - 1]
-
-        temp = temp.loc[temp.index.repeat(temp.times)]
-        temp.drop(columns='times', inplace=True)
-        temp['date'] = dts_range
-        cols = temp.columns
-        cols = [c for c in cols if c.find('IsGeneral') == -1]
-        cols = [c for c in cols if c.find('date') == -1]
-        temp = temp.reset_index(drop=True)
-        for k in cols:
-            for i in temp.index:
-                if temp.loc[i, k + "_date"] != temp.loc[i, 'date']:
-                    temp.at[i, k] = temp.loc[i - 1, k]
-                    try:
-                        temp.at[i, k[:2] + "_IsGeneral"] = temp.loc[i - 1, k + "_IsGeneral"]
-                    except:
-                        pass
-
-        for k in cols:
-            if k[:2] != 'S7':
-                temp[k[:2] + '_score'] = (temp[k] + temp[k[:2] + "_IsGeneral"]) / (max_val[k[:2]] + 1)
-            else:
-                temp[k[:2] + '_score'] = temp[k] / (max_val[k[:2]])
-
-        cols = temp.columns
-        score_cols = [c for c in cols if c.find("score") > -1]
-        temp['StringencyIndex'] = temp[score_cols].apply(lambda x: np.average(x)*100, axis=1)
-        cols = list(temp.columns)
-        cols.insert(0, cols.pop(cols.index('StringencyIndex')))
-        cols.insert(0, cols.pop(cols.index('date')))
-        temp = temp.loc[:, cols]
-        # temp = pd.merge(temp, self.oxford_df.loc[:, ["StringencyIndex", "date"]], "outer")
+        policy_cols = list(temp.columns)
+        general = np.array([c.find('Flag') > -1 for c in policy_cols])
+        dts_range = pd.date_range(datetime.date.today(), self.project_til or datetime.date.today())
+        values = policy_timeline.project(dts_range, temp.loc[0, policy_cols], temp.loc[[0], policy_cols],
+                                         [pd.NaT] * len(policy_cols), general)[0]
+        temp = policy_timeline.stringency_frame(dts_range, values, policy_cols, self.max_val, '_Flag')
         self.output_df = temp
         return temp
 
 class naiveModel:
-    def __init__(self, df, p):
+    def __init__(self, df, p, cache=None, data_version=None):
+        """data_version identifies df in cache keys, e.g. dataset_store.file_version of its files."""
         self.stringency_df = df
         self.tau = p.tau
         self.init_infected = p.init_infected
-        self.df, self.israel_day = self.calc_df()
+        self.data_version = data_version
+        if cache is None:
+            self.df, self.israel_day = self.calc_df()
+        else:
+            self.df, self.israel_day = cache.get_or_compute(self.cache_key(), self.calc_df)
+            self.df = self.df.copy()
+        # smoothed country-set curves, shared through cache when given
+        self.curve_cache = cache if cache is not None else ResultCache(max_mb=16)
+        self.country_averages = None
+        self.policy_index = None
+        self.analogue_search = None
 
     #     # st.cache
     #     def get_file(self):
     #         return pd.read_csv(pathfile, parse_dates=['Date'])
 
     def calc_r(self, detected):
-        epsilon = 1e-06
-        init_infected = self.init_infected
-        tau = self.tau
-        r_values = np.array([(detected[0] / (init_infected + epsilon) - 1) * tau])
-        r_adj = None
-        for t in range(1, len(detected)):
-            if t <= tau:
-                r_value = (detected[t] / (detected[t - 1] + epsilon) - 1) * tau
-            elif t > tau:
-                r_value = (detected[t] / (
-                        detected[t - 1] - detected[t - tau] + detected[t - tau - 1] + epsilon) - 1) * tau
-            r_values = np.append(r_values, max(r_value, 0))
-            r_adj = np.convolve(r_values, np.ones(int(tau, )) / int(tau), mode='full')[:len(detected)]
-            r_adj = np.clip(r_adj, 0, 100)
-        # self.r_values, self.r_adj, self.r0d = r_values, r_adj, r_adj
-        # print(len(detected), len(r_adj))
+        _, r_adj = olg_kernels.calc_r(detected, self.tau, self.init_infected)
         return r_adj
 
     def norm_r(self, df):
@@ -584,11 +512,23 @@ class naiveModel:
         df['r_adjn'] = df['r_adj'] + df['norm_r']
         return df, israel_day
 
+    def cache_key(self):
+        """Key of calc_df for this version of the Oxford data, tau and init_infected."""
+        if getattr(self, 'data_key', None) is None:
+            # every column is handed on (PolicyIndex reads the C1 - C8 levels), so all of them count
+            data = self.data_version if self.data_version is not None else self.stringency_df
+            self.data_key = make_key('naive', data, self.tau, self.init_infected)
+        return self.data_key
+
     def calc_df(self):
         df = self.stringency_df
         df = df[df['ConfirmedCases'] > self.init_infected]
-        df = df.sort_values(['CountryName', 'Date'])
-        df.loc[:, 'r_adj'] = df.groupby('CountryName')['ConfirmedCases'].transform(lambda x: self.calc_r(x.values))
+        df = df.sort_values(['CountryName', 'Date'], kind='mergesort')
+        # every country is a contiguous segment of the sorted rows
+        country = df['CountryName'].values
+        starts = np.r_[0, np.nonzero(country[1:] != country[:-1])[0] + 1] if len(df) else np.array([], dtype=int)
+        _, r_adj = olg_kernels.segment_calc_r(df['ConfirmedCases'].values, starts, self.tau, self.init_infected)
+        df = df.assign(r_adj=r_adj)
         return self.norm_r(df)
 
     # logic for choosing countries is external
@@ -596,14 +536,71 @@ class naiveModel:
     # @staticmethod
     def avgCountries(self, df):
         countries_avg = df[df['r_adjn'] > 0].groupby('corona_days', as_index=False)['r_adjn'].mean()
+        return self.smooth_average(countries_avg)
+
+    def smooth_average(self, countries_avg):
         lowess = sm.nonparametric.lowess
         countries_avg['r_adjn'] = lowess(countries_avg['r_adjn'], countries_avg['corona_days'], frac=1. / 10, it=0)[:,
                                   1]
         countries_avg['prediction_ind'] = 1
         return countries_avg[countries_avg['corona_days'] > self.israel_day]
 
-    def predict(self, countryList):
-        pred = self.avgCountries(self.df[self.df.CountryName.isin(countryList)])
+    def country_curve(self, countryList):
+        """avgCountries of countryList, memoized by the country set and the data version."""
+        key = make_key(self.cache_key(), 'naive_curve', sorted(set(countryList)))
+        curve = self.curve_cache.get_or_compute(key, self.calc_country_curve, countryList)
+        return curve.copy()
+
+    def calc_country_curve(self, countryList):
+        if self.country_averages is None:
+            # built once per data version and shared by every session through the cache
+            self.country_averages = self.curve_cache.get_or_compute(
+                make_key(self.cache_key(), 'country_averages'), CountryAverages, self.df)
+        return self.smooth_average(self.country_averages.select(countryList))
+
+    def country_index(self):
+        """PolicyIndex over the C1 - C8 levels of self.df, built once per data version."""
+        if self.policy_index is None:
+            c1_8 = tuple("C" + str(i) + "_" for i in range(1, 9, 1))
+            indicators = [c for c in self.df.columns if c.startswith(c1_8) and c.find('Flag') == -1
+                          and c.find('Notes') == -1]
+            key = make_key(self.cache_key(), 'policy_index')
+            self.policy_index = self.curve_cache.get_or_compute(key, PolicyIndex, self.df, indicators)
+        return self.policy_index
+
+    def analogues(self, k=5, window=14, stringency_weight=0., band=None, horizon=30):
+        """Countries whose r_adjn best matches Israel's last window days, with horizon days observed after it."""
+        if self.analogue_search is None:
+            self.analogue_search = AnalogueSearch(self.df)
+        query_r, query_stringency = self.analogue_search.query('Israel', self.israel_day, window)
+        return self.analogue_search.search(query_r, query_stringency, k, stringency_weight, band, horizon,
+                                           exclude=['Israel'])
+
+    def analogue_curve(self, analogues, window, horizon=30):
+        """
+        Mean R of analogues over the horizon days after their matched windows, as the days after
+        Israel's last day. Each country's R is shifted to Israel's on the last day of its window,
+        as norm_r does on Israel's corona day. analogues must come from analogues() with at least
+        this horizon, so every country has those days.
+        """
+        if not len(analogues):
+            return pd.DataFrame(columns=['corona_days', 'r_adjn', 'prediction_ind'])
+        search = self.analogue_search
+        rows = pd.Categorical(analogues['CountryName'], categories=search.countries).codes
+        ends = analogues['corona_days'].values.astype(int) + window - 1
+        r = search.r[rows[:, None], ends[:, None] + np.arange(horizon + 1)]
+        israel_r = search.r[list(search.countries).index('Israel'), self.israel_day]
+        r = r[:, 1:] - r[:, :1] + israel_r
+        return pd.DataFrame({'corona_days': self.israel_day + np.arange(1, horizon + 1),
+                             'r_adjn': r.mean(axis=0), 'prediction_ind': 1})
+
+    def precompute_curves(self, country_lists):
+        for countryList in country_lists:
+            self.country_curve(countryList)
+
+    def predict(self, countryList, curve=None):
+        """Israel's data followed by the curve of countryList, or by curve (e.g. analogue_curve) when given."""
+        pred = self.country_curve(countryList) if curve is None else curve
         # df_israel = self.df.loc[self.df.CountryName == 'Israel', ['Date', 'corona_days', 'r_adjn', 'day0','ConfirmedCases']]
         df_israel = self.df.loc[self.df.CountryName == 'Israel', :]
         df_israel.loc[:, 'prediction_ind'] = 0
@@ -1,9 +1,250 @@
-import pandas as pd
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from scipy.integrate import odeint  # type: ignore
+
+SEIAR_RENAME = {'S': 'Susceptible', 'E': 'Exposed', 'I': 'Infected', 'A': 'Asymptomatic', 'R': 'Recovered'}
+
+
+class SeiarParameters:
+    """Parameters."""
+
+    def __init__(
+            self,
+            *,
+            N: float,
+            S_0: float,
+            E_0: float,
+            I_0: float,
+            A_0: float,
+            R_0: float,
+            alpha: float,
+            beta_ill: float,
+            beta_asy: float,
+            gamma_ill: float,
+            gamma_asy: float,
+            rho: float,
+            theta: float,
+            start_date_simulation,
+            number_of_days: int,
+            model_checkpoints=None,
+    ):
+        self.N = N
+        self.S_0 = S_0
+        self.E_0 = E_0
+        self.I_0 = I_0
+        self.A_0 = A_0
+        self.R_0 = R_0
+        self.alpha = alpha
+        self.beta_ill = beta_ill
+        self.beta_asy = beta_asy
+        self.gamma_ill = gamma_ill
+        self.gamma_asy = gamma_asy
+        self.rho = rho
+        self.theta = theta
+        self.start_date_simulation = start_date_simulation
+        self.number_of_days = int(number_of_days)
+        # {'time_ill': [...], 'beta_ill': [...], 'time_asy': [...], 'beta_asy': [...]}, betas in effect from their day
+        self.model_checkpoints = model_checkpoints or {'time_ill': [], 'beta_ill': [], 'time_asy': [], 'beta_asy': []}
+
+
+def seiar_rhs(y, t, alpha, beta_ill, beta_asy, gamma_ill, gamma_asy, rho, theta):
+    """d(S, E, I, A, R)/dt, y is (5, ...) and the rates broadcast against y[0]."""
+    S, E, I, A, R = y
+    infection = rho * beta_ill * S * I + rho * beta_asy * S * A
+    return np.array([
+        -infection,
+        infection - alpha * E,
+        theta * alpha * E - gamma_ill * I,
+        (1 - theta) * alpha * E - gamma_asy * A,
+        gamma_ill * I + gamma_asy * A,
+    ])
+
+
+def seiar_rhs_1d(y, t, alpha, beta_ill, beta_asy, gamma_ill, gamma_asy, rho, theta):
+    """seiar_rhs for one state in Python floats, odeint calls it hundreds of times per solve."""
+    S, E, I, A, R = y.tolist()
+    infection = rho * S * (beta_ill * I + beta_asy * A)
+    return [-infection, infection - alpha * E, theta * alpha * E - gamma_ill * I,
+            (1 - theta) * alpha * E - gamma_asy * A, gamma_ill * I + gamma_asy * A]
+
+
+def seiar_jacobian(y, t, alpha, beta_ill, beta_asy, gamma_ill, gamma_asy, rho, theta):
+    """d seiar_rhs / d y for one state, (5 x 5)."""
+    S, E, I, A, R = y
+    d_S = rho * (beta_ill * I + beta_asy * A)
+    return np.array([
+        [-d_S, 0., -rho * beta_ill * S, -rho * beta_asy * S, 0.],
+        [d_S, -alpha, rho * beta_ill * S, rho * beta_asy * S, 0.],
+        [0., theta * alpha, -gamma_ill, 0., 0.],
+        [0., (1 - theta) * alpha, 0., -gamma_asy, 0.],
+        [0., 0., gamma_ill, gamma_asy, 0.],
+    ])
+
+
+def beta_path(beta, times, betas, t):
+    """beta in effect at time t, given checkpoint times and the betas that start at them."""
+    i = np.searchsorted(times, t, side='right')
+    return beta if i == 0 else betas[i - 1]
+
+
+def integrate_seiar(y0, n_days, rates, beta_ill, beta_asy, checkpoints, rtol=1e-6, atol=1e-10):
+    """Daily (S, E, I, A, R) for days 0..n_days, (n_days + 1 x 5).
+
+    The system is smooth between beta checkpoints, so each stretch between them is one
+    adaptive LSODA (odeint) run sampled at whole days.
+
+    Arguments:
+        y0: initial fractions (S, E, I, A, R).
+        rates: dict of alpha, gamma_ill, gamma_asy, rho and theta.
+        beta_ill, beta_asy: betas before the first checkpoint.
+        checkpoints: as SeiarParameters.model_checkpoints.
+    """
+    time_ill = np.asarray(checkpoints.get('time_ill', []), dtype=float)
+    time_asy = np.asarray(checkpoints.get('time_asy', []), dtype=float)
+    order_ill, order_asy = np.argsort(time_ill, kind='mergesort'), np.argsort(time_asy, kind='mergesort')
+    time_ill, betas_ill = time_ill[order_ill], np.asarray(checkpoints.get('beta_ill', []), dtype=float)[order_ill]
+    time_asy, betas_asy = time_asy[order_asy], np.asarray(checkpoints.get('beta_asy', []), dtype=float)[order_asy]
+
+    days = np.arange(n_days + 1, dtype=float)
+    bounds = np.unique(np.concatenate([[0., n_days], time_ill, time_asy]).clip(0, n_days))
+    out = np.empty((len(days), 5))
+    out[0] = y0
+    y = np.asarray(y0, dtype=float)
+    alpha, gamma_ill, gamma_asy, rho, theta = (float(rates[k]) for k in
+                                               ['alpha', 'gamma_ill', 'gamma_asy', 'rho', 'theta'])
+    for t0, t1 in zip(bounds[:-1], bounds[1:]):
+        b_ill = float(beta_path(beta_ill, time_ill, betas_ill, t0))
+        b_asy = float(beta_path(beta_asy, time_asy, betas_asy, t0))
+        samples = days[(days > t0) & (days <= t1)]
+        # a checkpoint between days still has to hand its state to the next stretch
+        t_eval = np.concatenate([[t0], samples, [] if samples.size and samples[-1] == t1 else [t1]])
+        solution = odeint(seiar_rhs_1d, y, t_eval, args=(alpha, b_ill, b_asy, gamma_ill, gamma_asy, rho, theta),
+                          Dfun=seiar_jacobian, rtol=rtol, atol=atol)
+        out[samples.astype(int)] = solution[1:len(samples) + 1]
+        y = solution[-1]
+    return out
+
+
+SEIAR_ENSEMBLE_PARAMETERS = ['beta_ill', 'beta_asy', 'alpha', 'gamma_ill', 'gamma_asy', 'theta', 'rho']
+
+
+def beta_table(beta, times, betas, n_members):
+    """
+    Checkpoint times in increasing order, as integrate_seiar sorts them, and the
+    (n_members x n_checkpoints + 1) betas, column k in effect from the k-th of those times on.
+    """
+    times = np.asarray(times, dtype=float)
+    betas = np.broadcast_to(np.asarray(betas, dtype=float).reshape(-1, len(times)) if len(times) else
+                            np.empty((1, 0)), (n_members, len(times)))
+    order = np.argsort(times, kind='mergesort')
+    return times[order], np.column_stack([beta, betas[:, order]])
+
+
+def ensemble_rhs(y, out, rho_beta_ill, rho_beta_asy, alpha, gamma_ill, gamma_asy, theta):
+    """seiar_rhs for a (5 x members) state, written into out."""
+    S, E, I, A, R = y
+    infection = S * (rho_beta_ill * I + rho_beta_asy * A)
+    progression = alpha * E
+    recovery_ill, recovery_asy = gamma_ill * I, gamma_asy * A
+    out[0] = -infection
+    out[1] = infection - progression
+    out[2] = theta * progression - recovery_ill
+    out[3] = progression - theta * progression - recovery_asy
+    out[4] = recovery_ill + recovery_asy
+    return out
+
+
+def seiar_ensemble(params, n_days, y0, checkpoints=None, steps_per_day=4, chunk_size=4096, quantiles=(5, 50, 95)):
+    """Integrate many SEIAR members together with fixed step RK4.
+
+    Members are integrated chunk_size at a time, their states one (5 x chunk) array, so the
+    working memory is a few chunk sized arrays on top of the float32 result. With 4 steps a
+    day the trajectories are within about 1e-4 of a tight adaptive solve for rates up to ~3.
+
+    Arguments:
+        params: DataFrame (or n_members x 7 array) with the columns SEIAR_ENSEMBLE_PARAMETERS.
+        n_days: days to integrate, the result holds days 0..n_days.
+        y0: initial fractions (S, E, I, A, R), (5,) or (n_members x 5).
+        checkpoints: as SeiarParameters.model_checkpoints, each beta list either shared or
+            (n_members x n_checkpoints).
+        quantiles: (lower, median, upper) percentiles of the bands.
+
+    Returns:
+        (trajectories, bands, peaks): the (n_members x n_days + 1 x 5) float32 fractions,
+        a long DataFrame of day, variable, mean, lower, median and upper, and a DataFrame of
+        each member's peak_infected, peak_day and final_recovered.
+
+    Raises:
+        ValueError: params has no rows, there are no bands of an empty ensemble.
+    """
+    if not isinstance(params, pd.DataFrame):
+        params = pd.DataFrame(np.atleast_2d(params), columns=SEIAR_ENSEMBLE_PARAMETERS)
+    n_members = len(params)
+    if not n_members:
+        raise ValueError("an ensemble needs at least one member, params has no rows")
+    checkpoints = checkpoints or {}
+    rho = params['rho'].values[:, None]
+    time_ill, ill = beta_table(params['beta_ill'].values, checkpoints.get('time_ill', []),
+                               checkpoints.get('beta_ill', []), n_members)
+    time_asy, asy = beta_table(params['beta_asy'].values, checkpoints.get('time_asy', []),
+                               checkpoints.get('beta_asy', []), n_members)
+    ill, asy = rho * ill, rho * asy
+    y0 = np.broadcast_to(np.asarray(y0, dtype=float), (n_members, 5))
+
+    dt = 1. / steps_per_day
+    step_times = np.arange(n_days * steps_per_day) * dt
+    # the checkpoint in effect at the start of every step
+    step_ill = np.searchsorted(time_ill, step_times, side='right')
+    step_asy = np.searchsorted(time_asy, step_times, side='right')
+
+    trajectories = np.empty((n_members, n_days + 1, 5), dtype=np.float32)
+    for start in range(0, n_members, chunk_size):
+        rows = slice(start, min(start + chunk_size, n_members))
+        rates = {k: params[k].values[rows] for k in ['alpha', 'gamma_ill', 'gamma_asy', 'theta']}
+        # a copy, y0 may be a read-only broadcast
+        y = np.array(y0[rows].T, order='C')
+        k1, k2, k3, k4, stage = (np.empty_like(y) for _ in range(5))
+        trajectories[rows, 0] = y.T
+        for step in range(len(step_times)):
+            b_ill, b_asy = ill[rows, step_ill[step]], asy[rows, step_asy[step]]
+            ensemble_rhs(y, k1, b_ill, b_asy, **rates)
+            np.multiply(k1, dt / 2, out=stage)
+            ensemble_rhs(np.add(y, stage, out=stage), k2, b_ill, b_asy, **rates)
+            np.multiply(k2, dt / 2, out=stage)
+            ensemble_rhs(np.add(y, stage, out=stage), k3, b_ill, b_asy, **rates)
+            np.multiply(k3, dt, out=stage)
+            ensemble_rhs(np.add(y, stage, out=stage), k4, b_ill, b_asy, **rates)
+            k2 += k3
+            k2 *= 2
+            k1 += k2
+            k1 += k4
+            k1 *= dt / 6
+            y += k1
+            if (step + 1) % steps_per_day == 0:
+                trajectories[rows, (step + 1) // steps_per_day] = y.T
+    return trajectories, ensemble_bands(trajectories, quantiles), ensemble_peaks(trajectories)
+
+
+def ensemble_bands(trajectories, quantiles=(5, 50, 95)):
+    """Mean and quantile bands of every compartment per day, one compartment at a time."""
+    days = np.arange(trajectories.shape[1])
+    frames = []
+    for c, name in enumerate(SEIAR_RENAME.values()):
+        values = trajectories[:, :, c]
+        lower, median, upper = np.percentile(values, quantiles, axis=0)
+        frames.append(pd.DataFrame({'day': days, 'variable': name, 'mean': values.mean(axis=0, dtype=float),
+                                    'lower': lower, 'median': median, 'upper': upper}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def ensemble_peaks(trajectories):
+    infected = trajectories[:, :, 'SEIAR'.index('I')]
+    return pd.DataFrame({'peak_infected': infected.max(axis=1), 'peak_day': infected.argmax(axis=1),
+                         'final_recovered': trajectories[:, -1, 'SEIAR'.index('R')]})
 
-# TODO: implement this again as option
 
 class Seiar:
-    def __init__(self, p: Parameters):
+    def __init__(self, p: SeiarParameters):
 
         self.N = p.N
         self.S_0 = p.S_0
@@ -21,72 +262,19 @@ class Seiar:
         self.start_date_simulation = p.start_date_simulation
         self.number_of_days = p.number_of_days
         self.projection = p.model_checkpoints
-        self.run_simulation()
         self.results = []
+        self.run_simulation()
 
-    def model(self, t):
-        S, E, I, A, R = [self.S_0 / self.N], [self.E_0 / self.N], [self.I_0 / self.N], [self.A_0 / self.N], [
-            self.R_0 / self.N]
-
-        dt = t[1] - t[0]
-        time_asy, time_ill, beta_asy, beta_ill = self.projection['time_asy'], self.projection['time_ill'], \
-                                                 self.projection['beta_asy'], self.projection['beta_ill']
-        for tm in t[1:]:
-            if tm in time_asy:
-                print(tm, beta_asy)
-                self.beta_asy = beta_asy[time_asy.index(tm)]
-                print(tm, self.beta_asy)
-                time_asy.pop(0)
-                beta_asy.pop(0)
-            if tm in time_ill:
-                self.beta_ill = beta_ill[time_ill.index(tm)]
-                print(tm, self.beta_ill)
-                beta_ill.pop(0)
-                time_ill.pop(0)
-            next_S = S[-1] - (self.rho * self.beta_ill * S[-1] * I[-1] + self.rho * self.beta_asy * S[-1] * A[-1]) * dt
-            next_E = E[-1] + (self.rho * self.beta_ill * S[-1] * I[-1] + self.rho * self.beta_asy * S[-1] * A[
-                -1] - self.alpha * E[-1]) * dt
-            next_I = I[-1] + (self.theta * self.alpha * E[-1] - self.gamma_ill * I[-1]) * dt
-            next_A = A[-1] + ((1 - self.theta) * self.alpha * E[-1] - self.gamma_asy * A[-1]) * dt
-            next_R = R[-1] + (self.gamma_ill * I[-1] + self.gamma_asy * A[-1]) * dt
-
-            S.append(next_S)
-            E.append(next_E)
-            I.append(next_I)
-            A.append(next_A)
-            R.append(next_R)
-
-        return np.stack([S, E, I, A, R]).T
+    def model(self, n_days):
+        y0 = np.array([self.S_0, self.E_0, self.I_0, self.A_0, self.R_0]) / self.N
+        rates = {'alpha': self.alpha, 'gamma_ill': self.gamma_ill, 'gamma_asy': self.gamma_asy, 'rho': self.rho,
+                 'theta': self.theta}
+        return integrate_seiar(y0, n_days, rates, self.beta_ill, self.beta_asy, self.projection)
 
     def run_simulation(self):
-        t_max = 600
-        dt = .01
-        t = np.linspace(0, t_max, int(t_max / dt) + 1)
-
-        results = self.model(t)
-
-        df = pd.DataFrame(results)
-        df = df.rename(columns={df.columns[0]: 'S', df.columns[1]: 'E', df.columns[2]: 'I', df.columns[3]: 'A',
-                                df.columns[4]: 'R'})
-        dates = pd.date_range(start=self.start_date_simulation, end='05/01/2030')
-        df_I_E = df[::100].reset_index(drop=True)
-        df_I_E.index = dates[:len(df_I_E)]
-
-        df_I_E = df_I_E.rename(
-            columns={'S': 'Susceptible', 'E': 'Exposed', 'I': 'Infected', 'A': 'Asymptomatic', 'R': 'Recovered'})
-        infected_df = df_I_E[['Infected']] * self.N
-        asymptomatic_df = df_I_E[['Asymptomatic']] * self.N
-        recovered_df = df_I_E[['Recovered']] * self.N
-        susceptible_df = df_I_E[['Susceptible']] * self.N
-        exposed_df = df_I_E[['Exposed']] * self.N
-
-        results = [
-            infected_df.loc[:self.number_of_days],
-            asymptomatic_df.loc[:self.number_of_days],
-            recovered_df.loc[:self.number_of_days],
-            susceptible_df.loc[:self.number_of_days],
-            exposed_df.loc[:self.number_of_days]
-        ]
-
-        self.results = pd.concat(results, axis=1)
+        results = self.model(self.number_of_days) * self.N
+        columns = ['I', 'A', 'R', 'S', 'E']
+        self.results = pd.DataFrame(results[:, ['SEIAR'.index(c) for c in columns]],
+                                    columns=[SEIAR_RENAME[c] for c in columns],
+                                    index=pd.date_range(start=self.start_date_simulation, periods=len(results)))
         return 0
@@ -0,0 +1,57 @@
+import threading
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+
+class CountryAverages:
+    """
+    Mean r_adjn per corona day over a selection of countries, kept as running sums.
+
+    Every country contributes one row of sums and counts of its positive r_adjn by corona
+    day. The selection holds their totals, so adding or removing a country is one row
+    added or subtracted, and the mean is totals / counts on the days some country has.
+    One instance is shared by every session, select() moves the selection under a lock.
+    """
+
+    def __init__(self, df):
+        df = df[df['r_adjn'] > 0]
+        self.countries = list(pd.unique(df['CountryName']))
+        self.index = {c: i for i, c in enumerate(self.countries)}
+        n_days = int(df['corona_days'].max()) + 1 if len(df) else 0
+        rows = df['CountryName'].map(self.index).values
+        days = df['corona_days'].values.astype(int)
+        self.sums = np.zeros((len(self.countries), n_days))
+        self.counts = np.zeros((len(self.countries), n_days), dtype=int)
+        np.add.at(self.sums, (rows, days), df['r_adjn'].values)
+        np.add.at(self.counts, (rows, days), 1)
+
+        self.selected = set()
+        self.total_sums = np.zeros(n_days)
+        self.total_counts = np.zeros(n_days, dtype=int)
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def select(self, countries):
+        """Move the selection to countries and return its mean, as groupby('corona_days').mean() would."""
+        target = {c for c in countries if c in self.index}
+        with self.lock:
+            for c in target - self.selected:
+                self.total_sums += self.sums[self.index[c]]
+                self.total_counts += self.counts[self.index[c]]
+            for c in self.selected - target:
+                self.total_sums -= self.sums[self.index[c]]
+                self.total_counts -= self.counts[self.index[c]]
+            # a day nobody contributes to is exactly zero again, not subtraction residue
+            self.total_sums[self.total_counts == 0] = 0.
+            self.selected = target
+
+            days = np.nonzero(self.total_counts)[0]
+            return pd.DataFrame({'corona_days': days, 'r_adjn': self.total_sums[days] / self.total_counts[days]})
@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+import scipy.sparse  # type: ignore
+from src.shared.cache import make_key
+
+# node states, numbered as in seirsplus.models.SEIRSNetworkModel
+S, E, I, D_E, D_I, R, F = 1, 2, 3, 4, 5, 6, 7
+NETWORK_COMPARTMENTS = ['S', 'E', 'I', 'D_E', 'D_I', 'R', 'F']
+# graphs kept in memory after their first load, each is ~10 bytes per edge
+MAX_LOADED_GRAPHS = 2
+_loaded = OrderedDict()
+_lock = threading.Lock()
+
+
+def pair_edges(starts, size):
+    """Every pair of nodes within groups of the same size, groups given by their first node."""
+    iu, ju = np.triu_indices(size, 1)
+    members = starts[:, None] + np.arange(size)
+    return members[:, iu].ravel(), members[:, ju].ravel()
+
+
+def household_edges(n, household_sizes, rng):
+    """Households are consecutive runs of nodes with sizes drawn from household_sizes, all of them in contact."""
+    p = np.asarray(household_sizes, dtype=float)
+    # n draws always cover n nodes, the household holding node n - 1 is cut there
+    starts = np.concatenate([[0], np.cumsum(rng.choice(np.arange(1, len(p) + 1), size=n, p=p / p.sum()))])
+    starts = starts[:np.searchsorted(starts, n)]
+    sizes = np.diff(np.append(starts, n))
+    edges = [pair_edges(starts[sizes == size], size) for size in np.unique(sizes) if size > 1]
+    if not edges:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    return np.concatenate([r for r, _ in edges]), np.concatenate([c for _, c in edges])
+
+
+def workplace_edges(n, employed, workplace_size, work_contacts, rng):
+    """A fraction of nodes work, in workplaces of geometric size, each meeting work_contacts random coworkers."""
+    workers = rng.permutation(n)[:int(n * employed)]
+    if not len(workers) or not work_contacts:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    sizes = rng.geometric(1 / workplace_size, size=len(workers))
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+    starts = starts[:np.searchsorted(starts, len(workers))]
+    sizes = np.diff(np.append(starts, len(workers)))
+    place = np.repeat(np.arange(len(starts)), sizes)
+    # coworkers are drawn by position within the workplace, all draws at once
+    source = np.repeat(np.arange(len(workers)), work_contacts)
+    place = place[source]
+    target = starts[place] + (rng.random(len(source)) * sizes[place]).astype(int)
+    return workers[source], workers[target]
+
+
+def community_edges(n, community_degree, rng):
+    """Random contacts across the whole population, community_degree on average per node."""
+    m = rng.poisson(n * community_degree / 2)
+    return rng.integers(0, n, m), rng.integers(0, n, m)
+
+
+def build_contact_graph(n, household_sizes, employed, workplace_size, work_contacts, community_degree, seed):
+    """
+    Household, workplace and community contacts of n nodes as one symmetric CSR adjacency.
+
+    Edges are unweighted, as in SEIRSNetworkModel, and a pair of nodes in contact in more
+    than one layer has a single edge.
+    """
+    rng = np.random.default_rng(seed)
+    layers = [household_edges(n, household_sizes, rng),
+              workplace_edges(n, employed, workplace_size, work_contacts, rng),
+              community_edges(n, community_degree, rng)]
+    rows = np.concatenate([r for r, _ in layers]).astype(np.int32)
+    cols = np.concatenate([c for _, c in layers]).astype(np.int32)
+    keep = rows != cols
+    rows, cols = np.concatenate([rows[keep], cols[keep]]), np.concatenate([cols[keep], rows[keep]])
+    A = scipy.sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(n, n))
+    A.sum_duplicates()
+    A.data[:] = 1
+    return A
+
+
+def load_contact_graph(disk_dir, n, seed=0, **graph_params):
+    """The contact graph for these parameters, from memory, from disk_dir or built and saved there."""
+    key = make_key('contact_graph', int(n), int(seed), graph_params)
+    with _lock:
+        if key in _loaded:
+            _loaded.move_to_end(key)
+            return _loaded[key]
+    path = os.path.join(disk_dir, 'contact_graph_%s.npz' % key) if disk_dir else None
+    if path and os.path.exists(path):
+        A = scipy.sparse.load_npz(path)
+    else:
+        A = build_contact_graph(int(n), seed=int(seed), **graph_params)
+        if path:
+            # written then renamed, so concurrent sessions never load half a file
+            os.makedirs(disk_dir, exist_ok=True)
+            tmp = '%s.%d.%d.tmp.npz' % (path[:-len('.npz')], os.getpid(), threading.get_ident())
+            scipy.sparse.save_npz(tmp, A, compressed=True)
+            os.replace(tmp, path)
+    with _lock:
+        _loaded[key] = A
+        while len(_loaded) > MAX_LOADED_GRAPHS:
+            _loaded.popitem(last=False)
+    return A
+
+
+def neighbours(A, nodes):
+    """Concatenated neighbour lists of nodes, with repeats."""
+    starts, ends = A.indptr[nodes], A.indptr[nodes + 1]
+    lengths = ends - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return A.indices[np.repeat(starts, lengths) + offsets]
+
+
+def add_neighbours(contacts, A, nodes, sign):
+    """Add sign to contacts at every neighbour of nodes."""
+    targets = neighbours(A, nodes)
+    # scattered adds for a few nodes, one pass over the population for many
+    if len(targets) < len(contacts) // 64:
+        np.add.at(contacts, targets, sign)
+    else:
+        contacts += sign * np.bincount(targets, minlength=len(contacts)).astype(np.int32)
+
+
+class NetworkSeirs:
+    """
+    Stochastic SEIRS on a contact network, with the node states, transitions and
+    parameters of seirsplus's SEIRSNetworkModel (including detection and quarantine).
+
+    SEIRSNetworkModel draws one Gillespie event at a time and recomputes every node's
+    propensity for each, so a run costs O(events x nodes). This is a tau-leap instead:
+    every dt days each node leaves its state with probability 1 - exp(-rate * dt), drawn
+    for all nodes in one batch, and the counts of infectious and detected neighbours are
+    updated only around the nodes that changed state.
+    Quarantine contacts (Q) are the contact graph itself, as when SEIRSNetworkModel gets no Q.
+    """
+
+    PARAMS = ['beta', 'sigma', 'gamma', 'xi', 'mu_I', 'nu', 'p', 'beta_D', 'sigma_D', 'gamma_D', 'mu_D',
+              'theta_E', 'theta_I', 'phi_E', 'phi_I', 'psi_E', 'psi_I', 'q']
+
+    def __init__(self, A, params, seed=0):
+        self.A = A
+        self.n = A.shape[0]
+        self.degree = np.diff(A.indptr).astype(float)
+        self.rng = np.random.default_rng(seed)
+        self.params = {k: 0. for k in self.PARAMS}
+        self.params.update({k: v for k, v in params.items() if k in self.PARAMS})
+        for k, default in [('beta_D', 'beta'), ('sigma_D', 'sigma'), ('gamma_D', 'gamma'), ('mu_D', 'mu_I')]:
+            if params.get(k) is None:
+                self.params[k] = self.params[default]
+
+        self.X = np.full(self.n, S, dtype=np.int8)
+        initial = [(E, 'initE'), (I, 'initI'), (D_E, 'initD_E'), (D_I, 'initD_I'), (R, 'initR'), (F, 'initF')]
+        counts = [int(params.get(k, 0)) for _, k in initial]
+        chosen = self.rng.permutation(self.n)[:sum(counts)]
+        self.X[chosen] = np.repeat([state for state, _ in initial], counts)
+        # number of neighbours in each state the force of infection and tracing depend on
+        self.contacts = {state: np.zeros(self.n, dtype=np.int32) for state in [I, D_E, D_I]}
+        for state, c in self.contacts.items():
+            add_neighbours(c, A, np.flatnonzero(self.X == state), 1)
+        self.t = 0.
+
+    def global_rate(self, counts):
+        """Exposure rate of a susceptible from interactions outside its contacts (probability p)."""
+        p = self.params
+        return p['p'] * (p['beta'] * counts[I] + p['q'] * p['beta_D'] * counts[D_I]) / max(counts[S:F].sum(), 1)
+
+    def exit_rates(self, state, nodes, counts):
+        """(transitions x nodes) rates out of state and the state each transition leads to."""
+        p = self.params
+        ones = np.ones(len(nodes))
+        if state == S:
+            local = p['beta'] * self.contacts[I][nodes] + p['beta_D'] * self.contacts[D_I][nodes]
+            degree = self.degree[nodes]
+            local = (1 - p['p']) * np.divide(local, degree, out=np.zeros(len(nodes)), where=degree != 0)
+            return [self.global_rate(counts) + local], [E]
+        traced = self.contacts[D_E][nodes] + self.contacts[D_I][nodes] if state in (E, I) else 0
+        if state == E:
+            return [p['sigma'] * ones, (p['theta_E'] + p['phi_E'] * traced) * p['psi_E']], [I, D_E]
+        if state == I:
+            return [p['gamma'] * ones, p['mu_I'] * ones, (p['theta_I'] + p['phi_I'] * traced) * p['psi_I']], [R, F, D_I]
+        if state == D_E:
+            return [p['sigma_D'] * ones], [D_I]
+        if state == D_I:
+            return [p['gamma_D'] * ones, p['mu_D'] * ones], [R, F]
+        return [p['xi'] * ones], [S]
+
+    def step(self, dt, counts):
+        """Advance dt days, updating counts (nodes by state) in place."""
+        changed, old, new = [], [], []
+        for state in [S, E, I, D_E, D_I, R]:
+            if not counts[state] or (state == S and not (counts[I] or counts[D_I])):
+                continue
+            if state == R and not (self.params['xi'] or self.params['nu']):
+                continue
+            if state == S:
+                # susceptibles with no infectious contact all have the global rate, so how many
+                # of them are exposed is one binomial draw
+                susceptible = self.X == S
+                local = susceptible & ((self.contacts[I] > 0) | (self.contacts[D_I] > 0))
+                nodes = np.flatnonzero(local)
+                exposed = self.rng.binomial(counts[S] - len(nodes), -np.expm1(-self.global_rate(counts) * dt))
+                if exposed:
+                    rest = np.flatnonzero(susceptible & ~local)
+                    changed.append(self.rng.choice(rest, exposed, replace=False))
+                    old.append(np.full(exposed, S, dtype=np.int8))
+                    new.append(np.full(exposed, E, dtype=np.int8))
+            else:
+                nodes = np.flatnonzero(self.X == state)
+            rates, targets = self.exit_rates(state, nodes, counts)
+            # births (rate nu) replace any living node with a susceptible, a no-op for susceptibles
+            if self.params['nu'] and state != S:
+                rates, targets = rates + [self.params['nu'] * np.ones(len(nodes))], targets + [S]
+            rates = np.array(rates)
+            total = rates.sum(axis=0)
+            fired = self.rng.random(len(nodes)) < -np.expm1(-total * dt)
+            if not fired.any():
+                continue
+            # the transition is picked in proportion to its rate, again one draw per node
+            cumulative = np.cumsum(rates[:, fired], axis=0)
+            pick = (self.rng.random(fired.sum()) * total[fired] > cumulative[:-1]).sum(axis=0)
+            changed.append(nodes[fired])
+            old.append(np.full(fired.sum(), state, dtype=np.int8))
+            new.append(np.array(targets, dtype=np.int8)[pick])
+        if not changed:
+            return
+        changed, old, new = np.concatenate(changed), np.concatenate(old), np.concatenate(new)
+        self.X[changed] = new
+        counts += np.bincount(new, minlength=F + 1) - np.bincount(old, minlength=F + 1)
+        for state, c in self.contacts.items():
+            for nodes, sign in [(changed[(old == state) & (new != state)], -1),
+                                (changed[(new == state) & (old != state)], 1)]:
+                if len(nodes):
+                    add_neighbours(c, self.A, nodes, sign)
+
+    def run(self, T, dt=0.25, checkpoints=None, time_budget=None, progress=None):
+        """
+        Simulate T days, returning a DataFrame of compartment counts by day and whether the
+        run stopped early on time_budget (seconds).
+
+        Arguments:
+            checkpoints: {'t': [...], param: [...]} parameter values from each time on, as in seirsplus.
+            progress: called with the fraction of T done, once per simulated day.
+        """
+        start = time.perf_counter()
+        days = int(np.ceil(T))
+        steps_per_day = max(int(round(1 / dt)), 1)
+        dt = 1 / steps_per_day
+        checkpoints = dict(checkpoints or {})
+        times = list(checkpoints.pop('t', []))
+        counts = np.bincount(self.X, minlength=F + 1)
+        records = [counts[S:].copy()]
+        truncated = False
+        for day in range(days):
+            while times and times[0] <= self.t:
+                for k, values in checkpoints.items():
+                    self.params[k] = values[0]
+                    checkpoints[k] = values[1:]
+                times.pop(0)
+            for _ in range(steps_per_day):
+                self.step(dt, counts)
+            self.t = day + 1.
+            records.append(counts[S:].copy())
+            if progress:
+                progress((day + 1) / days)
+            if not records[-1][[E - S, I - S, D_E - S, D_I - S]].any():
+                break
+            if time_budget and time.perf_counter() - start > time_budget:
+                truncated = day + 1 < days
+                break
+        if not truncated:
+            # an epidemic that died out stays where it ended
+            records += [records[-1]] * (days + 1 - len(records))
+        return pd.DataFrame(np.array(records), columns=NETWORK_COMPARTMENTS), truncated
+
+
+def replicate(disk_dir, d, seed):
+    """
+    One run of the scenario d (as in MODELS.seirs_network) with dynamics seeded by seed,
+    as a float32 (day x compartment) array. The contact graph is d's, the same for every
+    replicate, and comes from the worker's memory or disk_dir after its first run.
+    """
+    A = load_contact_graph(disk_dir, d['population'], d['seed'], **d['graph'])
+    df, _ = NetworkSeirs(A, d['params'], seed=seed).run(d['time_steps'], dt=d['dt'], checkpoints=d.get('checkpoints'))
+    return df.values.astype(np.float32)
@@ -0,0 +1,216 @@
+"""Bayesian calibration of SIR / SEIR curves without Theano.
+
+The model of ModelsCode/SEIR_MCMC/run_model.py: curves y(t) from the ODE, observations
+lognormal around them with a sigma per observed state, R0 ~ Normal(2, 3) bounded below by 1,
+gamma ~ Lognormal(log 2, 2), sigma ~ HalfCauchy(1) and beta = R0 * gamma.
+Walkers of an affine-invariant ensemble sampler (Goodman and Weare's stretch move) are
+updated half an ensemble at a time, and each half is one integrate_many solve over its
+walkers' parameters. Independent ensembles run in a process pool and the draws come
+back as (chain, draw) arrays, ArviZ's layout.
+"""
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np  # type: ignore
+from scipy.optimize import minimize  # type: ignore
+from src.shared.models.compartments import (SEIR_STATES, SIR_STATES, integrate_many, seir_jacobian, seir_rhs,
+                                            sir_jacobian, sir_rhs)
+
+try:
+    from scipy.integrate import ODEintWarning  # type: ignore
+except ImportError:
+    # scipy before 1.5 does not export it from scipy.integrate
+    from scipy.integrate.odepack import ODEintWarning  # type: ignore
+
+ODE_MODELS = {
+    'SIR': {'rhs': sir_rhs, 'jacobian': sir_jacobian, 'states': SIR_STATES, 'rates': ['gamma']},
+    'SEIR': {'rhs': seir_rhs, 'jacobian': seir_jacobian, 'states': SEIR_STATES, 'rates': ['gamma', 'eps']},
+}
+# (mean, sd) of the log of each rate
+RATE_PRIORS = {'gamma': (np.log(2), 2.), 'eps': (np.log(0.2), 1.)}
+R0_PRIOR = (2., 3.)
+SIGMA_PRIOR_SCALE = 1.
+
+
+class OdeCalibration:
+    """
+    Posterior of R0, the model's rates and one sigma per observed state.
+
+    Walkers move in an unconstrained space, log(R0 - 1), log(rate) and log(sigma), and the
+    prior carries the Jacobian of that change of variables.
+
+    Arguments:
+        model: 'SIR' or 'SEIR'.
+        times: observation times, after t0.
+        observed: (len(times) x len(observed_states)) positive observations.
+        observed_states: the states observed, e.g. ['S', 'I', 'R'].
+        y0: initial state at t0, in the units of observed.
+    """
+
+    def __init__(self, model, times, observed, observed_states, y0, t0=0.):
+        self.model = ODE_MODELS[model]
+        self.times = np.asarray(times, dtype=float)
+        self.observed = np.asarray(observed, dtype=float).reshape(len(self.times), -1)
+        self.observed_index = [self.model['states'].index(s) for s in observed_states]
+        self.observed_states = list(observed_states)
+        self.y0 = np.asarray(y0, dtype=float)
+        self.t = np.concatenate([[t0], self.times])
+        self.log_observed = np.log(self.observed)
+        self.names = ['R0'] + self.model['rates'] + ['sigma_' + s for s in self.observed_states]
+
+    def unpack(self, u):
+        """{name: (walkers,)} parameters of (walkers x dims) unconstrained positions."""
+        values = np.exp(u)
+        values[:, 0] += 1
+        return dict(zip(self.names, values.T))
+
+    def prior_draws(self, n, rng):
+        """(n x dims) unconstrained positions drawn from the prior."""
+        mean, sd = R0_PRIOR
+        R0 = 1 + np.abs(rng.normal(mean - 1, sd, n))
+        rates = [rng.normal(*RATE_PRIORS[k], n) for k in self.model['rates']]
+        sigma = np.log(np.abs(SIGMA_PRIOR_SCALE * rng.standard_cauchy((len(self.observed_states), n))))
+        return np.column_stack([np.log(R0 - 1)] + rates + list(sigma))
+
+    def find_mode(self, rng, n_candidates=512, n_starts=4):
+        """
+        Unconstrained posterior mode. n_candidates prior draws are scored in one solve,
+        Nelder-Mead runs from the best n_starts of them and is restarted once from the
+        best end point, as the simplex can stall on a ridge.
+        """
+        candidates = self.prior_draws(n_candidates, rng)
+        lp = self.log_posterior(candidates)
+        results = [self.maximize(u) for u in candidates[np.argsort(-lp)[:n_starts]]]
+        return self.maximize(min(results, key=lambda r: r.fun).x).x
+
+    def maximize(self, u, maxiter=1000):
+        return minimize(lambda u: -self.log_posterior(u[None])[0], u, method='Nelder-Mead',
+                        options={'maxiter': maxiter, 'xatol': 1e-4, 'fatol': 1e-4})
+
+    def log_prior(self, u):
+        p = self.unpack(u)
+        mean, sd = R0_PRIOR
+        # log(R0 - 1) has Jacobian R0 - 1, log(x) has Jacobian x
+        lp = -0.5 * ((p['R0'] - mean) / sd) ** 2 + u[:, 0]
+        for i, k in enumerate(self.model['rates']):
+            mean, sd = RATE_PRIORS[k]
+            lp += -0.5 * ((u[:, 1 + i] - mean) / sd) ** 2
+        sigma = u[:, 1 + len(self.model['rates']):]
+        lp += np.sum(-np.log1p((np.exp(sigma) / SIGMA_PRIOR_SCALE) ** 2) + sigma, axis=1)
+        return lp
+
+    def curves(self, params):
+        """(len(times) x observed states x walkers) model curves, NaN for walkers the solver failed on."""
+        rates = [params[k] for k in self.model['rates']]
+        return self.solve([params['R0'] * rates[0]] + rates)
+
+    def solve(self, rates):
+        y0 = np.repeat(self.y0[:, None], len(rates[0]), axis=1)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', ODEintWarning)
+                # observations are compared on a log scale, so small compartments need a tight absolute tolerance
+                solution = integrate_many(self.model['rhs'], self.model['jacobian'], y0, self.t, rates,
+                                          atol=1e-10 * self.y0.sum())
+            return solution[1:, self.observed_index]
+        except ODEintWarning:
+            # the walkers share one solve, so halve the batch until the ones it fails on are alone
+            if len(rates[0]) == 1:
+                return np.full((len(self.times), len(self.observed_index), 1), np.nan)
+            half = len(rates[0]) // 2
+            return np.concatenate([self.solve([r[:half] for r in rates]), self.solve([r[half:] for r in rates])],
+                                  axis=2)
+
+    def log_likelihood(self, u):
+        params = self.unpack(u)
+        sigma = np.array([params['sigma_' + s] for s in self.observed_states])
+        with np.errstate(all='ignore'):
+            log_curves = np.log(self.curves(params))
+            z = (self.log_observed[:, :, None] - log_curves) / sigma[None]
+            ll = np.sum(-0.5 * z ** 2 - np.log(sigma)[None] - self.log_observed[:, :, None], axis=(0, 1))
+        ll -= 0.5 * np.log(2 * np.pi) * self.observed.size
+        return np.where(np.isfinite(ll), ll, -np.inf)
+
+    def log_posterior(self, u):
+        return self.log_prior(u) + self.log_likelihood(u)
+
+
+def stretch_sampler(log_prob, p0, n_steps, rng, a=2.):
+    """
+    Affine-invariant ensemble sampler with the stretch move, both halves of the
+    ensemble updated in turn, each with one vectorized call of log_prob.
+
+    Returns:
+        (n_steps x walkers x dims) positions, (n_steps x walkers) log probabilities and the
+        acceptance fraction of every walker.
+    """
+    p = np.array(p0, dtype=float)
+    n_walkers, n_dims = p.shape
+    lp = log_prob(p)
+    halves = [np.arange(0, n_walkers // 2), np.arange(n_walkers // 2, n_walkers)]
+    chain = np.empty((n_steps, n_walkers, n_dims))
+    lps = np.empty((n_steps, n_walkers))
+    accepted = np.zeros(n_walkers)
+    for step in range(n_steps):
+        for moving, other in [halves, halves[::-1]]:
+            z = ((a - 1) * rng.random(len(moving)) + 1) ** 2 / a
+            partners = p[rng.choice(other, len(moving))]
+            proposal = partners + z[:, None] * (p[moving] - partners)
+            lp_proposal = log_prob(proposal)
+            with np.errstate(invalid='ignore'):
+                accept = np.log(rng.random(len(moving))) < (n_dims - 1) * np.log(z) + lp_proposal - lp[moving]
+            p[moving[accept]] = proposal[accept]
+            lp[moving[accept]] = lp_proposal[accept]
+            accepted[moving[accept]] += 1
+        chain[step] = p
+        lps[step] = lp
+    return chain, lps, accepted / n_steps
+
+
+def run_ensemble(calibration, mode, n_walkers, n_steps, seed, spread=1e-3):
+    """stretch_sampler with n_walkers started in a small ball around mode."""
+    rng = np.random.default_rng(seed)
+    p0 = mode + spread * rng.standard_normal((n_walkers, len(mode)))
+    return stretch_sampler(calibration.log_posterior, p0, n_steps, rng)
+
+
+class Posterior:
+    """Draws of an OdeCalibration, every walker of every ensemble a chain, burn-in dropped."""
+
+    def __init__(self, calibration, chains, log_probs, acceptance):
+        self.calibration = calibration
+        n_chains = chains.shape[1]
+        draws = self.calibration.unpack(chains.reshape(-1, chains.shape[-1]))
+        # (draw x chain) from the sampler, ArviZ wants (chain x draw)
+        self.samples = {k: v.reshape(-1, n_chains).T for k, v in draws.items()}
+        self.samples['beta'] = self.samples['R0'] * self.samples[self.calibration.model['rates'][0]]
+        self.log_probs = log_probs.T
+        self.acceptance = acceptance
+
+    def summary(self, quantiles=(2.5, 50, 97.5)):
+        import pandas as pd  # type: ignore
+        rows = {k: [v.mean(), v.std()] + list(np.percentile(v, quantiles)) for k, v in self.samples.items()}
+        return pd.DataFrame.from_dict(rows, orient='index', columns=['mean', 'sd'] + ['%g%%' % q for q in quantiles])
+
+    def to_arviz(self):
+        """InferenceData of the draws, needs arviz."""
+        import arviz as az  # type: ignore
+        return az.from_dict(posterior=self.samples, sample_stats={'lp': self.log_probs})
+
+
+def sample(calibration, n_walkers=32, n_steps=1000, burn=500, n_ensembles=4, processes=None, seed=0):
+    """
+    Find the posterior mode, then run n_ensembles independent ensembles of n_walkers
+    from it, across processes, and pool their draws.
+    """
+    mode_seed, *seeds = np.random.SeedSequence(seed).spawn(n_ensembles + 1)
+    mode = calibration.find_mode(np.random.default_rng(mode_seed))
+    args = [[calibration] * n_ensembles, [mode] * n_ensembles, [n_walkers] * n_ensembles, [n_steps] * n_ensembles,
+            seeds]
+    if processes == 1 or n_ensembles == 1:
+        results = list(map(run_ensemble, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(run_ensemble, *args))
+    chains = np.concatenate([c[burn:] for c, _, _ in results], axis=1)
+    log_probs = np.concatenate([lp[burn:] for _, lp, _ in results], axis=1)
+    return Posterior(calibration, chains, log_probs, np.concatenate([a for _, _, a in results]))
@@ -0,0 +1,169 @@
+"""Per country calibration of the OLG critical care parameters.
+
+critical_condition_rate, recovery_rate, critical_condition_time and recovery_time are fit
+against the observed serious_critical and new_deaths series, using the same Critical_condition
+and Mortality_Critical derivations as OLG.write. The objective scores a whole grid of candidate
+parameter sets in one call, and countries are spread over a process pool.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from src.shared.models import olg_kernels
+
+CALIBRATED_PARAMS = ['critical_condition_rate', 'recovery_rate', 'critical_condition_time', 'recovery_time']
+COARSE_GRID = {
+    'critical_condition_rate': np.geomspace(0.001, 0.3, 60),
+    'recovery_rate': np.linspace(0.01, 0.99, 50),
+    'critical_condition_time': np.arange(1, 31),
+    'recovery_time': np.arange(1, 31),
+}
+CHUNK_SIZE = 500000
+# rows of (lag, death rate) pairs evaluated at once for the truncated mortality term
+MORTALITY_CHUNK_SIZE = 20000
+
+
+def parameter_grid(**values):
+    """Every combination of the given parameter values, as a dict of flat arrays."""
+    mesh = np.meshgrid(*[np.asarray(values[k]) for k in CALIBRATED_PARAMS], indexing='ij')
+    return {k: m.ravel() for k, m in zip(CALIBRATED_PARAMS, mesh)}
+
+
+def lagged(values, lags):
+    """(candidates x days) array of values shifted by each lag, NaN filled like pd.Series.shift."""
+    days = np.arange(len(values))[None, :] - np.asarray(lags)[:, None]
+    return np.where(days >= 0, values[np.maximum(days, 0)], np.nan)
+
+
+def inner_products(predicted, observed):
+    """<x, x>, <x, y> and <y, y> of every predicted row x with observed y, over days both are known."""
+    valid = ~np.isnan(predicted) & ~np.isnan(observed)
+    x = np.where(valid, predicted, 0)
+    y = np.where(valid, observed, 0)
+    return np.sum(x * x, axis=1), np.sum(x * y, axis=1), np.sum(y * y, axis=1)
+
+
+def calibration_objective(total_cases, serious_critical, new_deaths, candidates):
+    """Loss of every candidate parameter set for one country.
+
+    Critical_condition is linear in critical_condition_rate, so its lagged series and inner
+    products are computed once per distinct pair of times and each candidate costs a few scalar
+    operations. Mortality_Critical is truncated to whole deaths and only depends on the total lag
+    and critical_condition_rate * (1 - recovery_rate), so it is evaluated once per distinct pair
+    of those, which on a grid is far fewer than the candidates.
+
+    Arguments:
+        total_cases: processed detected cases from day_0.
+        serious_critical, new_deaths: observed series on the same days, NaN where missing.
+        candidates: dict of equal length arrays, one per CALIBRATED_PARAMS.
+
+    Returns:
+        squared error of Critical_condition against serious_critical plus that of
+        Mortality_Critical against new_deaths, each relative to the observed sum of squares,
+        one value per candidate.
+    """
+    rate = np.asarray(candidates['critical_condition_rate'], dtype=float)
+    deaths_rate = rate * (1 - np.asarray(candidates['recovery_rate'], dtype=float))
+    critical_time = np.asarray(candidates['critical_condition_time'], dtype=int)
+    lag = critical_time + np.asarray(candidates['recovery_time'], dtype=int)
+    loss = np.zeros(len(rate))
+
+    scale = np.nansum(serious_critical ** 2)
+    if scale > 0:
+        width = lag.max() + 1
+        pairs, inverse = np.unique(critical_time * width + lag, return_inverse=True)
+        critical = lagged(total_cases, pairs // width) - lagged(total_cases, pairs % width + 1)
+        xx, xy, yy = (v[inverse] for v in inner_products(critical, serious_critical))
+        loss += (rate ** 2 * xx - 2 * rate * xy + yy) / scale
+
+    scale = np.nansum(new_deaths ** 2)
+    if scale > 0:
+        valid = ~np.isnan(new_deaths)
+        dI = total_cases - olg_kernels.shift(total_cases, 1)
+        lags, lag_inverse = np.unique(lag, return_inverse=True)
+        deaths_rates, rate_inverse = np.unique(deaths_rate, return_inverse=True)
+        dI_lagged = np.nan_to_num(lagged(dI, lags)[:, valid])
+        # squared error of every (lag, death rate) pair, a few death rates at a time
+        sse = np.empty((len(lags), len(deaths_rates)))
+        step = max(MORTALITY_CHUNK_SIZE // len(lags), 1)
+        for start in range(0, len(deaths_rates), step):
+            chunk = deaths_rates[start:start + step]
+            mortality = np.trunc(np.maximum(dI_lagged[:, None, :] * chunk[None, :, None], 0))
+            sse[:, start:start + step] = np.sum((mortality - new_deaths[valid]) ** 2, axis=2)
+        loss += sse[lag_inverse, rate_inverse] / scale
+    return loss
+
+
+def grid_search(total_cases, serious_critical, new_deaths, grid):
+    best_loss, best = np.inf, None
+    n_candidates = len(grid['critical_condition_rate'])
+    for start in range(0, n_candidates, CHUNK_SIZE):
+        chunk = {k: v[start:start + CHUNK_SIZE] for k, v in grid.items()}
+        losses = calibration_objective(total_cases, serious_critical, new_deaths, chunk)
+        i = np.nanargmin(losses)
+        if losses[i] < best_loss:
+            best_loss, best = losses[i], {k: v[i] for k, v in chunk.items()}
+    return best, best_loss
+
+
+def calibrate_country(args):
+    """Coarse grid over CALIBRATED_PARAMS, then a finer grid around the best candidate."""
+    country, total_cases, serious_critical, new_deaths = args
+    best, _ = grid_search(total_cases, serious_critical, new_deaths, parameter_grid(**COARSE_GRID))
+    rate, recovery_rate = best['critical_condition_rate'], best['recovery_rate']
+    fine_grid = parameter_grid(
+        critical_condition_rate=np.geomspace(rate / 1.1, rate * 1.1, 21),
+        recovery_rate=np.clip(np.linspace(recovery_rate - 0.02, recovery_rate + 0.02, 21), 0, 1),
+        critical_condition_time=np.maximum(best['critical_condition_time'] + np.arange(-1, 2), 1),
+        recovery_time=np.maximum(best['recovery_time'] + np.arange(-1, 2), 1),
+    )
+    best, loss = grid_search(total_cases, serious_critical, new_deaths, fine_grid)
+    row = {'country': country, 'loss': loss, 'n_days': len(total_cases)}
+    row.update({k: best[k] for k in CALIBRATED_PARAMS})
+    return row
+
+
+def calibration_series(df, init_infected):
+    """(country, total_cases, serious_critical, new_deaths) from day_0 for every country with serious data."""
+    for country, country_df in df.sort_values('date').groupby('country'):
+        raw = country_df['total_cases'].values.astype(float)
+        if not (raw >= init_infected).any():
+            continue
+        day_0 = np.argmax(raw >= init_infected)
+        serious_critical = country_df['serious_critical'].values[day_0:].astype(float)
+        new_deaths = country_df['new_deaths'].values[day_0:].astype(float)
+        if np.isnan(serious_critical).all() and np.isnan(new_deaths).all():
+            continue
+        yield country, olg_kernels.enforce_growth(raw[day_0:]), serious_critical, new_deaths
+
+
+def calibrate(df, init_infected, processes=None):
+    """Calibrated parameters of every country in df (the all_dates frame), one row per country."""
+    tasks = list(calibration_series(df, init_infected))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        rows = list(pool.map(calibrate_country, tasks))
+    table = pd.DataFrame(rows, columns=['country'] + CALIBRATED_PARAMS + ['loss', 'n_days'])
+    return table.astype({'critical_condition_time': int, 'recovery_time': int})
+
+
+def data_version(path, init_infected):
+    stat = os.stat(path)
+    return hashlib.sha1(json.dumps(
+        [os.path.abspath(path), stat.st_mtime_ns, stat.st_size, init_infected, CALIBRATED_PARAMS]).encode()
+    ).hexdigest()[:16]
+
+
+def write_calibration(table, path, version):
+    table = table.assign(data_version=version)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    table.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def load_calibration(path):
+    """Calibrated parameters indexed by country, empty if calibration has not run yet."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=CALIBRATED_PARAMS + ['loss', 'n_days', 'data_version'])
+    return pd.read_csv(path).set_index('country')
@@ -0,0 +1,149 @@
+import os
+import pickle
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from src.shared.models import olg_kernels
+from src.shared.models.model_olg import OLGParameters
+
+
+def row_hashes(df, columns=('date', 'total_cases')):
+    """One uint64 per row of columns, summed per country to fingerprint its history."""
+    return pd.util.hash_pandas_object(df[list(columns)], index=False).values
+
+
+class OLGIncremental:
+    """
+    Rolling OLG R state per country, advanced by the new rows of each ETL load.
+
+    Per country we keep only what the next day needs: the last tau + 1 processed detected
+    values, the last tau r_values with their running sum (the moving average), the last raw
+    value for the OLG.process smoothing and the last smoothed R, never the history. A country whose already seen rows changed
+    (or that has not reached init_infected yet, so its day_0 may still move) is recomputed
+    from scratch with olg_kernels; everyone else costs O(new days).
+
+    Results match olg_kernels.calc_r on the full history up to moving-average rounding
+    (benchmarks/olg_incremental_benchmark.py checks this).
+    """
+
+    def __init__(self, p: OLGParameters):
+        self.tau = int(p.tau)
+        self.init_infected = p.init_infected
+        self.countries = p.countries
+        self.state = {}
+
+    def update(self, df):
+        """Advance with every row of df (the full all_dates frame) not seen yet.
+
+        Returns the countries that had to be fully recomputed.
+        """
+        if self.countries is not None:
+            df = df[df['country'].isin(self.countries)]
+        df = df.sort_values(['country', 'date'], kind='mergesort')
+        hashes = row_hashes(df)
+        countries = df['country'].values
+        dates = df['date'].values
+
+        recompute, advance = [], {}
+        bounds = np.flatnonzero(np.r_[True, countries[1:] != countries[:-1], True])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            country = countries[start]
+            state = self.state.get(country)
+            if state is None or not state['started']:
+                recompute.append((country, start, end))
+                continue
+            n_old = np.searchsorted(dates[start:end], state['last_date'], side='right')
+            fingerprint = int(np.sum(hashes[start:start + n_old], dtype=np.uint64))
+            if n_old != state['n_rows'] or fingerprint != state['fingerprint']:
+                recompute.append((country, start, end))
+            elif n_old < end - start:
+                advance[country] = (start + n_old, end)
+
+        for country, start, end in recompute:
+            self.recompute(country, df['total_cases'].values[start:end].astype(float), dates[start:end],
+                           hashes[start:end])
+        self.advance(advance, df['total_cases'].values.astype(float), dates, hashes)
+        return [country for country, _, _ in recompute]
+
+    def recompute(self, country, raw, dates, hashes):
+        tau = self.tau
+        day_0 = np.argmax(raw >= self.init_infected)
+        detected = olg_kernels.enforce_growth(raw[day_0:])
+        r_values, r_adj = olg_kernels.calc_r(detected, tau, self.init_infected)
+        n = len(detected)
+
+        # ring buffers are indexed by day % size, padded with zeros before day_0
+        d_ring = np.zeros(tau + 1)
+        days = np.arange(max(n - tau - 1, 0), n)
+        d_ring[days % (tau + 1)] = detected[days]
+        r_ring = np.zeros(tau)
+        days = np.arange(max(n - tau, 0), n)
+        r_ring[days % tau] = r_values[days]
+
+        self.state[country] = {
+            'started': bool((raw >= self.init_infected).any()),
+            'n_rows': len(raw), 'fingerprint': int(np.sum(hashes, dtype=np.uint64)), 'last_date': dates[-1],
+            'n': n, 'raw_prev': raw[-1], 'd_ring': d_ring, 'r_ring': r_ring, 'ma_sum': r_ring.sum(),
+            'r_adj': r_adj[-1],
+        }
+
+    def advance(self, advance, raw, dates, hashes):
+        """Step every advancing country one day at a time, vectorized across countries."""
+        if not advance:
+            return
+        tau = self.tau
+        countries = list(advance)
+        states = [self.state[c] for c in countries]
+        starts = np.array([advance[c][0] for c in countries])
+        ends = np.array([advance[c][1] for c in countries])
+        t = np.array([s['n'] for s in states])
+        raw_prev = np.array([s['raw_prev'] for s in states])
+        d_ring = np.array([s['d_ring'] for s in states])
+        r_ring = np.array([s['r_ring'] for s in states])
+        ma_sum = np.array([s['ma_sum'] for s in states])
+        r_adj = np.array([s['r_adj'] for s in states])
+
+        for k in range((ends - starts).max()):
+            idx = np.flatnonzero(starts + k < ends)
+            rows = starts[idx] + k
+            tt = t[idx]
+            raw_t = raw[rows]
+            d_t = np.maximum(raw_prev[idx] + 1, raw_t)
+            d_prev = d_ring[idx, (tt - 1) % (tau + 1)]
+            denom = np.where(tt <= tau, d_prev,
+                             d_prev - d_ring[idx, (tt - tau) % (tau + 1)] + d_ring[idx, tt % (tau + 1)])
+            r_t = np.maximum((d_t / (denom + olg_kernels.EPSILON) - 1) * tau, 0)
+            ma_sum[idx] += r_t - r_ring[idx, tt % tau]
+            r_adj[idx] = np.clip(ma_sum[idx] / tau, *olg_kernels.R_CLIP)
+
+            d_ring[idx, tt % (tau + 1)] = d_t
+            r_ring[idx, tt % tau] = r_t
+            raw_prev[idx] = raw_t
+            t[idx] += 1
+
+        for i, state in enumerate(states):
+            new_rows = int(np.sum(hashes[starts[i]:ends[i]], dtype=np.uint64))
+            state.update({
+                'n': t[i], 'raw_prev': raw_prev[i], 'd_ring': d_ring[i], 'r_ring': r_ring[i], 'ma_sum': ma_sum[i],
+                'r_adj': r_adj[i],
+                'n_rows': state['n_rows'] + ends[i] - starts[i], 'last_date': dates[ends[i] - 1],
+                'fingerprint': (state['fingerprint'] + new_rows) % 2 ** 64,
+            })
+
+    def latest(self):
+        """Last day and smoothed R of every country."""
+        return pd.DataFrame([{'country': c, 'date': s['last_date'], 'corona_days': s['n'], 'R': s['r_adj']}
+                             for c, s in self.state.items()], columns=['country', 'date', 'corona_days', 'R'])
+
+    def matches(self, p: OLGParameters):
+        return self.tau == int(p.tau) and self.init_infected == p.init_infected and self.countries == p.countries
+
+    def to_pickle(self, path):
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read_pickle(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,331 @@
+"""Vectorized numeric kernels shared by the OLG and naive models.
+
+All kernels accept a single series (1d) or a panel of series (2d, entity x day).
+Panel rows are aligned on their own day_0 and padded with NaN at the end, so a
+row only ever looks backwards and the padding never leaks into valid days.
+"""
+import numpy as np  # type: ignore
+
+EPSILON = 1e-06
+R_CLIP = (0, 100)
+
+
+def moving_average(values, window):
+    """Trailing moving average, equal to np.convolve(values, ones/window, 'full')[:n].
+
+    The first window - 1 days are divided by the full window (zero padded), as in
+    the original OLG code.
+    """
+    values = np.asarray(values, dtype=float)
+    window = int(window)
+    weights = np.ones(window) / window
+    if values.ndim == 1:
+        return np.convolve(values, weights, mode='full')[:len(values)]
+
+    n_days = values.shape[-1]
+    out = np.zeros_like(values)
+    for k in range(min(window, n_days)):
+        out[..., k:] += values[..., :n_days - k] * weights[k]
+    return out
+
+
+def calc_r(detected, tau, init_infected):
+    """R estimation for detected cases counted from day_0.
+
+    r_values[t] = (d[t] / (d[t-1] - d[t-tau] + d[t-tau-1]) - 1) * tau, using only
+    d[t-1] in the denominator for the first tau days, and r_adj is the tau day
+    moving average of r_values clipped to [0, 100].
+
+    Arguments:
+        detected: cumulative detected cases, 1d or 2d (entity x day).
+        tau: number of days infectious.
+        init_infected: cases on the day before day_0.
+
+    Returns:
+        (r_values, r_adj) with the same shape as detected.
+    """
+    d = np.asarray(detected, dtype=float)
+    tau = int(tau)
+    n_days = d.shape[-1]
+
+    r_values = np.empty_like(d)
+    r_values[..., 0] = (d[..., 0] / (init_infected + EPSILON) - 1) * tau
+    if n_days > 1:
+        # denominator for t = 1..n-1, indexed by t - 1
+        denom = d[..., :-1].copy()
+        if n_days > tau + 1:
+            denom[..., tau:] = d[..., tau:-1] - d[..., 1:n_days - tau] + d[..., :n_days - tau - 1]
+        r_values[..., 1:] = np.maximum((d[..., 1:] / (denom + EPSILON) - 1) * tau, 0)
+
+    r_adj = np.clip(moving_average(r_values, tau), *R_CLIP)
+    return r_values, r_adj
+
+
+def segment_calc_r(detected, starts, tau, init_infected):
+    """calc_r over many series laid end to end in one flat array.
+
+    Arguments:
+        detected: cumulative detected cases of every series, concatenated.
+        starts: offset of each series in detected, increasing and starting at 0.
+
+    Returns:
+        (r_values, r_adj) flat like detected, each series as calc_r would give it.
+    """
+    d = np.asarray(detected, dtype=float)
+    tau = int(tau)
+    n = len(d)
+    starts = np.asarray(starts, dtype=int)
+    lengths = np.diff(np.append(starts, n))
+    seg_start = np.repeat(starts, lengths)
+    pos = np.arange(n) - seg_start
+
+    prev = np.roll(d, 1)
+    lag = np.roll(d, tau)
+    lag_prev = np.roll(d, tau + 1)
+    denom = np.where(pos > tau, prev - lag + lag_prev, prev)
+    r_values = np.where(pos == 0, (d / (init_infected + EPSILON) - 1) * tau,
+                        np.maximum((d / (denom + EPSILON) - 1) * tau, 0))
+
+    # trailing moving average within each series, zero padded at its start
+    cumulative = np.concatenate([[0.], np.cumsum(r_values)])
+    window_start = np.maximum(np.arange(n) + 1 - tau, seg_start)
+    r_adj = np.clip((cumulative[1:] - cumulative[window_start]) / tau, *R_CLIP)
+    return r_values, r_adj
+
+
+def shift(values, periods):
+    """pd.Series.shift along the day axis, NaN filled."""
+    values = np.asarray(values, dtype=float)
+    out = np.full_like(values, np.nan)
+    if periods == 0:
+        out[...] = values
+    elif abs(periods) < values.shape[-1]:
+        if periods > 0:
+            out[..., periods:] = values[..., :-periods]
+        else:
+            out[..., :periods] = values[..., -periods:]
+    return out
+
+
+def enforce_growth(detected):
+    """OLG.process smoothing: every day is at least one more than the raw day before."""
+    detected = np.asarray(detected, dtype=float)
+    out = detected.copy()
+    out[..., 1:] = np.maximum(detected[..., :-1] + 1, detected[..., 1:])
+    return out
+
+
+def calc_asymptomatic(detected, fi, theta, init_infected, n_days=None):
+    """Vectorized OLG.calc_asymptomatic.
+
+    Like the loop version, every day after day_0 uses the smoothed detected delta
+    of the last valid day. n_days gives the valid length of each panel row, and fi
+    and theta may be given per row.
+    """
+    d = np.asarray(detected, dtype=float)
+    if n_days is None:
+        n_days = np.full(d.shape[:-1], d.shape[-1])
+    n_days = np.asarray(n_days, dtype=int)
+    deltas = np.concatenate([d[..., :1], np.diff(d, axis=-1)], axis=-1)
+    deltas_ma = moving_average(deltas, 4)
+    last_ma = np.take_along_axis(np.atleast_2d(deltas_ma), np.atleast_1d(n_days - 1).reshape(-1, 1), axis=-1)
+    last_ma = last_ma.reshape(d.shape[:-1] + (1,))
+
+    fi = np.asarray(fi, dtype=float)[..., None]
+    theta = np.asarray(theta, dtype=float)[..., None]
+    asymptomatic = np.empty(np.broadcast(d, fi, theta).shape)
+    asymptomatic[..., :1] = (1 / (1 - fi)) * (deltas_ma[..., :1] / theta + init_infected)
+    asymptomatic[..., 1:] = (1 / (1 - fi)) * (last_ma / theta + d[..., :-1])
+    return asymptomatic
+
+
+CRYSTAL_BALL_COEF = {'intercept': 1.462, 'r_prev': 0.915, 'hubei_prev': 0.05, 'hubei_prev_t2': 0.058,
+                     's_prev_t7': 0.0152}
+
+
+def crystal_ball_regression(r_prev, hubei_prev, hubei_prev_t2, s_prev_t7):
+    crystal_ball_coef = CRYSTAL_BALL_COEF
+    ln_r = crystal_ball_coef.get('intercept') + crystal_ball_coef.get('r_prev') * np.log(1 + r_prev) \
+           + crystal_ball_coef.get('hubei_prev') * np.log(1 + hubei_prev) \
+           + crystal_ball_coef.get('hubei_prev_t2') * np.log(1 + hubei_prev_t2) \
+           - crystal_ball_coef.get('s_prev_t7') * s_prev_t7
+    return np.exp(ln_r) - 1
+
+
+def next_gen(r0, tau, c0, ct):
+    r0d = r0 / tau
+    return r0d * (ct - c0) + ct
+
+
+def project_r(r0d, n_obs, n_end, r_reference, stringency):
+    """OLG.predict crystal ball recurrence for many rows at once.
+
+    Arguments:
+        r0d: (rows x days) r_adj from day_0, only the first n_obs days of each row are used.
+        n_obs, n_end: observed and projected length of each row.
+        r_reference: analogue R curve, its last value is held past its end.
+        stringency: (rows x days) StringencyIndex from day_0, already extended by the path.
+
+    Returns:
+        (r0d, r_predicted), r0d extended to n_end and clipped to [0, 100].
+    """
+    r0d = np.array(r0d, dtype=float)
+    n_obs, n_end = np.asarray(n_obs), np.asarray(n_end)
+    width = r0d.shape[1]
+    r_reference = np.append(r_reference, np.repeat(r_reference[-1], max(width - len(r_reference), 0)))
+    r_predicted = np.full(r0d.shape, np.nan)
+    r_predicted[:, 0] = 0
+    for t in range(1, n_end.max()):
+        if t <= 2:
+            projected_r = r0d[:, t]
+        else:
+            projected_r = crystal_ball_regression(r0d[:, t - 1], r_reference[t - 1], r_reference[t - 2],
+                                                  stringency[:, t])
+        active = t < n_end
+        extend = active & (t >= n_obs)
+        r0d[extend, t] = projected_r[extend]
+        r_predicted[active, t] = projected_r[active]
+    return np.clip(r0d, *R_CLIP), r_predicted
+
+
+def project_detected(detected, r0d, n_obs, n_end, tau):
+    """OLG.predict_next_gen for many rows: detected is extended from n_obs to n_end in place."""
+    n_obs, n_end = np.asarray(n_obs), np.asarray(n_end)
+    rows = np.arange(len(detected))
+    next_gen_ = detected[rows, n_obs - 1]
+    # like OLG.predict_next_gen, c0 stays at the last observed tau lag
+    c0 = np.where(n_obs - tau >= 0, detected[rows, np.maximum(n_obs - tau, 0)], 0)
+    for k in range((n_end - n_obs).max()):
+        active = n_obs + k < n_end
+        t = np.minimum(n_obs + k, detected.shape[1] - 1)
+        next_gen_ = np.where(active, next_gen(r0=r0d[rows, t], tau=tau, c0=c0, ct=next_gen_), next_gen_)
+        detected[rows[active], t[active]] = next_gen_[active]
+    return detected
+
+
+def critical_care(total_cases, critical_condition_rate, recovery_rate, critical_condition_time, recovery_time):
+    """Critical condition, recovery and mortality columns of OLG.write from total_cases."""
+    lag = critical_condition_time + recovery_time
+    dI = total_cases - shift(total_cases, 1)
+    recovery_critical = np.trunc(np.nan_to_num(np.maximum(
+        shift(dI, lag) * critical_condition_rate * recovery_rate, 0)))
+    mortality_critical = np.trunc(np.nan_to_num(np.maximum(
+        shift(dI, lag) * critical_condition_rate * (1 - recovery_rate), 0)))
+    return {
+        'dI': dI,
+        'Critical_condition': (shift(total_cases, critical_condition_time)
+                               - shift(total_cases, lag + 1)) * critical_condition_rate,
+        'Recovery_Critical': recovery_critical,
+        'Mortality_Critical': mortality_critical,
+        'Total_Mortality': np.cumsum(mortality_critical, axis=-1),
+        'Total_Critical_Recovery': np.cumsum(recovery_critical, axis=-1),
+    }
+
+
+def ffill(values):
+    """Forward fill NaN along the day axis of a 2d array."""
+    values = np.asarray(values, dtype=float)
+    idx = np.where(np.isnan(values), 0, np.arange(values.shape[-1]))
+    idx = np.maximum.accumulate(idx, axis=-1)
+    return np.take_along_axis(values, idx, axis=-1)
+
+
+def extend_stringency(observed, n_obs, paths, width):
+    """StringencyIndex from day_0 (ffilled) followed by a path per row, last value held to width.
+
+    Arguments:
+        observed: (rows x days) observed StringencyIndex from day_0.
+        n_obs: observed length of each row.
+        paths: (rows x horizon) stringency path that starts the day after n_obs.
+    """
+    n_obs = np.asarray(n_obs)
+    paths = np.atleast_2d(paths)
+    days = np.arange(width)
+    out = np.full((len(n_obs), width), np.nan)
+    out[:, :observed.shape[1]] = observed[:, :width]
+    out = np.where(days < n_obs[:, None], ffill(out), np.nan)
+    observed = out.copy()
+    path_days = n_obs[:, None] + np.arange(paths.shape[1])
+    rows = np.repeat(np.arange(len(n_obs)), paths.shape[1])
+    inside = path_days.ravel() < width
+    out[rows[inside], path_days.ravel()[inside]] = paths.ravel()[inside]
+    return observed, ffill(out)
+
+
+def holt_filter(y, smoothing_level, smoothing_slope, level, trend, jacobian=False):
+    """Exponential (multiplicative trend) Holt recurrence over the rows of y.
+
+    Returns the one step ahead fit, the final level and trend and, with jacobian=True,
+    d fit / d (initial level, initial trend) as a (rows x days x 2) array.
+    """
+    alpha, beta = smoothing_level, smoothing_slope
+    fitted = np.empty_like(y)
+    if jacobian:
+        jac = np.empty(y.shape + (2,))
+        d_level = np.stack([np.ones_like(level), np.zeros_like(level)], axis=-1)
+        d_trend = np.stack([np.zeros_like(trend), np.ones_like(trend)], axis=-1)
+    for t in range(y.shape[1]):
+        fitted[:, t] = level * trend
+        new_level = alpha * y[:, t] + (1 - alpha) * level * trend
+        new_trend = beta * new_level / level + (1 - beta) * trend
+        if jacobian:
+            jac[:, t] = d_level * trend[:, None] + level[:, None] * d_trend
+            d_new_level = (1 - alpha) * jac[:, t]
+            d_trend = beta * (d_new_level * level[:, None] - new_level[:, None] * d_level) / (level ** 2)[:, None] \
+                + (1 - beta) * d_trend
+            d_level = d_new_level
+        level, trend = new_level, new_trend
+    if jacobian:
+        return fitted, level, trend, jac
+    return fitted, level, trend
+
+
+def holt_forecast(y, horizon, smoothing_level=0.1, smoothing_slope=0.9, n_iter=50):
+    """Holt(y, exponential=True).fit(smoothing_level, smoothing_slope).forecast(horizon) for every row.
+
+    This is the statsmodels 0.11 fit of requirements.txt. It starts from level y[0] and
+    trend y[1] / y[0] and fits those two by least squares, but its objective rejects
+    smoothing_slope > smoothing_level, so for OLG's 0.1 / 0.9 it keeps the starting values
+    and we match it to rounding (1e-13 relative). Otherwise we fit them with a
+    Levenberg-Marquardt step per row on the analytic jacobian, within 2e-5 relative of
+    statsmodels over two months. statsmodels raises on a window with a value <= 0; such
+    rows (R clipped to 0) hold their last value instead.
+
+    Arguments:
+        y: (rows x window) or a single window.
+        horizon: number of days to forecast.
+
+    Returns:
+        forecasts with the same number of dimensions as y, horizon days long.
+    """
+    y = np.asarray(y, dtype=float)
+    single = y.ndim == 1
+    y = np.atleast_2d(y)
+    positive = (y > 0).all(axis=1)
+    flat = np.repeat(y[:, -1:], horizon, axis=1)
+    y = np.where(positive[:, None], y, 1.)
+    params = np.stack([y[:, 0], y[:, 1] / y[:, 0]], axis=-1)
+    damping = np.full(len(y), 1e-3)
+    for _ in range(n_iter if smoothing_slope <= smoothing_level else 0):
+        fitted, _, _, jac = holt_filter(y, smoothing_level, smoothing_slope, params[:, 0], params[:, 1],
+                                        jacobian=True)
+        resid = fitted - y
+        sse = np.sum(resid ** 2, axis=1)
+        jtj = np.einsum('rtk,rtj->rkj', jac, jac)
+        grad = np.einsum('rtk,rt->rk', jac, resid)
+        # damped normal equations, solved as 2 x 2 systems for all rows at once
+        a = jtj * (1 + damping[:, None, None] * np.eye(2))
+        det = a[:, 0, 0] * a[:, 1, 1] - a[:, 0, 1] * a[:, 1, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = -np.stack([a[:, 1, 1] * grad[:, 0] - a[:, 0, 1] * grad[:, 1],
+                              a[:, 0, 0] * grad[:, 1] - a[:, 1, 0] * grad[:, 0]], axis=-1) / det[:, None]
+            candidate = params + step
+            fitted, _, _ = holt_filter(y, smoothing_level, smoothing_slope, candidate[:, 0], candidate[:, 1])
+            # statsmodels bounds both from below by 0
+            better = (np.sum((fitted - y) ** 2, axis=1) < sse) & (candidate > 0).all(axis=1)
+        params = np.where(better[:, None], candidate, params)
+        damping = np.where(better, damping / 10, damping * 10)
+
+    _, level, trend = holt_filter(y, smoothing_level, smoothing_slope, params[:, 0], params[:, 1])
+    forecast = np.where(positive[:, None], level[:, None] * trend[:, None] ** np.arange(1, horizon + 1), flat)
+    return forecast[0] if single else forecast
@@ -0,0 +1,371 @@
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from src.shared.cache import make_key
+from src.shared.models import olg_kernels
+from src.shared.models.model_olg import OLG, OLGParameters, SERIOUS_DATA_RENAME
+from src.shared.models.olg_incremental import row_hashes
+
+OBSERVED_COLS = ['StringencyIndex', 'serious_critical', 'new_cases', 'activecases', 'new_deaths', 'total_deaths']
+NAT = np.iinfo(np.int64).min
+
+
+class OLGPanel:
+    """
+    OLG for many countries in one pass.
+
+    Every country is scattered onto one row of an (entity x day) array starting at its own
+    day_0, padded with NaN at the end, and process/calc_r/predict/calc_asymptomatic/write
+    run on the whole array at once. Output matches concatenating OLG.df per country.
+
+    p.countries = None runs every country in df.
+    forecast_countries are projected, israel by the crystal ball regression and any other
+    country by OLG.predict's Holt trend of R (OLG itself only projects israel, and no page asks
+    for other countries).
+    r_reference is the analogue R curve of the regression, hubei by default.
+    """
+
+    def __init__(self, df, p: OLGParameters, stringency=None, have_serious_data=False,
+                 forecast_countries=('israel',), r_reference=None):
+        self.p = p
+        self.have_serious_data = have_serious_data
+        self.stringency = stringency if stringency is not None else OLG.get_stringency(None)
+        self.forecast_cnt = len(self.stringency)
+        self.r_hubei = np.asarray(r_reference) if r_reference is not None else self.get_r_hubei(p.tau)
+        self.process(df, p.countries, p.init_infected, forecast_countries)
+        self.calc_r(p.tau, p.init_infected)
+        self.predict(p.tau)
+        self.predict_next_gen(p.tau)
+        self.calc_asymptomatic(p.fi, p.theta, p.init_infected)
+        self.df = self.write(p.tau, critical_condition_rate=p.critical_condition_rate,
+                             recovery_rate=p.recovery_rate, critical_condition_time=p.critical_condition_time,
+                             recovery_time=p.recovery_time)
+
+    @staticmethod
+    def get_r_hubei(tau):
+        hubei = OLG.get_hubei()
+        day_0 = np.argmax(hubei >= 250)
+        _, r_adj = olg_kernels.calc_r(olg_kernels.enforce_growth(hubei[day_0:]), tau, 250)
+        return r_adj
+
+    def grid(self, values, fill=np.nan, dtype=float):
+        out = np.full((len(self.countries), self.width), fill, dtype=dtype)
+        out[self.rows, self.cols] = values[self.keep]
+        return out
+
+    def process(self, df, countries, init_infected, forecast_countries):
+        if countries is None:
+            countries = sorted(df['country'].dropna().unique())
+        df = df[df['country'].isin(countries)]
+        codes = pd.Categorical(df['country'], categories=countries).codes
+        counts = np.bincount(codes, minlength=len(countries))
+        present = counts > 0
+        # renumber so countries without rows drop out, keeping the requested order
+        codes = (np.cumsum(present) - 1)[codes]
+        self.countries = [c for c, has_rows in zip(countries, present) if has_rows]
+        counts = counts[present]
+
+        order = np.argsort(codes, kind='mergesort')
+        df = df.iloc[order]
+        codes = codes[order]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        pos = np.arange(len(codes)) - starts[codes]
+
+        raw = df['total_cases'].values.astype(float)
+        first = np.minimum.reduceat(np.where(raw >= init_infected, pos, len(codes)), starts)
+        self.day_0 = np.where(first == len(codes), 0, first)
+        self.keep = pos >= self.day_0[codes]
+        self.rows, self.cols = codes[self.keep], (pos - self.day_0[codes])[self.keep]
+
+        self.n_obs = counts - self.day_0
+        self.is_forecast = np.isin(self.countries, list(forecast_countries))
+        self.n_days = self.n_obs + np.where(self.is_forecast, self.forecast_cnt + 7, 0)
+        self.width = self.n_days.max()
+
+        self.raw = self.grid(raw)
+        self.detected = olg_kernels.enforce_growth(self.raw)
+        self.observed = {c: self.grid(df[c].values.astype(float)) for c in OBSERVED_COLS
+                         if c in df and (self.have_serious_data or c == 'StringencyIndex')}
+        self.dates = self.grid(df['date'].values.astype('datetime64[ns]').view('int64'), fill=NAT, dtype='int64')
+
+    def calc_r(self, tau, init_infected):
+        self.r_values, self.r_adj = olg_kernels.calc_r(self.detected, tau, init_infected)
+        self.r0d = self.r_adj.copy()
+
+    def predict(self, tau):
+        f = np.flatnonzero(self.is_forecast)
+        self.r_predicted = np.full((len(f), self.width), np.nan)
+        crystal_ball = np.asarray(self.countries)[f] == 'israel'
+        b = f[crystal_ball]
+        if len(b):
+            n_obs, n_end = self.n_obs[b], self.n_days[b]
+
+            # StringencyIndex from day_0 (ffilled as OLG.predict does) followed by the stringency path
+            future = self.stringency['StringencyIndex'].values
+            observed, stringency = olg_kernels.extend_stringency(
+                self.observed['StringencyIndex'][b], n_obs, np.tile(future, (len(b), 1)), self.width)
+            self.observed['StringencyIndex'][b] = observed
+
+            r0d, self.r_predicted[crystal_ball] = olg_kernels.project_r(self.r0d[b], n_obs, n_end, self.r_hubei,
+                                                                        stringency)
+            self.r0d[b] = r0d
+
+        h = f[~crystal_ball]
+        if len(h):
+            # every projected day, the 7 past the stringency path included
+            horizon = self.forecast_cnt + 7
+            days = self.n_obs[h, None] + np.arange(horizon)
+            self.r0d[np.repeat(h, horizon), days.ravel()] = \
+                np.clip(self.holt_forecast(tau, horizon, rows=h), *olg_kernels.R_CLIP).ravel()
+
+    def predict_next_gen(self, tau):
+        f = np.flatnonzero(self.is_forecast)
+        if len(f):
+            self.detected[f] = olg_kernels.project_detected(self.detected[f], self.r0d[f], self.n_obs[f],
+                                                            self.n_days[f], tau)
+
+    def holt_forecast(self, tau, horizon=None, rows=None):
+        """OLG.predict's Holt trend forecast of R for every country, from its last tau observed days.
+
+        Returns a (countries x horizon) array, horizon defaulting to the stringency path + 1 as in OLG,
+        or one row per index of rows.
+        """
+        if horizon is None:
+            horizon = self.forecast_cnt + 1
+        rows = np.arange(len(self.countries)) if rows is None else np.asarray(rows)
+        window = self.n_obs[rows, None] - tau + np.arange(tau)
+        r_adj = np.take_along_axis(self.r_adj[rows], np.maximum(window, 0), axis=1)
+        return olg_kernels.holt_forecast(r_adj, horizon, smoothing_level=0.1, smoothing_slope=0.9)
+
+    def calc_asymptomatic(self, fi, theta, init_infected):
+        self.valid = np.arange(self.width) < self.n_days[:, None]
+        self.asymptomatic_infected = np.where(
+            self.valid, olg_kernels.calc_asymptomatic(self.detected, fi, theta, init_infected, self.n_days), np.nan)
+
+    def predict_scenarios(self, country, scenarios):
+        """Project one country under many stringency paths at once.
+
+        Arguments:
+            country: a country of this panel.
+            scenarios: (n_scenarios x horizon) StringencyIndex paths, starting the day after
+                the last observation (the last value is held for 7 more days, as in OLG).
+
+        Returns:
+            dict of (n_scenarios x days) arrays from day_0: StringencyIndex, R, r_predicted,
+            total_cases, Critical_condition, Mortality_Critical and Total_Mortality, plus the
+            shared 'date' axis.
+        """
+        p = self.p
+        i = self.countries.index(country)
+        scenarios = np.atleast_2d(np.asarray(scenarios, dtype=float))
+        n_scenarios, horizon = scenarios.shape
+        n_obs = self.n_obs[i]
+        width = n_obs + horizon + 7
+        n_obs_s, n_end = np.repeat(n_obs, n_scenarios), np.repeat(width, n_scenarios)
+
+        _, stringency = olg_kernels.extend_stringency(
+            np.repeat(self.observed['StringencyIndex'][i:i + 1, :n_obs], n_scenarios, axis=0), n_obs_s, scenarios,
+            width)
+        r0d = np.full((n_scenarios, width), np.nan)
+        r0d[:, :n_obs] = self.r_adj[i, :n_obs]
+        r0d, r_predicted = olg_kernels.project_r(r0d, n_obs_s, n_end, self.r_hubei, stringency)
+        detected = np.full((n_scenarios, width), np.nan)
+        detected[:, :n_obs] = self.detected[i, :n_obs]
+        detected = olg_kernels.project_detected(detected, r0d, n_obs_s, n_end, p.tau)
+        critical = olg_kernels.critical_care(detected, p.critical_condition_rate, p.recovery_rate,
+                                             p.critical_condition_time, p.recovery_time)
+
+        dates = self.dates[i, :n_obs].view('datetime64[ns]')
+        dates = np.append(dates, dates.max() + np.arange(1, width - n_obs + 1) * np.timedelta64(1, 'D'))
+        return {'date': dates, 'StringencyIndex': stringency, 'R': r0d, 'r_predicted': r_predicted,
+                'total_cases': detected, 'Critical_condition': critical['Critical_condition'],
+                'Mortality_Critical': critical['Mortality_Critical'], 'Total_Mortality': critical['Total_Mortality']}
+
+    def monte_carlo(self, country, draws, quantiles=(5, 50, 95)):
+        """Quantile bands of one country's projection over many parameter draws.
+
+        Draws sharing a tau share the R and detected projection, which is computed once per
+        distinct tau (against the same reference curve); fi, theta, critical_condition_rate
+        and recovery_rate then enter every draw as one broadcast array operation.
+
+        Arguments:
+            country: a country of this panel.
+            draws: dict of equal length arrays for tau, fi, theta, critical_condition_rate and
+                recovery_rate, e.g. from sample_olg_parameters.
+            quantiles: (lower, median, upper) percentiles.
+
+        Returns:
+            long DataFrame with date, corona_days, country, prediction_ind, variable, lower,
+            median and upper, variables named like the columns of self.df.
+        """
+        p = self.p
+        i = self.countries.index(country)
+        n_obs, width = self.n_obs[i], self.n_days[i]
+        n_obs_1, n_end_1 = np.array([n_obs]), np.array([width])
+        if self.is_forecast[i]:
+            _, stringency = olg_kernels.extend_stringency(
+                self.observed['StringencyIndex'][i:i + 1, :n_obs], n_obs_1,
+                self.stringency['StringencyIndex'].values, width)
+
+        taus, inverse = np.unique(np.asarray(draws['tau'], dtype=int), return_inverse=True)
+        detected = np.full((len(taus), width), np.nan)
+        r0d = np.full((len(taus), width), np.nan)
+        for k, tau in enumerate(taus):
+            detected[k, :n_obs] = self.detected[i, :n_obs]
+            _, r0d[k, :n_obs] = olg_kernels.calc_r(detected[k, :n_obs], tau, p.init_infected)
+            if self.is_forecast[i]:
+                r0d[k:k + 1], _ = olg_kernels.project_r(r0d[k:k + 1], n_obs_1, n_end_1, self.r_hubei, stringency)
+                olg_kernels.project_detected(detected[k:k + 1], r0d[k:k + 1], n_obs_1, n_end_1, tau)
+
+        total_cases = detected[inverse]
+        draws = {k: np.asarray(v, dtype=float) for k, v in draws.items()}
+        infected = olg_kernels.calc_asymptomatic(total_cases, draws['fi'], draws['theta'], p.init_infected)
+        critical = olg_kernels.critical_care(total_cases, draws['critical_condition_rate'][:, None],
+                                             draws['recovery_rate'][:, None], p.critical_condition_time,
+                                             p.recovery_time)
+        values = {'total_cases': total_cases, 'R': r0d[inverse], 'infected': infected, 'dI': critical['dI']}
+        for name in ['Critical_condition', 'Recovery_Critical', 'Mortality_Critical', 'Total_Mortality']:
+            values[name] = critical[name]
+
+        dates = self.dates[i, :n_obs].view('datetime64[ns]')
+        dates = np.append(dates, dates.max() + np.arange(1, width - n_obs + 1) * np.timedelta64(1, 'D'))
+        corona_days = np.arange(1, width + 1)
+        frames = []
+        for name, value in values.items():
+            lower, median, upper = np.nanpercentile(value, quantiles, axis=0)
+            frames.append(pd.DataFrame({
+                'date': dates, 'corona_days': corona_days, 'country': country,
+                'prediction_ind': (corona_days > n_obs).astype(int),
+                'variable': SERIOUS_DATA_RENAME.get(name, name) if self.have_serious_data else name,
+                'lower': lower, 'median': median, 'upper': upper}))
+        return pd.concat(frames, ignore_index=True)
+
+    def write(self, tau, critical_condition_rate, recovery_rate, critical_condition_time, recovery_time):
+        shift = olg_kernels.shift
+        total_cases = self.detected
+        corona_days = np.broadcast_to(np.arange(1, self.width + 1), total_cases.shape)
+        if self.have_serious_data:
+            serious_critical = self.observed['serious_critical']
+            new_cases = self.observed['new_cases']
+        else:
+            serious_critical = np.full(total_cases.shape, np.nan)
+            new_cases = self.raw - shift(self.raw, 1)
+
+        # pad dates for predictions
+        last_date = self.dates.max(axis=1)
+        day_ns = np.timedelta64(1, 'D').astype('timedelta64[ns]').astype('int64')
+        predicted_days = np.arange(self.width) - self.n_obs[:, None] + 1
+        dates = np.where(predicted_days > 0, last_date[:, None] + predicted_days * day_ns, self.dates)
+
+        # the yishuv frames have no StringencyIndex
+        stringency = self.observed.get('StringencyIndex', np.full(total_cases.shape, np.nan)).copy()
+        f = np.flatnonzero(self.is_forecast)
+        future = self.stringency['StringencyIndex'].values
+        stringency[np.repeat(f, len(future)), (self.n_obs[f, None] + np.arange(len(future))).ravel()] = \
+            np.tile(future, len(f))
+
+        infected = self.asymptomatic_infected
+        exposed = shift(infected, -tau)
+        critical = olg_kernels.critical_care(total_cases, critical_condition_rate, recovery_rate,
+                                             critical_condition_time, recovery_time)
+
+        columns = {
+            'date': dates,
+            'StringencyIndex': stringency,
+            'serious_critical': serious_critical,
+            'new_cases': new_cases,
+            'activecases': self.observed.get('activecases', np.full(total_cases.shape, np.nan)),
+            'new_deaths': self.observed.get('new_deaths', np.full(total_cases.shape, np.nan)),
+            'total_deaths': self.observed.get('total_deaths', np.full(total_cases.shape, np.nan)),
+            'r_values': self.r_values,
+            'total_cases': np.round(total_cases),
+            'R': self.r0d,
+            'infected': infected,
+            'exposed': np.round(exposed),
+            'corona_days': corona_days,
+            'prediction_ind': (corona_days > self.n_obs[:, None]).astype(int),
+            'Currently Infected': np.round(np.where(
+                corona_days <= (critical_condition_time + recovery_time), total_cases,
+                total_cases - shift(total_cases, critical_condition_time + 6 + recovery_time))),
+            'Doubling Time': np.log(2) / np.log(1 + self.r0d / tau),
+            'dI': critical['dI'],
+            'dA': infected - shift(infected, 1),
+            'dE': exposed - shift(exposed, 1),
+            'true_critical_rate': serious_critical / (
+                    shift(total_cases, critical_condition_time)
+                    - shift(total_cases, critical_condition_time + recovery_time)),
+            'Critical_condition': np.round(critical['Critical_condition']),
+            'Recovery_Critical': critical['Recovery_Critical'],
+            'Mortality_Critical': critical['Mortality_Critical'],
+            'Total_Mortality': critical['Total_Mortality'],
+            'Total_Critical_Recovery': critical['Total_Critical_Recovery'],
+        }
+        df = pd.DataFrame({k: v[self.valid] for k, v in columns.items()},
+                          index=np.broadcast_to(np.arange(self.width), total_cases.shape)[self.valid])
+        df.insert(1, 'country', np.repeat(self.countries, self.n_days))
+        df['date'] = pd.to_datetime(df['date'].values)
+        for c in ['Recovery_Critical', 'Mortality_Critical', 'Total_Mortality', 'Total_Critical_Recovery']:
+            df[c] = df[c].astype(int)
+
+        if self.have_serious_data:
+            df = df.rename(columns=SERIOUS_DATA_RENAME)
+
+        r_hubei = np.append(self.r_hubei, np.repeat(np.nan, self.width))[:self.width]
+        df['r_hubei'] = np.broadcast_to(r_hubei, total_cases.shape)[self.valid]
+        if len(f):
+            r_predicted = np.full(total_cases.shape, np.nan)
+            r_predicted[f] = self.r_predicted
+            df['r_predicted'] = r_predicted[self.valid]
+        return df
+
+
+def sample_olg_parameters(p: OLGParameters, n_draws, spread=0.1, seed=None):
+    """Draws around p for OLGPanel.monte_carlo.
+
+    fi, theta, critical_condition_rate and recovery_rate are beta distributed with mean at
+    their value in p and a standard deviation of spread times that value; tau is a rounded
+    normal with the same relative spread, at least 2.
+    """
+    rng = np.random.RandomState(seed)
+    draws = {}
+    for name in ['fi', 'theta', 'critical_condition_rate', 'recovery_rate']:
+        mean = getattr(p, name)
+        # beta concentration for the requested variance, kept valid for large spreads
+        concentration = max(mean * (1 - mean) / (spread * mean) ** 2 - 1, 1e-03)
+        draws[name] = rng.beta(mean * concentration, (1 - mean) * concentration, size=n_draws)
+    draws['tau'] = np.maximum(np.round(rng.normal(p.tau, spread * p.tau, size=n_draws)), 2).astype(int)
+    return draws
+
+
+def olg_cache_key(df, p: OLGParameters, stringency=None, have_serious_data=False, forecast_countries=('israel',),
+                  r_reference=None):
+    """Key from the OLGParameters fields, the stringency path and a per-country hash of the input rows."""
+    countries = p.countries if p.countries is not None else sorted(df['country'].dropna().unique())
+    df = df[df['country'].isin(countries)]
+    columns = [c for c in ['date', 'country', 'total_cases'] + OBSERVED_COLS if c in df]
+    fingerprints = pd.Series(row_hashes(df, columns)).groupby(df['country'].values).sum()
+    if stringency is not None:
+        stringency = stringency[['date', 'StringencyIndex']].reset_index(drop=True)
+    if r_reference is not None:
+        r_reference = np.asarray(r_reference, dtype=float)
+    return make_key(sorted(vars(p).items()), list(countries), {k: int(v) for k, v in fingerprints.items()},
+                    stringency, have_serious_data, list(forecast_countries), r_reference)
+
+
+def cached_olg(cache, df, p: OLGParameters, stringency=None, have_serious_data=False,
+               forecast_countries=('israel',), r_reference=None):
+    """OLGPanel(...).df through a ResultCache, so repeat parameter sets skip the model."""
+    key = olg_cache_key(df, p, stringency, have_serious_data, forecast_countries, r_reference)
+    result = cache.get_or_compute(
+        key, lambda: OLGPanel(df, p, stringency, have_serious_data, forecast_countries, r_reference).df)
+    return result.copy()
+
+
+def cached_monte_carlo(cache, df, p: OLGParameters, country, n_draws=10000, spread=0.1, seed=0,
+                       have_serious_data=False, r_reference=None):
+    """OLGPanel.monte_carlo bands for country through a ResultCache."""
+    key = make_key(olg_cache_key(df, p, None, have_serious_data, (country,), r_reference),
+                   'monte_carlo', country, n_draws, spread, seed)
+    result = cache.get_or_compute(
+        key, lambda: OLGPanel(df, p, None, have_serious_data, (country,), r_reference).monte_carlo(
+            country, sample_olg_parameters(p, n_draws, spread, seed)))
+    return result.copy()
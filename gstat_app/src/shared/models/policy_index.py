@@ -0,0 +1,73 @@
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+
+class PolicyIndex:
+    """
+    Country bitsets per (policy indicator, level, corona day) for the naive model filters.
+
+    Countries get ids in order of first appearance and a set of countries is a row of
+    uint64 words. A country has one row per corona day, so "some day in the window on which
+    every condition holds" is an AND over the indicators for each day, then an OR over the
+    window's days. Levels are kept both as "== level" and ">= level" bitsets.
+    """
+
+    def __init__(self, df, indicators, stringency_col='StringencyIndexForDisplay'):
+        self.countries = np.asarray(pd.unique(df['CountryName']))
+        country_id = pd.Categorical(df['CountryName'], categories=self.countries).codes
+        days = df['corona_days'].values.astype(int)
+        self.n_days = int(days.max()) + 1 if len(df) else 0
+        self.n_words = (len(self.countries) + 63) // 64
+        word, bit = country_id // 64, np.left_shift(np.uint64(1), (country_id % 64).astype(np.uint64))
+
+        # countries with a row on each day, where every query starts
+        self.present = np.zeros((self.n_days, self.n_words), dtype=np.uint64)
+        np.bitwise_or.at(self.present, (days, word), bit)
+        self.levels, self.equal, self.at_least = {}, {}, {}
+        for k in indicators:
+            values = df[k].values.astype(float)
+            known = ~np.isnan(values)
+            levels = np.unique(values[known])
+            equal = np.zeros((len(levels), self.n_days, self.n_words), dtype=np.uint64)
+            np.bitwise_or.at(equal, (np.searchsorted(levels, values[known]), days[known], word[known]), bit[known])
+            self.levels[k] = levels
+            self.equal[k] = equal
+            self.at_least[k] = np.bitwise_or.accumulate(equal[::-1], axis=0)[::-1]
+
+        # the stringency index is continuous, kept as a (day x country) matrix for range queries
+        self.stringency = np.full((self.n_days, len(self.countries)), np.nan)
+        self.stringency[days, country_id] = df[stringency_col].values
+
+    def window(self, first_day, last_day):
+        return slice(min(max(int(first_day), 0), self.n_days), min(max(int(last_day) + 1, 0), self.n_days))
+
+    def level_bits(self, indicator, level, window, exact):
+        levels = self.levels[indicator]
+        i = np.searchsorted(levels, level)
+        if i == len(levels) or (exact and levels[i] != level):
+            return np.uint64(0)
+        return (self.equal if exact else self.at_least)[indicator][i, window]
+
+    def query(self, first_day, last_day, equal=None, at_least=None):
+        """Countries with a corona day in [first_day, last_day] on which every condition holds.
+
+        Arguments:
+            equal: {indicator: level} conditions indicator == level.
+            at_least: {indicator: level} conditions indicator >= level.
+        """
+        window = self.window(first_day, last_day)
+        days = self.present[window].copy()
+        for k, level in (equal or {}).items():
+            days &= self.level_bits(k, level, window, True)
+        for k, level in (at_least or {}).items():
+            days &= self.level_bits(k, level, window, False)
+        return self.members(np.bitwise_or.reduce(days, axis=0, initial=np.uint64(0)))
+
+    def stringency_range(self, first_day, last_day, low, high):
+        """Countries with a corona day in [first_day, last_day] whose stringency is in [low, high]."""
+        values = self.stringency[self.window(first_day, last_day)]
+        return list(self.countries[((values >= low) & (values <= high)).any(axis=0)])
+
+    def members(self, words):
+        bits = np.unpackbits(words.astype('<u8').view(np.uint8), bitorder='little')[:len(self.countries)]
+        return list(self.countries[bits.astype(bool)])
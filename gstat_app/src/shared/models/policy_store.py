@@ -0,0 +1,71 @@
+import os
+import threading
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+class PolicyStore:
+    """
+    Oxford policy data (OxCGRT) of every country as typed columns, shared by every session.
+
+    Rows are sorted by country and date and each country owns one slice of them, so the
+    latest policy vector or the policy history of a country is a dict lookup and a slice.
+    Policy values are forward filled within each country, a policy stays in place until
+    its next change.
+    """
+
+    def __init__(self, countries, starts, dates, columns):
+        self.countries = list(countries)
+        self.index = {c: slice(starts[i], starts[i + 1]) for i, c in enumerate(self.countries)}
+        self.dates = dates
+        self.columns = columns
+        # last row of each country with a StringencyIndex, the latest day Oxford has scored
+        scored = ~np.isnan(columns['StringencyIndex'])
+        self.latest_row = {}
+        for c, rows in self.index.items():
+            found = np.nonzero(scored[rows])[0]
+            self.latest_row[c] = rows.start + found[-1] if len(found) else rows.stop - 1
+
+    def policy_columns(self, prefixes):
+        return [k for k in self.columns if k.startswith(prefixes) and k.find('Notes') == -1]
+
+    def latest(self, country, prefixes):
+        """Latest policy vector of country, {column: value} for the columns starting with prefixes."""
+        row = self.latest_row[country]
+        return {k: float(self.columns[k][row]) for k in self.policy_columns(prefixes)}
+
+    def history(self, country, prefixes=None):
+        """Daily policy values of country, all numeric columns unless prefixes is given."""
+        rows = self.index[country]
+        cols = self.policy_columns(prefixes) if prefixes else list(self.columns)
+        df = pd.DataFrame({k: self.columns[k][rows] for k in cols})
+        df.insert(0, 'date', self.dates[rows])
+        return df
+
+    @classmethod
+    def load(cls, oxford_file):
+        """The store for this version of oxford_file, read on first use in the process."""
+        stat = os.stat(oxford_file)
+        version = (os.path.abspath(oxford_file), stat.st_mtime_ns, stat.st_size)
+        with _lock:
+            if version not in _loaded:
+                _loaded[version] = cls.read(oxford_file)
+            return _loaded[version]
+
+    @classmethod
+    def read(cls, oxford_file):
+        df = pd.read_csv(oxford_file)
+        df['date'] = pd.to_datetime(df['Date'].astype(str), format="%Y%m%d")
+        df = df.sort_values(['CountryName', 'date'], kind='mergesort').reset_index(drop=True)
+        country = df['CountryName'].values
+        starts = np.r_[0, np.nonzero(country[1:] != country[:-1])[0] + 1, len(df)]
+
+        numeric = [k for k in df.select_dtypes('number').columns if k != 'Date']
+        values = df[numeric].astype(float).groupby(df['CountryName'], sort=False).ffill()
+        columns = {k: np.ascontiguousarray(values[k].values) for k in numeric}
+        # the stringency index itself is not filled, a gap means Oxford has not scored that day
+        columns['StringencyIndex'] = df['StringencyIndex'].values.astype(float)
+        return cls(country[starts[:-1]], starts, df['date'].values, columns)
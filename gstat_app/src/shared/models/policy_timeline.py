@@ -0,0 +1,139 @@
+"""Policy indicators as timelines of change events, and the stringency index computed over them.
+
+An indicator is a sorted list of (change day, value) events, padded with NO_CHANGE; its
+daily values are a cumulative count of events over all indicators (and schedules) at once, and
+the stringency index of every day is a single matrix product with stringency_weights.
+Days are int64 day numbers, see to_days.
+"""
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+NO_CHANGE = np.iinfo(np.int64).max
+
+
+def to_days(dates):
+    """Day numbers since the epoch, NaT becomes NO_CHANGE."""
+    dates = pd.to_datetime(pd.Series(np.ravel(dates))).values.astype('datetime64[D]')
+    days = dates.view('int64').copy()
+    days[np.isnat(dates)] = NO_CHANGE
+    return days.reshape(np.shape(dates))
+
+
+def expand(days, change_days, change_values):
+    """Daily values of every indicator from its change events.
+
+    Arguments:
+        days: (n_days,) increasing day numbers.
+        change_days: (..., n_indicators, n_events) day numbers, increasing per indicator
+            and padded with NO_CHANGE. Events before days[0] are in effect from days[0].
+        change_values: values of the events, same shape as change_days.
+
+    Returns:
+        (..., n_days, n_indicators), NaN before an indicator's first event.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    change_days = np.asarray(change_days, dtype=np.int64)
+    change_values = np.asarray(change_values, dtype=float)
+    shape, n_events = change_days.shape[:-1], change_days.shape[-1]
+    n_rows = int(np.prod(shape))
+
+    # count the events in effect on every day: drop each event on the first day at or after
+    # it, and a cumulative sum over the days gives the position of the event in effect
+    first = np.searchsorted(days, change_days.reshape(n_rows, n_events))
+    rows = np.arange(n_rows)[:, None]
+    counts = np.bincount((rows * (len(days) + 1) + first).ravel(), minlength=n_rows * (len(days) + 1))
+    pos = np.cumsum(counts.reshape(n_rows, -1)[:, :len(days)], axis=1) - 1
+    events = change_values.reshape(n_rows, n_events)
+    values = np.where(pos >= 0, events[rows, np.maximum(pos, 0)], np.nan)
+    return np.swapaxes(values.reshape(shape + (len(days),)), -1, -2)
+
+
+def score_weights(columns, max_val, general_suffix):
+    """Indicators and the (n_cols x n_indicators) matrix W such that daily values @ W are their scores.
+
+    Each indicator scores (value + general flag) / (max + 1) if it has a general flag
+    column (e.g. S1_IsGeneral), value / max if not.
+    """
+    columns = list(columns)
+    indicators = [c for c in columns if not c.endswith(general_suffix)]
+    weights = np.zeros((len(columns), len(indicators)))
+    for j, k in enumerate(indicators):
+        general = k[:2] + general_suffix
+        if general in columns:
+            weights[columns.index(k), j] = weights[columns.index(general), j] = 1 / (max_val[k[:2]] + 1)
+        else:
+            weights[columns.index(k), j] = 1 / max_val[k[:2]]
+    return indicators, weights
+
+
+def stringency_weights(columns, max_val, general_suffix):
+    """Weights w such that daily values @ w is the stringency index, 100 times the mean score."""
+    _, weights = score_weights(columns, max_val, general_suffix)
+    return weights.sum(axis=1) * 100 / weights.shape[1]
+
+
+def stringency_frame(dates, values, columns, max_val, general_suffix):
+    """Daily policy values of one schedule with the score of every indicator and the stringency index."""
+    indicators, weights = score_weights(columns, max_val, general_suffix)
+    scores = values @ weights
+    df = pd.DataFrame(values, columns=list(columns))
+    # one at a time, pandas before 1.1 cannot add several new columns from a 2d array
+    for k, score in zip(indicators, scores.T):
+        df[k[:2] + '_score'] = score
+    df.insert(0, 'StringencyIndex', scores.mean(axis=1) * 100)
+    df.insert(0, 'date', pd.to_datetime(np.asarray(dates)))
+    return df
+
+
+def index_paths(days, change_days, change_values, weights):
+    """Stringency index of every schedule without expanding its indicators, (..., n_days).
+
+    Each event moves the index by weight x (value - previous value) from its day on, so the
+    index is a cumulative sum of these jumps. Every indicator needs an event at or before
+    days[0]. Arguments as in expand, with weights from stringency_weights.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    change_days = np.asarray(change_days, dtype=np.int64)
+    change_values = np.asarray(change_values, dtype=float)
+    shape, n_days = change_days.shape[:-2], len(days)
+    n_rows = int(np.prod(shape))
+
+    jumps = np.diff(change_values, prepend=0., axis=-1) * np.asarray(weights)[:, None]
+    first = np.searchsorted(days, change_days).reshape(n_rows, -1)
+    rows = np.arange(n_rows)[:, None]
+    index = np.bincount((rows * (n_days + 1) + first).ravel(), weights=jumps.reshape(n_rows, -1).ravel(),
+                        minlength=n_rows * (n_days + 1))
+    return np.cumsum(index.reshape(n_rows, -1)[:, :n_days], axis=1).reshape(shape + (n_days,))
+
+
+def schedule_events(dates, start, targets, change_dates, general_cols):
+    """Days and change events when moving from start to each row of targets.
+
+    Arguments:
+        dates: projected dates, the first one holds start.
+        start: (n_cols,) current policy values.
+        targets: (n_schedules x n_cols) policy values to move to.
+        change_dates: (n_schedules x n_cols) date of each change. A change takes effect from
+            its date if that falls after the first projected day, otherwise it never does.
+        general_cols: boolean mask of the general flag columns, which always follow
+            targets from the second day.
+
+    Returns:
+        days, change_days and change_values as taken by expand and index_paths.
+    """
+    days = to_days(dates)
+    targets = np.atleast_2d(np.asarray(targets, dtype=float))
+    change_days = to_days(change_dates).reshape(targets.shape)
+    change_days = np.where(change_days > days[0], change_days, NO_CHANGE)
+    if len(days) > 1:
+        change_days[:, general_cols] = days[1]
+    else:
+        change_days[:, general_cols] = NO_CHANGE
+    start_days = np.full(targets.shape, days[0])
+    values = np.stack([np.broadcast_to(np.asarray(start, dtype=float), targets.shape), targets], axis=-1)
+    return days, np.stack([start_days, change_days], axis=-1), values
+
+
+def project(dates, start, targets, change_dates, general_cols):
+    """Daily policy values of every schedule, (n_schedules x n_days x n_cols), see schedule_events."""
+    return expand(*schedule_events(dates, start, targets, change_dates, general_cols))
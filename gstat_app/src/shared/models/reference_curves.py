@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from src.shared.models import olg_kernels
+
+REFERENCE_INIT_INFECTED = 250
+_loaded = {}
+_lock = threading.Lock()
+
+
+class ReferenceCurves:
+    """
+    R curves (r_adj from day_0) of every Johns Hopkins province in confirmed_global.csv.
+
+    Curves are computed once per data version and tau, saved as a .npy panel (entity x day,
+    NaN padded) with a json index, and memory-mapped on every later load, so picking a
+    reference entity for the crystal ball regression costs a dict lookup and a slice.
+    Names are "Country/Province", with "All" for countries reported as a whole
+    (e.g. "China/Hubei", "Israel/All").
+    """
+
+    def __init__(self, curves, names, lengths):
+        self.curves = curves
+        self.names = list(names)
+        self.lengths = np.asarray(lengths)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def get(self, name):
+        i = self.index[name]
+        return self.curves[i, :self.lengths[i]]
+
+    @classmethod
+    def load(cls, jhopkins_file, tau, cache_dir, init_infected=REFERENCE_INIT_INFECTED):
+        """Memory-map the curves for this version of jhopkins_file, building them on first use."""
+        stat = os.stat(jhopkins_file)
+        version = hashlib.sha1(json.dumps(
+            [os.path.abspath(jhopkins_file), stat.st_mtime_ns, stat.st_size, int(tau), init_infected]).encode()
+        ).hexdigest()[:16]
+        with _lock:
+            if version not in _loaded:
+                path = os.path.join(cache_dir, 'reference_curves_' + version)
+                if not os.path.exists(path + '.json'):
+                    cls.build(jhopkins_file, tau, init_infected, path)
+                with open(path + '.json') as f:
+                    index = json.load(f)
+                _loaded[version] = cls(np.load(path + '.npy', mmap_mode='r'), index['names'], index['lengths'])
+            return _loaded[version]
+
+    @staticmethod
+    def build(jhopkins_file, tau, init_infected, path):
+        df = pd.read_csv(jhopkins_file)
+        dates = pd.to_datetime(pd.Series(df.columns), format="%m/%d/%y", errors='coerce')
+        raw = df.loc[:, dates.notna().values].values.astype(float)
+        names = (df['Country/Region'] + '/' + df['Province/State'].fillna('All')).values
+
+        # only entities that reached init_infected have a day_0
+        reached = (raw >= init_infected).any(axis=1)
+        raw, names = raw[reached], names[reached]
+        day_0 = np.argmax(raw >= init_infected, axis=1)
+        lengths = raw.shape[1] - day_0
+        cols = np.arange(raw.shape[1])
+        aligned = np.full(raw.shape, np.nan)
+        keep = cols >= day_0[:, None]
+        aligned[np.nonzero(keep)[0], (cols - day_0[:, None])[keep]] = raw[keep]
+
+        _, r_adj = olg_kernels.calc_r(olg_kernels.enforce_growth(aligned), tau, init_infected)
+        # the json index is written last and both files are renamed into place, so other
+        # processes either see a complete library or build their own
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        np.save(tmp + '.npy', r_adj)
+        os.replace(tmp + '.npy', path + '.npy')
+        with open(tmp + '.json', 'w') as f:
+            json.dump({'names': list(names), 'lengths': [int(n) for n in lengths]}, f)
+        os.replace(tmp + '.json', path + '.json')
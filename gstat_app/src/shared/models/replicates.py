@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+# workers -> the pool of that many processes, kept for the life of the app
+_pools = {}
+_lock = threading.Lock()
+
+
+class StreamingQuantiles:
+    """
+    Quantiles of a stream of equally shaped arrays, elementwise, in constant memory.
+
+    Every element runs the P-square estimator (Jain and Chlamtac, 1985): five markers per
+    quantile whose heights are moved by piecewise parabolic interpolation as observations
+    arrive. All elements see their n-th observation together, so the desired marker
+    positions are shared and only heights and actual positions are kept per element.
+    The first exact_until observations are also kept as they are, and give exact
+    quantiles while there are no more than that.
+    """
+
+    def __init__(self, quantiles=(5, 50, 95), exact_until=20):
+        self.quantiles = list(quantiles)
+        self.exact_until = max(exact_until, 5)
+        p = np.array(self.quantiles, dtype=float)[:, None] / 100
+        self.increments = np.hstack([np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)])
+        self.desired = np.hstack([np.zeros_like(p), 2 * p, 4 * p, 2 + 2 * p, 4 * np.ones_like(p)])
+        self.count = 0
+        self.shape = None
+        self.first = []
+        self.total = None
+
+    def add(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.shape is None:
+            self.shape = x.shape
+            self.total = np.zeros(x.shape)
+        self.count += 1
+        self.total += x
+        x = x.ravel()
+        if self.count <= self.exact_until:
+            self.first.append(x)
+        if self.count <= 5:
+            if self.count == 5:
+                # (quantile x marker x element)
+                self.heights = np.sort(np.array(self.first[:5]), axis=0)
+                self.heights = np.repeat(self.heights[None], len(self.quantiles), axis=0)
+                self.positions = np.repeat(np.arange(5.)[None, :, None], len(self.quantiles), axis=0)
+                self.positions = np.repeat(self.positions, len(x), axis=2)
+            return
+        q, n = self.heights, self.positions
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        cell = (x >= q[:, 1:4]).sum(axis=1)
+        n += np.arange(5)[None, :, None] > cell[:, None, :]
+        self.desired += self.increments
+        for i in range(1, 4):
+            d = self.desired[:, i, None] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            d = np.sign(d) * move
+            parabolic = q[:, i] + d / (n[:, i + 1] - n[:, i - 1]) * (
+                (n[:, i] - n[:, i - 1] + d) * (q[:, i + 1] - q[:, i]) / (n[:, i + 1] - n[:, i])
+                + (n[:, i + 1] - n[:, i] - d) * (q[:, i] - q[:, i - 1]) / (n[:, i] - n[:, i - 1]))
+            # where the parabola leaves the neighbouring markers, move linearly towards the one in direction d
+            neighbour = np.where(d > 0, i + 1, i - 1)
+            q_d = np.take_along_axis(q, neighbour[:, None], axis=1)[:, 0]
+            n_d = np.take_along_axis(n, neighbour[:, None], axis=1)[:, 0]
+            linear = q[:, i] + d * (q_d - q[:, i]) / np.where(move, n_d - n[:, i], 1)
+            inside = (q[:, i - 1] < parabolic) & (parabolic < q[:, i + 1])
+            q[:, i] = np.where(move, np.where(inside, parabolic, linear), q[:, i])
+            n[:, i] += d
+
+    def result(self):
+        """{quantile: array} of the current estimates."""
+        if self.count <= self.exact_until:
+            exact = np.percentile(np.array(self.first), self.quantiles, axis=0)
+            return {k: v.reshape(self.shape) for k, v in zip(self.quantiles, exact)}
+        return {k: self.heights[i, 2].reshape(self.shape) for i, k in enumerate(self.quantiles)}
+
+    def mean(self):
+        return self.total / self.count
+
+    def frame(self, columns):
+        """Bands of a stream of (day x column) arrays as one DataFrame, "I p5", "I p50", ... per column."""
+        bands = self.result()
+        return pd.DataFrame({'%s p%s' % (c, k): bands[k][:, j] for j, c in enumerate(columns) for k in bands})
+
+
+def process_pool(workers):
+    """
+    A long-lived pool of workers processes, shared by every session instead of one per run.
+
+    Its processes start from forkserver (spawn where there is none), not fork: the app
+    serves sessions from threads, and a forked child could inherit a lock one of them held.
+    """
+    with _lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return pool
+
+
+def discard_pool(workers, pool):
+    """Forget a broken pool, the next process_pool(workers) starts a new one."""
+    with _lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False)
+
+
+def run_replicates(func, args, seeds, quantiles=(5, 50, 95), workers=None, time_budget=None, progress=None):
+    """
+    Run func(*args, seed) for every seed across the process_pool of workers, folding each
+    returned array into StreamingQuantiles. func must be importable by the workers.
+
+    Runs are folded in seed order, so the bands do not depend on which worker finished
+    first, and at most 2 x workers runs are submitted but not yet folded, so memory does
+    not grow with the number of seeds.
+
+    Arguments:
+        time_budget: seconds, no new runs are started past it.
+        progress: called with the fraction of seeds done.
+
+    Returns:
+        StreamingQuantiles with count runs folded in.
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    stream = StreamingQuantiles(quantiles)
+    seeds = list(seeds)
+    pool = process_pool(workers)
+    pending, finished, submitted = {}, {}, 0
+    try:
+        while stream.count < submitted or submitted < len(seeds):
+            over_budget = time_budget and time.perf_counter() - start > time_budget
+            while not over_budget and submitted < len(seeds) and submitted - stream.count < 2 * workers:
+                pending[pool.submit(func, *args, seeds[submitted])] = submitted
+                submitted += 1
+            if stream.count == submitted:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = future.result()
+            while stream.count in finished:
+                stream.add(finished.pop(stream.count))
+            if progress:
+                progress(stream.count / len(seeds))
+    except BrokenProcessPool:
+        discard_pool(workers, pool)
+        raise
+    finally:
+        # a session that stops early (e.g. the user reran the page) leaves the pool to the others
+        for future in pending:
+            future.cancel()
+    return stream
@@ -0,0 +1,144 @@
+"""Per country, rolling window calibration of SIR and SEIR rates.
+
+beta and gamma (and sigma, the E to I rate, for SEIR) are fit to the S/E/I/R panel of the ETL
+(all_data_seir in transform_worldmeter_data, saved as SIR_data.csv), where S is the population,
+E the active cases four days later, I the active cases and R the recovered and deceased. Each
+window starts from its first observed state and the curves of every other state are fit on a
+log scale by least squares. The finite difference Jacobian is one integrate_many solve over
+the rates and their perturbations, each window starts from the rates of the previous one, and
+countries are spread over a process pool.
+"""
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+from scipy.optimize import least_squares  # type: ignore
+from src.shared.models.compartments import SEIR_STATES, SIR_STATES, integrate_many, seir_jacobian, seir_rhs, \
+    sir_jacobian, sir_rhs
+
+try:
+    from scipy.integrate import ODEintWarning  # type: ignore
+except ImportError:
+    # scipy before 1.5 does not export it from scipy.integrate
+    from scipy.integrate.odepack import ODEintWarning  # type: ignore
+
+# sigma is the eps of compartments.seir_rhs, named as in SEIRSModel
+SEIR_MODELS = {
+    'SIR': {'rhs': sir_rhs, 'jacobian': sir_jacobian, 'states': SIR_STATES, 'rates': ['beta', 'gamma']},
+    'SEIR': {'rhs': seir_rhs, 'jacobian': seir_jacobian, 'states': SEIR_STATES, 'rates': ['beta', 'gamma', 'sigma']},
+}
+RATES = ['beta', 'gamma', 'sigma']
+# (lower, upper) bound and starting value of each rate, per day
+RATE_BOUNDS = {'beta': (1e-3, 5.), 'gamma': (1e-3, 2.), 'sigma': (1e-2, 5.)}
+INITIAL_RATES = {'beta': 0.3, 'gamma': 0.1, 'sigma': 0.2}
+# step of the finite differences, in log rate
+STEP = 1e-4
+# population fractions below this are compared as this, on a log scale
+FLOOR = 1e-12
+TABLE_COLUMNS = ['country', 'model', 'start', 'end'] + RATES + ['R0', 'loss', 'n_days']
+
+
+def country_panels(df, min_infected):
+    """
+    (country, dates, (days x S, E, I, R) population fractions) of every country from the first
+    day it has min_infected active cases. S is what E, I and R leave of the population.
+    """
+    for country, country_df in df.sort_values('date').groupby('country'):
+        infected = country_df['I'].values >= min_infected
+        if not infected.any():
+            continue
+        days = country_df.iloc[np.argmax(infected):]
+        population = days['S'].values.astype(float)
+        y = days[['E', 'I', 'R']].values.astype(float) / population[:, None]
+        yield country, pd.to_datetime(days['date']).values, np.column_stack([1 - y.sum(axis=1), y])
+
+
+def window_residuals(model, t, y, log_rates):
+    """
+    (observations x candidates) log residuals of every other state than S, for (candidates x rates)
+    log rates, with every candidate run from y[0]. Unobserved (zero) values count as no error.
+    """
+    spec = SEIR_MODELS[model]
+    index = [['S', 'E', 'I', 'R'].index(s) for s in spec['states']]
+    y = y[:, index]
+    rates = np.exp(log_rates).T
+    with warnings.catch_warnings():
+        # a failed solve leaves garbage that the floor and the bounds keep finite
+        warnings.simplefilter('ignore', ODEintWarning)
+        curves = integrate_many(spec['rhs'], spec['jacobian'], np.repeat(y[0][:, None], len(log_rates), axis=1), t,
+                                rates, rtol=1e-9, atol=1e-14)
+    observed = y[1:, 1:]
+    with np.errstate(invalid='ignore'):
+        residuals = np.log(np.maximum(curves[1:, 1:], FLOOR)) - np.log(np.maximum(observed, FLOOR))[:, :, None]
+    residuals = np.where((observed > 0)[:, :, None], np.nan_to_num(residuals, nan=-np.log(FLOOR)), 0)
+    return residuals.reshape(-1, len(log_rates))
+
+
+def fit_window(model, t, y, x0):
+    """Least squares log rates of one window from x0, and the RMS log residual of the fit."""
+    rates = SEIR_MODELS[model]['rates']
+    lower, upper = np.log([RATE_BOUNDS[k] for k in rates]).T
+
+    def jacobian(x):
+        # x and its perturbations in one solve, which also share the solver's steps
+        columns = window_residuals(model, t, y, np.vstack([x, x + STEP * np.eye(len(x))]))
+        return (columns[:, 1:] - columns[:, :1]) / STEP
+
+    fit = least_squares(lambda x: window_residuals(model, t, y, x[None])[:, 0], np.clip(x0, lower, upper),
+                        jac=jacobian, bounds=(lower, upper), method='trf', max_nfev=100)
+    n_observed = max(np.count_nonzero(y[1:, 1:] > 0), 1)
+    return fit.x, np.sqrt(2 * fit.cost / n_observed)
+
+
+def calibrate_country(args):
+    """Rows of fitted rates, one per window of the country, each window warm started from the last."""
+    model, country, dates, y, window, step = args
+    rates = SEIR_MODELS[model]['rates']
+    x = np.log([INITIAL_RATES[k] for k in rates])
+    rows = []
+    for start in range(0, len(dates) - window + 1, step):
+        days = (dates[start:start + window] - dates[start]) / np.timedelta64(1, 'D')
+        x, loss = fit_window(model, days.astype(float), y[start:start + window], x)
+        row = dict(country=country, model=model, start=dates[start], end=dates[start + window - 1], loss=loss,
+                   n_days=window, **dict(zip(rates, np.exp(x))))
+        row['R0'] = row['beta'] / row['gamma']
+        rows.append(row)
+    return rows
+
+
+def calibrate(df, models=('SIR', 'SEIR'), window=14, step=7, min_infected=50, processes=None):
+    """Fitted rates of every model, country and window of df (the all_data_seir frame), one row each."""
+    tasks = [(model, country, dates, y, window, step)
+             for country, dates, y in country_panels(df, min_infected) for model in models]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        rows = [row for country_rows in pool.map(calibrate_country, tasks, chunksize=4) for row in country_rows]
+    return pd.DataFrame(rows, columns=TABLE_COLUMNS)
+
+
+def data_version(path, params):
+    stat = os.stat(path)
+    return hashlib.sha1(json.dumps(
+        [os.path.abspath(path), stat.st_mtime_ns, stat.st_size, params, RATE_BOUNDS, INITIAL_RATES]).encode()
+    ).hexdigest()[:16]
+
+
+def load_calibration(path):
+    """Fitted rates indexed by country, empty if calibration has not run yet."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=TABLE_COLUMNS[1:] + ['data_version'])
+    return pd.read_csv(path, parse_dates=['start', 'end']).set_index('country')
+
+
+def latest_rates(table, country, model='SEIR'):
+    """{rate: value} of the last window fit for country, None if it has none."""
+    if country not in table.index:
+        return None
+    rows = table.loc[[country]]
+    rows = rows[rows['model'] == model]
+    if not len(rows):
+        return None
+    last = rows.sort_values('end').iloc[-1]
+    return {k: float(last[k]) for k in SEIR_MODELS[model]['rates']}
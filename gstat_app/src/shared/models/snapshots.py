@@ -0,0 +1,137 @@
+"""Typed columnar snapshots of the app's datasets.
+
+A snapshot is a directory next to the dataset's CSV with one .npy file per column and a
+manifest.json of the schema and the version of the CSVs it was built from. It holds the frame
+as the data.py readers return it, so dates are already datetime64, derived columns are
+already there and string columns are dictionary encoded (int32 codes, the values in the
+manifest). Numeric, date and code columns are memory-mapped on load, processes sharing a
+snapshot share its pages through the OS cache. Snapshots are written by build_snapshots.py
+after the ETL, the app only reads them and reads the CSVs while one is stale or missing.
+"""
+import json
+import os
+import shutil
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+FORMAT_VERSION = 1
+SUFFIX = '.snapshot'
+# set by build_snapshots.py, load saves what it reads from the CSVs only then
+write_stale = False
+
+
+def source_version(sources):
+    """Name, mtime and size of every source file, a snapshot is current while these are."""
+    version = []
+    for path in sources:
+        stat = os.stat(path)
+        version.append([os.path.basename(path), stat.st_mtime_ns, stat.st_size])
+    return version
+
+
+def snapshot_dir(name, sources):
+    return os.path.join(os.path.dirname(sources[0]), name + SUFFIX)
+
+
+def json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("%r cannot be stored in a snapshot" % (value,))
+
+
+def encode(values, directory, file):
+    """Save one column (or index level) as file in directory and return its manifest entry."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, categories = values.cat.codes.values, list(values.cat.categories)
+        kind = 'category'
+    elif values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+        codes, categories = pd.factorize(values)
+        categories = list(categories)
+        kind = 'object'
+    elif values.dtype.kind in 'biufcmM':
+        np.save(os.path.join(directory, file), np.ascontiguousarray(values.values))
+        return {'file': file, 'kind': 'array'}
+    else:
+        raise TypeError("columns of type %s cannot be stored in a snapshot" % values.dtype)
+    np.save(os.path.join(directory, file), codes.astype(np.int32))
+    return {'file': file, 'kind': kind, 'dtype': str(values.dtype), 'categories': categories}
+
+
+def decode(entry, directory):
+    # a plain ndarray view of the mapping, pandas keeps it as it is
+    values = np.load(os.path.join(directory, entry['file']), mmap_mode='r').view(np.ndarray)
+    if entry['kind'] == 'array':
+        return values
+    if entry['kind'] == 'category':
+        return pd.Categorical.from_codes(values, entry['categories'])
+    # code -1 is a missing value, the last of the lookup
+    lookup = np.empty(len(entry['categories']) + 1, dtype=object)
+    lookup[:-1] = entry['categories']
+    lookup[-1] = np.nan
+    return pd.Series(lookup[values], dtype=entry['dtype'])
+
+
+def write_snapshot(df, directory, sources):
+    """Write df as a snapshot of sources, replacing the one at directory."""
+    if not df.columns.is_unique:
+        raise ValueError("columns of a snapshot must be unique")
+    tmp = '%s.%d.tmp' % (directory, os.getpid())
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        manifest = {'format': FORMAT_VERSION, 'sources': source_version(sources), 'rows': len(df)}
+        manifest['columns'] = [dict(encode(df[c], tmp, 'c%d.npy' % i), name=c) for i, c in enumerate(df.columns)]
+        index = df.index
+        if not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1):
+            manifest['index'] = [dict(encode(index.get_level_values(i).to_series(), tmp, 'i%d.npy' % i), name=n)
+                                 for i, n in enumerate(index.names)]
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, default=json_value)
+        # readers see the old snapshot or the new one, never half of one
+        old = '%s.%d.old' % (directory, os.getpid())
+        if os.path.exists(directory):
+            os.rename(directory, old)
+        os.rename(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_snapshot(directory, sources):
+    """The frame of the snapshot at directory, None if there is none or it is older than sources."""
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest['format'] != FORMAT_VERSION or manifest['sources'] != source_version(sources):
+        return None
+    columns = {entry['name']: decode(entry, directory) for entry in manifest['columns']}
+    df = pd.DataFrame(columns, columns=[entry['name'] for entry in manifest['columns']], copy=False)
+    if 'index' in manifest:
+        levels = [decode(entry, directory) for entry in manifest['index']]
+        names = [entry['name'] for entry in manifest['index']]
+        df.index = pd.Index(levels[0], name=names[0]) if len(levels) == 1 else \
+            pd.MultiIndex.from_arrays(levels, names=names)
+    return df
+
+
+def load(name, sources, read):
+    """
+    read() from its snapshot when that is current, otherwise read() the CSVs, and save the
+    result as the snapshot when write_stale is set.
+
+    Arguments:
+        name: the snapshot, saved as name.snapshot next to the first source.
+        sources: the files read() reads.
+    """
+    directory = snapshot_dir(name, sources)
+    df = read_snapshot(directory, sources)
+    if df is None:
+        df = read()
+        if write_stale:
+            try:
+                write_snapshot(df, directory, sources)
+            except (OSError, TypeError, ValueError) as e:
+                print("no snapshot of", name, e)
+    return df
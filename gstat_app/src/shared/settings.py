@@ -1,8 +1,12 @@
 import yaml
 import os
 from src.shared.models.data import *
-import streamlit as st
 from .utils import get_session_id, fancy_cache
+from .cache import ResultCache
+from src.shared.models import dataset_store
+from src.shared.models.reference_curves import ReferenceCurves
+from src.shared.models.olg_calibration import load_calibration
+from src.shared.models import seir_calibration
 import datetime
 
 current_directory = os.path.dirname(os.path.abspath(__file__))
@@ -21,34 +25,69 @@ with open(defaults_file) as file:
     # scalar values to Python the dictionary format
     DEFAULTS = yaml.load(file, Loader=yaml.FullLoader)
 
+olg_cache = ResultCache(**DEFAULTS['CACHE']['olg'])
+seirs_cache = ResultCache(**DEFAULTS['CACHE']['seirs'])
+# per country OLG parameters fit by gstat_app/calibrate_olg.py, empty until it has run
+olg_calibration = load_calibration(DEFAULTS['FILES']['country_files']['olg_calibration_file'])
+# per country and window SIR / SEIR rates fit by gstat_app/calibrate_seir.py, empty until it has run
+seir_rates = seir_calibration.load_calibration(DEFAULTS['FILES']['country_files']['seir_calibration_file'])
+
 user_session_id = get_session_id()
 print(user_session_id)
 
-@st.cache(ttl=20, show_spinner=False , persist=True, max_entries=3)
-def load_data(DEFAULTS,user_session_id):
-    print(user_session_id, datetime.datetime.now())
-    with open('./logs/session_ids.csv', 'a') as fd:
-        fd.write(str(user_session_id) + ",")
-        fd.write(str(datetime.datetime.now())+"\n")
-    israel_data = IsraelData(DEFAULTS['FILES']['israel_files'])
-
-    # Load data
-    countrydata = CountryData(DEFAULTS['FILES']['country_files'])
-    countrydata.get_country_data()
-    country_df = countrydata.country_df.copy()
-    lab_tests = israel_data.lab_results_df.copy()
-    israel_data.get_yishuv_data()
-    israel_yishuv_df = israel_data.yishuv_df.copy()
-    israel_patients = israel_data.patients_df.copy()
-    isolation_df = israel_data.isolation_df.copy()
-    tested_df = israel_data.tested_df.copy()
-    jh_confirmed_df = countrydata.jh_confirmed_df
+# sessions already written to the session log by load_data
+_logged_sessions = set()
+COUNTRY_DATASET_FILES = ['country_file', 'stringency_file', 'jhopkins_confirmed']
+ISRAEL_DATASET_FILES = ['yishuv_file', 'yishuv_file2', 'isolations_file', 'lab_results_file', 'tested_file',
+                        'patients_path']
+
+
+def read_country_data(country_files):
+    countrydata = CountryData(country_files)
+    return countrydata.country_df, countrydata.stringency_df, countrydata.jh_confirmed_df
+
+
+def read_israel_data(israel_files):
+    israel_data = IsraelData(israel_files)
+    return (israel_data.lab_results_df, israel_data.yishuv_df, israel_data.patients_df, israel_data.isolation_df,
+            israel_data.tested_df)
+
+
+def load_country_data(DEFAULTS):
+    country_files = DEFAULTS['FILES']['country_files']
+    return dataset_store.get('country', [country_files[k] for k in COUNTRY_DATASET_FILES],
+                             lambda: read_country_data(country_files))
+
+
+def country_data_version(DEFAULTS):
+    """Version of the files behind load_country_data, it changes whenever its frames do."""
+    country_files = DEFAULTS['FILES']['country_files']
+    return dataset_store.file_version([country_files[k] for k in COUNTRY_DATASET_FILES])
+
+
+def load_data(DEFAULTS, user_session_id):
+    """
+    The app's country and Israel frames, read once per process and shared by every session
+    until one of their files changes. Their non-object columns are read-only, copy one before writing into it.
+    """
+    if user_session_id not in _logged_sessions:
+        _logged_sessions.add(user_session_id)
+        print(user_session_id, datetime.datetime.now())
+        with open('./logs/session_ids.csv', 'a') as fd:
+            fd.write(str(user_session_id) + ",")
+            fd.write(str(datetime.datetime.now())+"\n")
+    israel_files = DEFAULTS['FILES']['israel_files']
+    country_df, _, jh_confirmed_df = load_country_data(DEFAULTS)
+    lab_tests, israel_yishuv_df, israel_patients, isolation_df, tested_df = dataset_store.get(
+        'israel', [israel_files[k] for k in ISRAEL_DATASET_FILES], lambda: read_israel_data(israel_files))
     return country_df, jh_confirmed_df, lab_tests, israel_yishuv_df, israel_patients, isolation_df, tested_df
 
-@st.cache(ttl=20, show_spinner=False , persist=True, max_entries=3)
-def load_stringency(DEFAULTS,user_session_id):
-    countrydata = CountryData(DEFAULTS['FILES']['country_files'])
-    stringency_df = countrydata.get_stringency()
-    return stringency_df
+
+def load_stringency(DEFAULTS, user_session_id):
+    return load_country_data(DEFAULTS)[1]
+
+def load_reference_curves(DEFAULTS, tau):
+    country_files = DEFAULTS['FILES']['country_files']
+    return ReferenceCurves.load(country_files['jhopkins_confirmed'], tau, country_files['reference_curves_dir'])
 
 # datasets = load_data(DEFAULTS)